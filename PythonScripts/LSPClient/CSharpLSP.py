@@ -220,6 +220,10 @@ def CSharpLSP_FindReferences():
     _client.find_references()
 
 
+def CSharpLSP_WorkspaceSymbol():
+    _client.workspace_symbol()
+
+
 def CSharpLSP_ShowDiagnostics():
     _client.show_all_diagnostics()
 
@@ -127,6 +127,10 @@ def JaiLSP_FindReferences():
     _client.find_references()
 
 
+def JaiLSP_WorkspaceSymbol():
+    _client.workspace_symbol()
+
+
 def JaiLSP_ShowDiagnostics():
     _client.show_all_diagnostics()
 
@@ -0,0 +1,493 @@
+# LSPBench.py - Micro-benchmarks for the LSPClient hot paths
+#
+# Run from a normal Python (not inside 10x) in this folder:
+#
+#     python LSPBench.py            # every benchmark
+#     python LSPBench.py diff       # just the named one(s)
+#
+# Each benchmark times the current LSPClient code against the implementation it
+# replaced, on synthetic inputs sized like real workspaces. Nothing here runs
+# when 10x loads the folder: 10x executes every script as __main__, so the
+# entry point also checks that the real N10X module is absent.
+# ---------------------------------------------------------------------------
+
+import os
+import sys
+import time
+import types
+import random
+
+try:
+    import N10X
+    _IN_EDITOR = True
+except ImportError:
+    # Outside 10x. LSPClient imports N10X at module level, but the pure helpers
+    # benchmarked here never call it, so an empty placeholder module will do.
+    _IN_EDITOR = False
+    sys.modules["N10X"] = types.ModuleType("N10X")
+
+try:
+    import LSPClient
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    import LSPClient
+
+
+def _timeit(fn, repeat):
+    """Best-of-3 mean seconds per call of fn()."""
+    best = float("inf")
+    for _ in range(3):
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        best = min(best, (time.perf_counter() - t0) / repeat)
+    return best
+
+
+def _report(name, old, new):
+    print(f"  {name:<28} before {old * 1e6:>10.1f} us   "
+          f"after {new * 1e6:>8.1f} us   x{old / new if new else 0:,.0f}")
+
+
+def _synthetic_source(lines, seed=1):
+    rnd = random.Random(seed)
+    words = ("self", "value", "count", "return", "index", "node", "result",
+             "if", "for", "while", "items", "append", "len", "range")
+    out = []
+    for i in range(lines):
+        indent = "    " * rnd.randint(0, 3)
+        out.append(indent + " ".join(rnd.choice(words)
+                                     for _ in range(rnd.randint(2, 9))))
+    return "\n".join(out) + "\n"
+
+
+# -- document sync -----------------------------------------------------------
+
+def _legacy_incremental_change(old, new):
+    """The character-by-character prefix/suffix scan sync_current used to run."""
+    if old == new:
+        return None
+    old_len, new_len = len(old), len(new)
+    p = 0
+    max_p = min(old_len, new_len)
+    while p < max_p and old[p] == new[p]:
+        p += 1
+    s = 0
+    max_s = min(old_len, new_len) - p
+    while s < max_s and old[old_len - 1 - s] == new[new_len - 1 - s]:
+        s += 1
+    return {"range": {"start": LSPClient.offset_to_pos(old, p),
+                      "end": LSPClient.offset_to_pos(old, old_len - s)},
+            "text": new[p:new_len - s]}
+
+
+def bench_diff(sizes=(1000, 10000, 100000)):
+    """Per-keystroke cost of computing the didChange range: one character typed
+    in the middle of files of 1k/10k/100k lines."""
+    print("diff: one keystroke mid-file")
+    for n in sizes:
+        old = _synthetic_source(n)
+        at = len(old) // 2
+        new = old[:at] + "x" + old[at:]
+        index = LSPClient.LineIndex(old)
+
+        def current():
+            start, end, text = LSPClient._diff_region(old, new, index)
+            return index.position(start), index.position(end)
+
+        repeat = max(3, 200000 // n)
+        _report(f"{n} lines", _timeit(lambda: _legacy_incremental_change(old, new),
+                                      max(1, repeat // 20)),
+                _timeit(current, repeat))
+        t0 = time.perf_counter()
+        LSPClient.LineIndex(old)
+        print(f"  {'':<28} (initial LineIndex build: "
+              f"{(time.perf_counter() - t0) * 1e3:.1f} ms)")
+
+
+def bench_hunks(sizes=(1000, 10000, 100000)):
+    """Multi-cursor style edit - one character at the top and one at the
+    bottom of the file: characters sent as one range vs split into hunks."""
+    print("hunks: edits at the top and bottom of the file")
+    for n in sizes:
+        old = _synthetic_source(n)
+        new = old[:10] + "x" + old[10:-20] + "y" + old[-20:]
+        index = LSPClient.LineIndex(old)
+        single = _legacy_incremental_change(old, new)
+        changes = LSPClient.incremental_changes(old, new, index)
+        t = _timeit(lambda: LSPClient.incremental_changes(old, new, index), 20)
+        print(f"  {n} lines: 1 range of {len(single['text']):,} chars -> "
+              f"{len(changes)} ranges of {sum(len(c['text']) for c in changes)} "
+              f"chars ({t * 1e3:.2f} ms)")
+
+
+# -- path / URI conversion ---------------------------------------------------
+
+def _legacy_path_to_uri(path):
+    path = os.path.abspath(path).replace("\\", "/")
+    if not path.startswith("/"):
+        path = "/" + path
+    safe = []
+    for ch in path:
+        if ch.isalnum() or ch in "/-_.~:!$&'()*+,;=@":
+            safe.append(ch)
+        else:
+            safe.append("%%%02X" % ord(ch))
+    return "file://" + "".join(safe)
+
+
+def _legacy_uri_to_path(uri):
+    if uri.startswith("file://"):
+        uri = uri[len("file://"):]
+    out = []
+    i = 0
+    while i < len(uri):
+        if uri[i] == "%" and i + 2 < len(uri):
+            try:
+                out.append(chr(int(uri[i + 1:i + 3], 16)))
+                i += 3
+                continue
+            except ValueError:
+                pass
+        out.append(uri[i])
+        i += 1
+    path = "".join(out)
+    if len(path) >= 3 and path[0] == "/" and path[2] == ":":
+        path = path[1:]
+    return os.path.normpath(path)
+
+
+def bench_uri(entries=10000, files=400):
+    """A textDocument/references result of 10k locations spread over a few
+    hundred files: uri_to_path on every entry, as _on_references does, plus
+    path_to_uri on the same paths (diagnostics / reconcile lookups)."""
+    print(f"uri: {entries:,}-entry references result over {files} files")
+    rnd = random.Random(3)
+    paths = [os.path.abspath(os.path.join(
+        "workspace", "src", f"module {i % 37}", f"file_{i}.rs"))
+        for i in range(files)]
+    uris = [_legacy_path_to_uri(rnd.choice(paths)) for _ in range(entries)]
+
+    def legacy():
+        for u in uris:
+            _legacy_path_to_uri(_legacy_uri_to_path(u))
+
+    def cold():
+        LSPClient._path_to_uri.cache_clear()
+        LSPClient.uri_to_path.cache_clear()
+        for u in uris:
+            LSPClient.path_to_uri(LSPClient.uri_to_path(u))
+
+    def warm():
+        for u in uris:
+            LSPClient.path_to_uri(LSPClient.uri_to_path(u))
+
+    before = _timeit(legacy, 3)
+    _report("cold cache", before, _timeit(cold, 3))
+    _report("warm cache", before, _timeit(warm, 3))
+
+
+# -- completion filtering ----------------------------------------------------
+
+def _synthetic_completions(count, seed=5):
+    """A rust-analyzer "std::"-sized completion list: snake_case, CamelCase
+    and SCREAMING names with server sortText."""
+    rnd = random.Random(seed)
+    parts = ("str", "string", "len", "from", "into", "iter", "map", "vec",
+             "hash", "set", "read", "write", "buf", "file", "path", "os",
+             "sync", "arc", "mutex", "error", "fmt", "display", "parse")
+    items = []
+    for i in range(count):
+        words = [rnd.choice(parts) for _ in range(rnd.randint(1, 4))]
+        style = i % 3
+        if style == 0:
+            label = "_".join(words)
+        elif style == 1:
+            label = "".join(w.capitalize() for w in words)
+        else:
+            label = "_".join(words).upper()
+        items.append({"label": label, "sortText": f"{rnd.randint(0, 99):02d}{label}"})
+    return items
+
+
+def _legacy_filter(items, word, limit):
+    """The per-keystroke filter _on_completion used to run: lowercase
+    startswith over every item, then a full sort by sortText."""
+    word = word.lower()
+    if word:
+        items = [it for it in items
+                 if (it.get("filterText") or it.get("label") or "").lower()
+                 .startswith(word)]
+    items = sorted(items, key=lambda it: (it.get("sortText") is None,
+                                          it.get("sortText") or "",
+                                          it.get("label") or ""))
+    return items[:limit]
+
+
+def bench_match(count=20000, limit=50):
+    """Typing "string" after "std::" against a 20k-item list: the reply
+    shown unfiltered, then one re-filter per keystroke. The old prefix
+    filter + full sort vs the fuzzy matcher (built once per reply, narrowing
+    as the word grows) and its prefix-only mode."""
+    print(f"match: {count:,}-item completion list, top {limit}")
+    items = _synthetic_completions(count)
+    word = "string"
+    build = LSPClient.LanguageServerClient._completion_matcher
+    matcher = build(items)
+
+    def legacy():
+        for n in range(1, len(word) + 1):
+            _legacy_filter(items, word[:n], limit)
+
+    def typing(prefix):
+        for n in range(1, len(word) + 1):
+            matcher.top(word[:n], limit, prefix=prefix)
+
+    _report("reply (build, unfiltered)",
+            _timeit(lambda: _legacy_filter(items, "", limit), 3),
+            _timeit(lambda: build(items).top("", limit), 3))
+    before = _timeit(legacy, 3) / len(word)
+    _report("per keystroke, fuzzy", before,
+            _timeit(lambda: typing(False), 3) / len(word))
+    _report("per keystroke, prefix", before,
+            _timeit(lambda: typing(True), 3) / len(word))
+
+
+# -- watched files -----------------------------------------------------------
+
+def _legacy_snapshot(root, extensions, ignore):
+    """The full os.walk + getmtime snapshot the update loop used to take every
+    few seconds (the caller then diffed it against the previous one)."""
+    snap = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in ignore]
+        for fn in filenames:
+            if fn.endswith(extensions):
+                path = os.path.join(dirpath, fn)
+                try:
+                    snap[path] = os.path.getmtime(path)
+                except OSError:
+                    pass
+    return snap
+
+
+def bench_watch(files=20000, per_dir=50):
+    """One change check over a temporary tree of 20k source files with
+    nothing changed: the old full snapshot vs a poll-backend cycle (the
+    fallback watcher; inotify / ReadDirectoryChangesW cost nothing while the
+    tree is idle)."""
+    import shutil
+    import tempfile
+    import LSPWatcher
+    print(f"watch: {files:,}-file tree, no changes")
+    root = tempfile.mkdtemp(prefix="lspbench")
+    try:
+        for i in range(files):
+            d = os.path.join(root, f"pkg{i // (per_dir * 20)}", f"mod{i // per_dir}")
+            if i % per_dir == 0:
+                os.makedirs(d)
+            with open(os.path.join(d, f"f{i}.py"), "w") as f:
+                f.write("x = 1\n")
+        watcher = LSPWatcher.WorkspaceWatcher(root, lambda p: p.endswith(".py"))
+        poll = LSPWatcher._PollBackend(watcher)
+        poll.setup()
+        _report("change check", _timeit(lambda: _legacy_snapshot(
+                    root, (".py",), frozenset()), 3),
+                _timeit(poll.cycle, 3))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+# -- semantic tokens ---------------------------------------------------------
+
+def _legacy_decode_tokens(data, types):
+    """Dict-per-token decoding of a whole semanticTokens result."""
+    out = []
+    line = char = 0
+    for i in range(0, len(data), 5):
+        dline, dchar, length, ttype, mods = data[i:i + 5]
+        line += dline
+        char = dchar if dline else char + dchar
+        out.append({"line": line, "character": char, "length": length,
+                    "type": types[ttype], "modifiers": mods})
+    return out
+
+
+def bench_tokens(lines=50000, per_line=8, visible=60):
+    """Semantic tokens for a 50k-line file (~400k tokens): a full result
+    decoded into a dict per token vs stored as an array('I') with only the
+    visible lines decoded, then one edited line arriving as a delta."""
+    import LSPSemantic
+    print(f"tokens: {lines:,}-line file, {lines * per_line:,} tokens, "
+          f"{visible} visible lines")
+    rnd = random.Random(7)
+    data = []
+    for _ in range(lines):
+        char = 0
+        for n in range(per_line):
+            step = rnd.randint(1, 6)
+            data += [1 if n == 0 else 0, step if n else char + step,
+                     rnd.randint(1, 8), rnd.randint(0, 9), rnd.randint(0, 3)]
+            char += step
+    legend = {"tokenTypes": list(LSPSemantic.TOKEN_TYPES),
+              "tokenModifiers": list(LSPSemantic.TOKEN_MODIFIERS)}
+    tokens = LSPSemantic.SemanticTokens(legend)
+    middle = lines // 2
+
+    def current():
+        tokens.set_full(data, "1")
+        tokens.in_range(middle, middle + visible)
+
+    edit = [{"start": middle * per_line * 5, "deleteCount": per_line * 5,
+             "data": data[:per_line * 5]}]
+
+    def delta():
+        tokens.apply_delta(edit, "2")
+        tokens.in_range(middle, middle + visible)
+
+    before = _timeit(lambda: _legacy_decode_tokens(data, legend["tokenTypes"]), 1)
+    _report("full result", before, _timeit(current, 3))
+    _report("one-line delta", before, _timeit(delta, 3))
+    print(f"  {'':<28} (numpy: {'yes' if LSPSemantic.numpy else 'no'})")
+
+
+# -- project roots -----------------------------------------------------------
+
+def _legacy_find_project_root(file_path, markers):
+    """The exists()/glob() per marker per ancestor walk ensure_started ran."""
+    import glob
+    d = os.path.dirname(os.path.abspath(file_path))
+    cur = d
+    while True:
+        for m in markers:
+            if "*" in m or "?" in m:
+                if glob.glob(os.path.join(cur, m)):
+                    return cur
+            elif os.path.exists(os.path.join(cur, m)):
+                return cur
+        parent = os.path.dirname(cur)
+        if parent == cur:
+            return d
+        cur = parent
+
+
+def bench_root(depth=12, files=50):
+    """Root discovery for 50 files 12 directories below a C# solution root
+    (markers *.sln, *.csproj plus the defaults): per-marker stats vs one
+    listing per directory, then with the directory cache warm."""
+    import shutil
+    import tempfile
+    print(f"root: {files} files {depth} dirs below the root")
+    markers = ("*.sln", "*.csproj") + LSPClient._DEFAULT_ROOT_MARKERS
+    root = tempfile.mkdtemp(prefix="lspbench")
+    try:
+        open(os.path.join(root, "game.sln"), "w").close()
+        deep = os.path.join(root, *(f"d{i}" for i in range(depth)))
+        paths = []
+        for i in range(files):
+            d = os.path.join(deep, f"m{i % 5}")
+            os.makedirs(d, exist_ok=True)
+            paths.append(os.path.join(d, f"f{i}.cs"))
+
+        def cold():
+            for p in paths:
+                LSPClient._ROOT_CACHE.clear()
+                LSPClient.find_project_root(p, markers)
+
+        def warm():
+            for p in paths:
+                LSPClient.find_project_root(p, markers)
+
+        before = _timeit(lambda: [_legacy_find_project_root(p, markers)
+                                  for p in paths], 3)
+        _report("uncached", before, _timeit(cold, 3))
+        _report("cached", before, _timeit(warm, 3))
+    finally:
+        LSPClient._ROOT_CACHE.clear()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+# -- workspace symbols -------------------------------------------------------
+
+def _synthetic_symbols(files, per_file, seed=9):
+    """Symbol tuples (see LSPSymbols.SymbolIndex) for a codebase of `files`
+    files: CamelCase types and snake_case functions built from a few common
+    words and a couple of thousand project-specific ones."""
+    rnd = random.Random(seed)
+    common = ("request", "handle", "buffer", "parse", "node", "index", "file",
+              "cursor", "render", "token", "cache", "state", "update", "view",
+              "line", "panel", "symbol", "read", "write", "event", "text")
+    syllables = ("ka", "lo", "mi", "tre", "vor", "sen", "qua", "dil", "pho",
+                 "rax", "bel", "tun", "gri", "zo", "fen", "wis")
+    vocabulary = sorted({"".join(rnd.choice(syllables)
+                                 for _ in range(rnd.randint(2, 3)))
+                         for _ in range(2500)})
+    out = []
+    for f in range(files):
+        path = f"/src/mod{f // 100}/file{f}.rs"
+        for i in range(per_file):
+            words = [rnd.choice(common) if rnd.random() < 0.3
+                     else rnd.choice(vocabulary)
+                     for _ in range(rnd.randint(1, 4))]
+            if i % 3 == 0:
+                out.append(("".join(w.capitalize() for w in words), 23, "",
+                            path, i * 10, 4))
+            else:
+                out.append(("_".join(words), 12, "", path, i * 10, 7))
+    return out
+
+
+def _legacy_symbol_scan(symbols, query, limit):
+    """A substring scan over every symbol, shortest names first."""
+    q = query.lower()
+    found = [s for s in symbols if q in s[0].lower()]
+    found.sort(key=lambda s: (len(s[0]), s[0].lower()))
+    return found[:limit]
+
+
+def bench_symbols(files=5000, per_file=40, limit=200):
+    """Workspace-symbol lookups against 200k symbols (a 2M-line codebase):
+    a substring scan of every symbol vs the trigram index, for queries that
+    narrow to a few matches and ones matching thousands; then refreshing one
+    file's symbols after a save."""
+    from LSPSymbols import SymbolIndex
+    symbols = _synthetic_symbols(files, per_file)
+    print(f"symbols: {len(symbols):,} symbols in {files:,} files, top {limit}")
+    index = SymbolIndex()
+    index.add(symbols)
+    for query in ("RequestCursorToken", "parse_node", "render"):
+        _report(f"query '{query}'",
+                _timeit(lambda: _legacy_symbol_scan(symbols, query, limit), 3),
+                _timeit(lambda: index.search(query, limit), 3))
+    path = symbols[0][3]
+    mine = [s for s in symbols if s[3] == path]
+    _report("documentSymbol refresh",
+            _timeit(lambda: [s for s in symbols if s[3] != path] + mine, 3),
+            _timeit(lambda: index.replace_path(path, mine), 3))
+
+
+BENCHMARKS = {
+    "diff": bench_diff,
+    "hunks": bench_hunks,
+    "uri": bench_uri,
+    "match": bench_match,
+    "watch": bench_watch,
+    "root": bench_root,
+    "tokens": bench_tokens,
+    "symbols": bench_symbols,
+}
+
+
+def main(argv):
+    names = argv or list(BENCHMARKS)
+    for name in names:
+        fn = BENCHMARKS.get(name)
+        if fn is None:
+            print(f"unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+            return 1
+        fn()
+    return 0
+
+
+if __name__ == "__main__" and not _IN_EDITOR:
+    sys.exit(main(sys.argv[1:]))
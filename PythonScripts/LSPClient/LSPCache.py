@@ -0,0 +1,179 @@
+# LSPCache.py - Results persisted across editor restarts for LSPClient
+#
+# A language server starts cold with every editor restart: no diagnostics and
+# no symbols until it has indexed the workspace, which for Roslyn on a large
+# solution takes a minute. The results it produced last time are usually
+# still right - most files haven't changed since - so LSPClient keeps them in
+# a per-server, per-workspace store and shows them at startup until fresh
+# ones arrive:
+#   - one zlib-compressed JSON file per (client, root) holds, per file, its
+#     last diagnostics, pull-diagnostics result id and document symbols;
+#   - each entry is stamped with the file's mtime, size and a hash of its
+#     contents. On load an entry survives if the file's mtime and size are
+#     unchanged, or, when only the mtime moved (a checkout or build that
+#     rewrote it), if its contents still hash the same;
+#   - results are only stored for files whose contents on disk are what the
+#     server was looking at, so unsaved edits never end up in the store;
+#   - all file I/O happens on a worker thread: loading, checking the files
+#     and writing the store never block the editor.
+#
+# No N10X dependency - LSPClient imports it.
+# ---------------------------------------------------------------------------
+
+import os
+import json
+import zlib
+import queue
+import hashlib
+import threading
+
+# Bumped whenever the entry layout changes; older stores are ignored.
+_VERSION = 1
+# Store path -> the worker thread of the last ResultCache opened on it. A new
+# one waits (on its own worker) for the previous one's writes before loading.
+_WORKERS = {}
+
+
+def default_path(name, root):
+    """The store for client `name` working on `root`: under %LOCALAPPDATA%
+    on Windows, else ~/.cache."""
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(
+        os.path.expanduser("~"), ".cache")
+    tag = hashlib.sha1(os.path.normcase(root).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(base, "10x", "LSPCache", f"{name}-{tag}.cache")
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _normalise(text):
+    return text.replace("\r\n", "\n")
+
+
+class ResultCache:
+    """Per-file results of one server and workspace, kept in the file at
+    `path`.
+
+    An entry is a dict with "path", "mtime" (ns), "size" and "hash" plus the
+    stored fields - "diagnostics", "result_id", "symbols" - each optional.
+    load() queues reading the store; loaded() then hands the entries still
+    valid to the caller, once. store() queues results to merge in and write
+    out. close() lets the worker finish queued work and exit."""
+
+    def __init__(self, path):
+        self.path = path
+        self.error = None            # last I/O error, for status output
+        self.stats = {"restored": 0, "stale": 0, "stored": 0, "unsaved": 0}
+        self._entries = {}           # normcased path -> entry (worker only)
+        self._loaded = None
+        self._jobs = queue.Queue()
+        self._previous = _WORKERS.get(path)
+        self._thread = _WORKERS[path] = threading.Thread(target=self._work,
+                                                         daemon=True)
+        self._thread.start()
+
+    def load(self):
+        self._jobs.put((self._load, ()))
+
+    def loaded(self):
+        """The valid entries once loading has finished, else None."""
+        entries, self._loaded = self._loaded, None
+        return entries
+
+    def store(self, results):
+        """Merge (path, text, fields) results in: `fields` holds the new
+        values for the file at `path`, and `text` is the document text they
+        describe, or None if they describe the file on disk. Results for a
+        document that differs from the file on disk are dropped."""
+        self._jobs.put((self._store, (results,)))
+
+    def close(self, wait=0.0):
+        """Stop once queued work is done. Only waits (up to `wait` seconds)
+        when asked - at exit, where the process would kill the worker."""
+        self._jobs.put(None)
+        if wait:
+            self._thread.join(wait)
+
+    # -- worker thread -----------------------------------------------------
+
+    def _work(self):
+        if self._previous is not None:
+            self._previous.join()
+            self._previous = None
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            fn, args = job
+            try:
+                fn(*args)
+            except Exception as e:
+                self.error = f"{type(e).__name__}: {e}"
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                data = json.loads(zlib.decompress(f.read()))
+        except FileNotFoundError:
+            data = None
+        except (OSError, ValueError, zlib.error) as e:
+            self.error = f"unreadable, starting afresh ({e})"
+            data = None
+        entries = []
+        if data and data.get("version") == _VERSION:
+            for entry in data.get("files") or ():
+                if self._still_valid(entry):
+                    self._entries[os.path.normcase(entry["path"])] = entry
+                    entries.append(entry)
+                else:
+                    self.stats["stale"] += 1
+        self.stats["restored"] = len(entries)
+        self._loaded = entries
+
+    @staticmethod
+    def _still_valid(entry):
+        try:
+            st = os.stat(entry["path"])
+            if st.st_size != entry["size"]:
+                return False
+            if st.st_mtime_ns == entry["mtime"]:
+                return True
+            with open(entry["path"], "rb") as f:
+                if _digest(f.read()) != entry["hash"]:
+                    return False
+        except (OSError, KeyError, TypeError):
+            return False
+        entry["mtime"] = st.st_mtime_ns
+        return True
+
+    def _store(self, results):
+        entries = self._entries
+        for path, text, fields in results:
+            key = os.path.normcase(path)
+            try:
+                st = os.stat(path)
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                entries.pop(key, None)       # deleted, or unreadable
+                continue
+            if text is not None and _normalise(
+                    data.decode("utf-8", "replace")) != _normalise(text):
+                self.stats["unsaved"] += 1
+                continue
+            digest = _digest(data)
+            entry = entries.get(key)
+            if entry is None or entry.get("hash") != digest:
+                # New contents: whatever was stored describes the old ones.
+                entry = entries[key] = {"path": path, "hash": digest}
+            entry.update(fields, mtime=st.st_mtime_ns, size=st.st_size)
+            self.stats["stored"] += 1
+        payload = zlib.compress(json.dumps(
+            {"version": _VERSION, "files": list(entries.values())},
+            separators=(",", ":")).encode("utf-8"))
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, self.path)
@@ -3,8 +3,8 @@
 # A reusable LSP client that can be driven by any language server. It handles
 # the transport (JSON-RPC over the server's stdio), the document-sync
 # lifecycle, diagnostics and the common editor features (completion, hover,
-# signature help, go-to-definition, find-references), and wires them into the
-# 10x editor event hooks.
+# signature help, go-to-definition, find-references, workspace symbols), and
+# wires them into the 10x editor event hooks.
 #
 # This file defines classes only - importing it has NO side effects (it never
 # registers editor hooks on its own). To use it, create a per-language script
@@ -21,6 +21,7 @@
 #
 #     def MyLang_Completion():     client.complete()
 #     def MyLang_GotoDefinition(): client.goto_definition()
+#     def MyLang_WorkspaceSymbol(): client.workspace_symbol()
 #     ...
 #     N10X.Editor.CallOnMainThread(client.register)
 #
@@ -57,12 +58,54 @@
 #     <name>.MaxResults     Max completion items to show, most-relevant first
 #                           (default 50). Useful for servers like rust-analyzer
 #                           that return the whole scope.
+#     <name>.MaxReferences  Max find-references results listed at once (default
+#                           1000); "<name> more references" pages through the
+#                           rest.
+#     <name>.FuzzyCompletion  "true"/"false" - fuzzy-match completion items
+#                           against the typed word ("gfn" -> getFileName), best
+#                           matches first (default true). "false" keeps only
+#                           items starting with the word.
+#     <name>.FileWatcher    auto | poll - how workspace files are watched for
+#                           servers that ask for it (ols). "auto" (default)
+#                           uses OS change notifications, "poll" re-scans on a
+#                           timer (for network drives).
+#     <name>.KeepAliveSeconds  How long a server keeps running after the last
+#                           file it handles is closed (default 300; 0 = stop at
+#                           once). Reopening a file under the same root within
+#                           that time reattaches to it - no restart/reindex.
+#     <name>.KeepAliveMaxMemoryMB  A kept-alive server using more memory than
+#                           this is stopped early (default 4096; 0 = no limit).
 #     <name>.LogVerbose     "true"/"false" - log server traffic to the output
 #                           panel (default false)
+#     <name>.PumpBudgetMs   Milliseconds per editor update spent handling server
+#                           messages (default 8; grows automatically while a
+#                           backlog drains). Replies to completion/hover/etc.
+#                           are always handled first and never budgeted. The
+#                           same budget spreads the didOpen of restored tabs
+#                           over updates (focused and recently focused first).
+#     <name>.LazyOpen       "true"/"false" - only tell the server about a file
+#                           once it's first focused, rather than about every
+#                           open tab (default false). Saves server memory and
+#                           startup work for workspaces with many tabs.
+#     <name>.JsonCodec      auto | orjson | ujson | json - JSON library used on
+#                           the wire. "auto" (default) picks orjson or ujson when
+#                           installed into 10x's Python, else the stdlib json.
+#     <name>.LatencyLogSeconds  Log request latency percentiles every this many
+#                           seconds while requests are being answered (default
+#                           0 = off). "<name> latency" shows them on demand.
+#     <name>.PersistentCache  "true"/"false" - keep each file's diagnostics and
+#                           document symbols on disk (see LSPCache) and show
+#                           them at startup until the server has fresh ones
+#                           (default true).
+#     <name>.RecordTraffic  File to record the server traffic to (JSONL, one
+#                           timestamped message per line, rewritten on each
+#                           server start), for offline replay with LSPReplay.py.
+#                           Default unset (off).
 #
-# Threading: a background thread only reads/parses the server's stdout. Every
-# N10X.Editor.* call happens on the main thread inside the update loop, so the
-# editor is never blocked waiting on the server.
+# Threading: a background thread reads/parses the server's stdout and another
+# serialises and writes outgoing messages. Every N10X.Editor.* call happens on
+# the main thread inside the update loop, so the editor is never blocked
+# waiting on the server or on JSON encoding.
 #
 # Coordinates: LSP positions are 0-based (line, character), matching 10x's
 # (column, line) cursor coordinates. Characters are treated as column indices,
@@ -71,17 +114,62 @@
 
 import os
 import re
-import glob
+import fnmatch
 import html
 import json
 import time
 import queue
 import shutil
+import sys
 import threading
 import subprocess
+from collections import deque, OrderedDict
+import urllib.parse
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import accumulate
 
 import N10X
 
+try:
+    from LSPCache import ResultCache, default_path as _cache_path
+    from LSPMatcher import FuzzyMatcher
+    from LSPSymbols import SYMBOL_KINDS, SymbolIndex
+    from LSPWatcher import CHANGED, WatchFilter, WorkspaceWatcher
+except ImportError:
+    # Same fallback as the per-language scripts: add this file's folder (which
+    # also holds LSPCache.py / LSPMatcher.py / LSPSymbols.py / LSPWatcher.py)
+    # to sys.path and retry.
+    try:
+        _here = os.path.dirname(os.path.abspath(__file__))
+        if _here not in sys.path:
+            sys.path.append(_here)
+    except NameError:
+        pass
+    from LSPCache import ResultCache, default_path as _cache_path
+    from LSPMatcher import FuzzyMatcher
+    from LSPSymbols import SYMBOL_KINDS, SymbolIndex
+    from LSPWatcher import CHANGED, WatchFilter, WorkspaceWatcher
+
+# Optional faster JSON codecs. Neither ships with 10x's Python; install one
+# into it (e.g. pip install --target=<10x>/Lib/site-packages orjson) and the
+# transport picks it up automatically - see make_codec. The stdlib json module
+# is always the fallback.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ujson
+except ImportError:
+    ujson = None
+# Optional: resident-memory readings for parked servers (see ServerPool). Without
+# it /proc (Linux) or GetProcessMemoryInfo (Windows) is used.
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
 _NO_WINDOW = getattr(subprocess, "CREATE_NO_WINDOW", 0)
 _SEVERITY = {1: "Error", 2: "Warning", 3: "Info", 4: "Hint"}
 # LSP severity -> MSVC compiler keyword. 10x parses build output in the Visual
@@ -95,6 +183,58 @@ _MSVC_SEVERITY = {1: "error", 2: "warning", 3: "note", 4: "note"}
 _SEVERITY_LEVELS = {"error": 1, "errors": 1, "warning": 2, "warnings": 2,
                     "info": 3, "information": 3, "hint": 4, "hints": 4,
                     "all": 4}
+# Requests the user is actively waiting on. Their replies jump the message
+# pump's queue (see LanguageServerClient.pump) ahead of bulk traffic such as
+# publishDiagnostics floods after a reindex.
+_PRIORITY_METHODS = frozenset((
+    "textDocument/completion", "textDocument/hover",
+    "textDocument/signatureHelp", "textDocument/definition",
+    "textDocument/references", "workspace/symbol"))
+# Requests superseded by the next one of the same method: the older one is
+# cancelled ($/cancelRequest) as soon as a newer one is sent.
+_SUPERSEDED_METHODS = frozenset((
+    "textDocument/completion", "textDocument/hover",
+    "textDocument/signatureHelp", "textDocument/references",
+    "workspace/symbol"))
+# Requests legitimately slower than _request_timeout allows: a diagnostics pull
+# may wait for the server to finish indexing, and a streamed references /
+# workspace-symbol search keeps delivering batches well past it. Seconds.
+_REQUEST_TIMEOUTS = {
+    "textDocument/diagnostic": 300.0, "textDocument/references": 300.0,
+    "workspace/symbol": 300.0}
+# Requests whose non-empty replies are cached per document version (see
+# LanguageServerClient._cached_request), and how many replies are kept.
+_CACHED_METHODS = frozenset((
+    "textDocument/hover", "textDocument/signatureHelp",
+    "textDocument/definition"))
+_RESPONSE_CACHE_SIZE = 256
+# Request round trips are split into these segments (see LatencyStats), and
+# the last _LATENCY_WINDOW replies per method are kept for percentiles.
+_LATENCY_SEGMENTS = ("total", "write", "server", "decode", "queue", "handle")
+_LATENCY_WINDOW = 256
+# While find-references results stream in ($/progress partial results), the
+# list shown is refreshed at most this often (seconds).
+_REFERENCE_REFRESH = 0.25
+# Workspace-symbol matches listed per query. A workspace/symbol reply with at
+# least _SYMBOL_REPLY_CAP symbols is taken to have been cut short by the server
+# (clangd stops at 100, rust-analyzer at 128), so it doesn't stand in for
+# longer queries (see LSPSymbols.SymbolIndex.answered).
+_SYMBOL_RESULTS = 200
+_SYMBOL_REPLY_CAP = 100
+# Without a file watcher nothing reports files changed on disk by other tools
+# (a checkout, a generator), so the server's answers only stand in for it for
+# this many seconds.
+_SYMBOL_ANSWER_TTL = 60.0
+# Most messages pump moves from the reader thread's queue into its lanes per
+# tick. Draining is cheap (no handling), this just bounds a pathological flood.
+_PUMP_MAX_DRAIN = 5000
+# Diagnostics restored from the persistent cache (see LSPCache) are dropped
+# once the server has published no fresh diagnostics for this many seconds:
+# by then it has reported every file it's going to.
+_CACHED_DIAG_SETTLE = 30.0
+# Diagnostics covering more lines than this aren't copied onto each line of
+# the per-line index (see _index_diagnostics); they're checked separately.
+_DIAG_INDEX_SPAN = 200
 # Note: ".git" is deliberately NOT a marker. A git submodule has its own .git
 # entry, so find_project_root (which stops at the innermost dir with a marker)
 # would pick the submodule rather than walking up to the real workspace root.
@@ -119,60 +259,122 @@ def _log(tag, msg):
 # Path / URI helpers
 # ===========================================================================
 
-def path_to_uri(path):
+# path_to_uri leaves ASCII letters, digits, "-_.~" and these path-legal
+# characters as-is and percent-encodes everything else as UTF-8 - the same rule
+# as urllib.parse.quote(path, safe=_URI_SAFE). Pure-ASCII paths (nearly all of
+# them) are quoted in one str.translate pass through _URI_QUOTE.
+_URI_SAFE = "/:!$&'()*+,;=@"
+_URI_QUOTE = {c: "%%%02X" % c for c in range(128)
+              if not (chr(c).isalnum() or chr(c) in "-_.~" + _URI_SAFE)}
+
+
+# Both conversions run for every diagnostic publish, reference and watched
+# file, over a working set of a few thousand distinct files, so they're
+# memoised (bounded LRU keyed on the input string).
+@lru_cache(maxsize=8192)
+def _path_to_uri(path):
     path = os.path.abspath(path).replace("\\", "/")
     if not path.startswith("/"):
         path = "/" + path  # drive-letter paths -> /C:/...
-    safe = []
-    for ch in path:
-        if ch.isalnum() or ch in "/-_.~:!$&'()*+,;=@":
-            safe.append(ch)
-        else:
-            safe.append("%%%02X" % ord(ch))
-    return "file://" + "".join(safe)
+    if path.isascii():
+        return "file://" + path.translate(_URI_QUOTE)
+    return "file://" + urllib.parse.quote(path, safe=_URI_SAFE)
 
 
+def path_to_uri(path):
+    if not os.path.isabs(path):
+        # Relative to the cwd, which may change - resolve before the cache.
+        path = os.path.abspath(path)
+    return _path_to_uri(path)
+
+
+@lru_cache(maxsize=8192)
 def uri_to_path(uri):
     if uri.startswith("file://"):
         uri = uri[len("file://"):]
-    out = []
-    i = 0
-    while i < len(uri):
-        if uri[i] == "%" and i + 2 < len(uri):
-            try:
-                out.append(chr(int(uri[i + 1:i + 3], 16)))
-                i += 3
-                continue
-            except ValueError:
-                pass
-        out.append(uri[i])
-        i += 1
-    path = "".join(out)
+    path = urllib.parse.unquote(uri) if "%" in uri else uri
     if len(path) >= 3 and path[0] == "/" and path[2] == ":":
         path = path[1:]  # /C:/... -> C:/...
     return os.path.normpath(path)
 
 
-def find_project_root(file_path, markers):
-    """Walk up from a file looking for a project marker; fall back to its dir.
+# Resolved project roots: (markers, normcased dir) -> (root, expiry), root
+# None when no ancestor has a marker. Every directory walked through is
+# recorded, so the next file in the same tree stops at its first cached
+# ancestor instead of listing each parent again - on a network drive each
+# listing costs milliseconds. Entries expire after _ROOT_TTL seconds, so a
+# marker created later (a new pyproject.toml or *.csproj) is picked up by the
+# next file opened after that even when nothing reports it: most servers
+# register no file watchers, and the watchers' include filters may not cover
+# markers. Watched creates/deletes also drop the affected entries at once
+# (invalidate_project_roots).
+_ROOT_CACHE = {}
+_ROOT_TTL = 10.0
+
+
+def _dir_has_marker(d, markers):
+    """True if directory `d` contains any of `markers`, from one os.scandir
+    listing rather than an exists()/glob() call per marker."""
+    try:
+        with os.scandir(d) as it:
+            names = [os.path.normcase(e.name) for e in it]
+    except OSError:
+        return False
+    present = set(names)
+    for m in markers:
+        if "*" in m or "?" in m:
+            if fnmatch.filter(names, m):
+                return True
+        elif os.path.normcase(m) in present:
+            return True
+    return False
+
+
+def find_project_root(file_path, markers, fallback=True):
+    """Walk up from a file looking for a project marker; fall back to its dir
+    (or None with fallback=False).
 
     A marker is normally a literal filename (e.g. "Cargo.toml"), but one that
     contains a shell wildcard ("*" or "?") is matched as a glob against the
     directory's contents - so a language whose project files are variably named
-    (e.g. C#'s "*.sln"/"*.csproj") can still find its root."""
+    (e.g. C#'s "*.sln"/"*.csproj") can still find its root. Results are cached
+    per directory (see _ROOT_CACHE)."""
     d = os.path.dirname(os.path.abspath(file_path))
+    markers = tuple(markers)
+    walked = []
     cur = d
+    now = time.monotonic()
     while True:
-        for m in markers:
-            if "*" in m or "?" in m:
-                if glob.glob(os.path.join(cur, m)):
-                    return cur
-            elif os.path.exists(os.path.join(cur, m)):
-                return cur
+        key = (markers, os.path.normcase(cur))
+        cached = _ROOT_CACHE.get(key)
+        if cached is not None and cached[1] > now:
+            root = cached[0]
+            break
+        walked.append(key)
+        if _dir_has_marker(cur, markers):
+            root = cur
+            break
         parent = os.path.dirname(cur)
         if parent == cur:
-            return d
+            root = None
+            break
         cur = parent
+    entry = (root, now + _ROOT_TTL)
+    for key in walked:
+        _ROOT_CACHE[key] = entry
+    if root is None and fallback:
+        return d
+    return root
+
+
+def invalidate_project_roots(path):
+    """Forget cached roots that a file created or deleted at `path` could
+    change: those of its directory and everything below it."""
+    d = os.path.normcase(os.path.dirname(os.path.abspath(path)))
+    prefix = d.rstrip(os.sep) + os.sep
+    for key in [k for k in _ROOT_CACHE
+                if k[1] == d or k[1].startswith(prefix)]:
+        del _ROOT_CACHE[key]
 
 
 def extract_markup(contents):
@@ -266,42 +468,484 @@ def offset_to_pos(text, offset):
     return {"line": line, "character": offset - (last_nl + 1)}
 
 
+class LineIndex:
+    """Start offset of every line in a document, kept in step with the edits
+    we send so offset -> position is a bisect rather than a newline count from
+    offset zero.
+
+    An edit only rewrites the line starts inside the edited range; every later
+    start moves by the same amount, so that shift is held as one pending delta
+    (applied to starts at index >= _pivot) instead of rewriting the tail of
+    the list. The next edit settles only the starts between the old and new
+    pivot, which for ordinary typing is a handful of lines."""
+
+    def __init__(self, text):
+        # starts[k] = sum(len(line) + 1 for the k lines before it), built from
+        # C-level split/map/accumulate so even a 100k-line file indexes fast.
+        lens = map((1).__add__, map(len, text.split("\n")))
+        self._starts = [0]
+        self._starts.extend(accumulate(lens))
+        self._starts.pop()  # the last sum is len(text) + 1, not a line start
+        self._pivot = len(self._starts)
+        self._delta = 0
+
+    def __len__(self):
+        return len(self._starts)
+
+    def start(self, line):
+        """Offset of the first character of `line`."""
+        s = self._starts[line]
+        return s + self._delta if line >= self._pivot else s
+
+    def line_of(self, offset):
+        """Line containing `offset`."""
+        starts, p = self._starts, self._pivot
+        if p < len(starts) and offset >= starts[p] + self._delta:
+            return bisect_right(starts, offset - self._delta, p) - 1
+        return bisect_right(starts, offset, 0, p) - 1
+
+    def position(self, offset):
+        """LSP {line, character} for `offset`."""
+        line = self.line_of(offset)
+        return {"line": line, "character": offset - self.start(line)}
+
+    def _settle(self, k):
+        """Move the pending-delta boundary to index k without changing any
+        effective offset."""
+        p, d, st = self._pivot, self._delta, self._starts
+        if p > k:
+            st[k:p] = [x - d for x in st[k:p]]
+        elif p < k:
+            st[p:k] = [x + d for x in st[p:k]]
+        self._pivot = k
+
+    def apply(self, start, end, text):
+        """Update for old[start:end] being replaced by `text`."""
+        a = self.line_of(start)
+        b = self.line_of(end)
+        new = []
+        i = text.find("\n")
+        while i >= 0:
+            new.append(start + i + 1)
+            i = text.find("\n", i + 1)
+        self._settle(b + 1)
+        # Lines a+1..b began inside the replaced range; swap in the new ones.
+        self._starts[a + 1:b + 1] = new
+        self._pivot = a + 1 + len(new)
+        self._delta += len(text) - (end - start)
+
+
+def _common_prefix(a, ai, b, bi, n):
+    """Length of the common prefix of a[ai:ai + n] and b[bi:bi + n]. Halves
+    the range with in-place block compares (startswith copies only the probed
+    block of b), so only the last few characters are looked at one by one."""
+    lo, hi = 0, n
+    while hi - lo > 32:
+        mid = (lo + hi) // 2
+        if a.startswith(b[bi + lo:bi + mid], ai + lo):
+            lo = mid
+        else:
+            hi = mid
+    while lo < hi and a[ai + lo] == b[bi + lo]:
+        lo += 1
+    return lo
+
+
+def _common_suffix(a, ae, b, be, n):
+    """Length of the common suffix of a[ae - n:ae] and b[be - n:be]; the
+    mirror of _common_prefix."""
+    lo, hi = 0, n
+    while hi - lo > 32:
+        mid = (lo + hi) // 2
+        if a.startswith(b[be - mid:be - lo], ae - mid):
+            lo = mid
+        else:
+            hi = mid
+    while lo < hi and a[ae - lo - 1] == b[be - lo - 1]:
+        lo += 1
+    return lo
+
+
+def _diff_region(old, new, index):
+    """(start, end, text): the single range of `old` (offsets) that must be
+    replaced by `text` to get `new`, or None when they're equal.
+
+    Compares whole lines first - a bisect over `index`'s line starts with
+    block compares - and only then characters, inside the one line where the
+    texts diverge. Python-level work is O(log lines + line length); the rest
+    is C-level memory compares."""
+    if old == new:
+        return None
+    old_len, new_len = len(old), len(new)
+    shortest = min(old_len, new_len)
+    # Prefix: the last line whose start still lies inside the common prefix.
+    lo, hi = 0, index.line_of(shortest)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        s = index.start(mid)
+        base = index.start(lo)
+        if old.startswith(new[base:s], base):
+            lo = mid
+        else:
+            hi = mid - 1
+    line = lo
+    line_end = index.start(line + 1) if line + 1 < len(index) else old_len
+    base = index.start(line)
+    p = base + _common_prefix(old, base, new, base, min(line_end, shortest) - base)
+    # Suffix: the first line start (in old) from which old and new agree to the
+    # end, not reaching back into the common prefix on either side.
+    d = new_len - old_len
+    floor = max(p, p - d)
+    lo_line, hi_line = index.line_of(floor), len(index)
+    q = old_len  # old[q:] == new[q + d:]
+    while lo_line < hi_line:
+        mid = (lo_line + hi_line) // 2
+        s = index.start(mid)
+        if s < floor:
+            lo_line = mid + 1
+            continue
+        if old.startswith(new[s + d:q + d], s):
+            q, hi_line = s, mid
+        else:
+            lo_line = mid + 1
+    q -= _common_suffix(old, q, new, q + d, q - floor)
+    return p, q, new[p:q + d]
+
+
+# Hunk splitting (see _diff_regions). Regions shorter than _HUNK_SPLIT_MIN
+# characters go out as one range - resending a couple of KB costs the server
+# less than a second change to apply. Hunks closer than _HUNK_MERGE_GAP are
+# merged, and past _MAX_HUNKS the whole region is sent as a single range.
+_HUNK_SPLIT_MIN = 2048
+_HUNK_MERGE_GAP = 64
+_HUNK_ANCHOR = 48
+_MAX_HUNKS = 64
+
+
+def _find_near(text, needle, lo, hi, expect):
+    """Offset of the occurrence of `needle` in text[lo:hi] closest to
+    `expect`, or -1."""
+    after = text.find(needle, max(lo, expect), hi)
+    before = text.rfind(needle, lo, min(hi, expect + len(needle)))
+    if after < 0:
+        return before
+    if before < 0 or after - expect <= expect - before:
+        return after
+    return before
+
+
+def _split_hunks(old, new, o0, o1, n0, n1, out):
+    """Append (old_start, old_end, new_start, new_end) hunks that turn
+    old[o0:o1] into new[n0:n1]. A long region is split at an anchor - a few
+    whole lines from the middle of the old side, located in the new side with
+    str.find - and each half is trimmed and split again, so unchanged stretches
+    between separate edits are never resent."""
+    k = _common_prefix(old, o0, new, n0, min(o1 - o0, n1 - n0))
+    o0 += k
+    n0 += k
+    k = _common_suffix(old, o1, new, n1, min(o1 - o0, n1 - n0))
+    o1 -= k
+    n1 -= k
+    if o0 == o1 and n0 == n1:
+        return
+    if o1 - o0 >= _HUNK_SPLIT_MIN and len(out) < _MAX_HUNKS:
+        mid = old.find("\n", o0 + (o1 - o0) // 2, o1) + 1
+        end = old.find("\n", mid + _HUNK_ANCHOR, o1) if mid else -1
+        if end > 0:
+            at = _find_near(new, old[mid:end + 1], n0, n1, n0 + (mid - o0))
+            if at >= 0:
+                _split_hunks(old, new, o0, mid, n0, at, out)
+                _split_hunks(old, new, mid, o1, at, n1, out)
+                return
+    out.append((o0, o1, n0, n1))
+
+
+def _diff_regions(old, new, index):
+    """[(start, end, text)] ranges of `old` to replace to get `new`, last
+    first, so they can be applied (or sent as contentChanges) in order without
+    earlier ones shifting later positions. [] when the texts are equal.
+
+    _diff_region narrows to the span between the first and last difference;
+    for a long span (e.g. multi-cursor edits at the top and bottom of a file)
+    _split_hunks then breaks it into the separately edited stretches."""
+    region = _diff_region(old, new, index)
+    if region is None:
+        return []
+    start, end, text = region
+    if end - start < _HUNK_SPLIT_MIN:
+        return [region]
+    hunks = []
+    _split_hunks(old, new, start, end, start, start + len(text), hunks)
+    if len(hunks) > _MAX_HUNKS:
+        return [region]
+    merged = []
+    for h in hunks:
+        if merged and h[0] - merged[-1][1] < _HUNK_MERGE_GAP:
+            merged[-1] = (merged[-1][0], h[1], merged[-1][2], h[3])
+        else:
+            merged.append(h)
+    return [(o0, o1, new[n0:n1]) for o0, o1, n0, n1 in reversed(merged)]
+
+
+def incremental_changes(old, new, index=None):
+    """LSP incremental contentChanges describing old -> new ([] when the
+    text is unchanged): one range per separately edited stretch, last first,
+    as the server applies them in order. Positions are computed against
+    `old`, which is what the server currently holds; `index` is old's
+    LineIndex (built if omitted)."""
+    if index is None:
+        index = LineIndex(old)
+    return [{"range": {"start": index.position(start),
+                       "end": index.position(end)},
+             "text": text}
+            for start, end, text in _diff_regions(old, new, index)]
+
+
 def incremental_change(old, new):
     """Single LSP incremental contentChange describing old -> new (a range
     replace covering everything between the common prefix and common suffix),
     or None when the text is unchanged. Positions are computed against `old`,
     which is what the server currently holds."""
-    if old == new:
+    index = LineIndex(old)
+    region = _diff_region(old, new, index)
+    if region is None:
         return None
-    old_len, new_len = len(old), len(new)
-    p = 0
-    max_p = min(old_len, new_len)
-    while p < max_p and old[p] == new[p]:
-        p += 1
-    s = 0
-    max_s = min(old_len, new_len) - p
-    while s < max_s and old[old_len - 1 - s] == new[new_len - 1 - s]:
-        s += 1
-    return {"range": {"start": offset_to_pos(old, p),
-                      "end": offset_to_pos(old, old_len - s)},
-            "text": new[p:new_len - s]}
+    start, end, text = region
+    return {"range": {"start": index.position(start),
+                      "end": index.position(end)},
+            "text": text}
 
 
 # ===========================================================================
 # JSON-RPC transport over the server's stdio
 # ===========================================================================
 
+class JsonCodec:
+    """Serialises JSON-RPC bodies to/from UTF-8 bytes with the stdlib json
+    module. Subclasses swap in a faster library with the same contract; both
+    methods run on the connection's worker threads, never the main thread."""
+
+    name = "json"
+    # Everything dumps/loads may raise for a bad payload, across codecs.
+    errors = (TypeError, ValueError, OverflowError)
+
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    name = "orjson"
+
+    def dumps(self, obj):
+        return orjson.dumps(obj)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+class UjsonCodec(JsonCodec):
+    name = "ujson"
+
+    def dumps(self, obj):
+        return ujson.dumps(obj, ensure_ascii=False,
+                           escape_forward_slashes=False).encode("utf-8")
+
+    def loads(self, data):
+        return ujson.loads(data)
+
+
+def make_codec(preference="auto"):
+    """Codec for a "<name>.JsonCodec" setting value: "orjson", "ujson", "json",
+    or "auto" (the fastest one installed). A named codec that isn't installed
+    falls back to auto. Returns (codec, note) where note explains a fallback."""
+    available = {"orjson": OrjsonCodec if orjson else None,
+                 "ujson": UjsonCodec if ujson else None,
+                 "json": JsonCodec}
+    pref = (preference or "auto").strip().lower()
+    note = ""
+    if pref != "auto":
+        if available.get(pref):
+            return available[pref](), note
+        note = f"JSON codec '{pref}' not available; using auto"
+    for name in ("orjson", "ujson", "json"):
+        if available[name]:
+            return available[name](), note
+
+
+class FrameReader:
+    """Splits a raw byte stream into JSON-RPC message bodies (the
+    "Content-Length: N\\r\\n\\r\\n<body>" framing LSP uses).
+
+    Reads land in one reusable bytearray through a memoryview (readinto), in
+    chunks as large as the pipe will hand over, and complete messages are
+    sliced straight out of it - one copy per body, never a growing `body +=
+    chunk`. Unconsumed bytes are moved back to the front only when the free
+    space runs out, and the buffer grows to fit a message that's bigger than it
+    (then shrinks again once idle), so a multi-megabyte references reply costs
+    a handful of large reads instead of thousands of small ones.
+
+    Runs on the connection's reader thread; the counters are plain ints that
+    the main thread only reads (see stats)."""
+
+    CHUNK = 64 * 1024      # initial capacity and the size it shrinks back to
+
+    def __init__(self, stream, chunk=CHUNK):
+        self._stream = stream
+        self._chunk = chunk
+        self._buf = bytearray(chunk)
+        self._view = memoryview(self._buf)
+        self._start = 0    # first unconsumed byte
+        self._end = 0      # one past the last valid byte
+        self.messages = 0
+        self.bytes = 0
+        self.reads = 0
+        self.largest = 0
+        # Bytes/seconds spent receiving bodies that needed more than one read -
+        # the transfer rate the pipe actually sustains on large replies.
+        self.transfer_bytes = 0
+        self.transfer_time = 0.0
+
+    def _fill(self, need):
+        """Read until at least `need` unconsumed bytes are buffered. Raises
+        EOFError when the stream closes first."""
+        while self._end - self._start < need:
+            if len(self._buf) - self._start < need:
+                self._make_room(need)
+            n = self._stream.readinto(self._view[self._end:])
+            if not n:
+                raise EOFError()
+            self._end += n
+            self.reads += 1
+            self.bytes += n
+
+    def _make_room(self, need):
+        """Compact unconsumed bytes to the front, growing the buffer if even
+        that can't hold `need` bytes."""
+        pending = self._end - self._start
+        size = len(self._buf)
+        if need > size:
+            size = max(need, size * 2)
+        if size != len(self._buf):
+            buf = bytearray(size)
+            buf[:pending] = self._view[self._start:self._end]
+            self._view.release()
+            self._buf, self._view = buf, memoryview(buf)
+        elif pending:
+            # Same-size slice assignment never resizes, so this is allowed while
+            # the memoryview is exported. Copy via bytes() - the source and
+            # destination may overlap.
+            self._buf[:pending] = bytes(self._view[self._start:self._end])
+        self._start, self._end = 0, pending
+
+    def _read_headers(self):
+        """Consume one header block and return its Content-Length (0 when the
+        header is missing). Tolerates bare "\\n" line endings."""
+        length = 0
+        while True:
+            nl = self._buf.find(b"\n", self._start, self._end)
+            if nl < 0:
+                # Header lines are tiny; pull more and look again.
+                self._fill(self._end - self._start + 1)
+                continue
+            line = bytes(self._view[self._start:nl]).strip()
+            self._start = nl + 1
+            if not line:
+                return length  # blank line ends the header block
+            k, _, v = line.partition(b":")
+            if k.strip().lower() == b"content-length":
+                length = int(v.strip())
+
+    def next_message(self):
+        """Block until a complete message is buffered and return its body as
+        bytes. Raises EOFError when the server closes its stdout."""
+        while True:
+            length = self._read_headers()
+            if length > 0:
+                break
+        reads = self.reads
+        t0 = time.perf_counter()
+        self._fill(length)
+        if self.reads - reads > 1:
+            self.transfer_bytes += length
+            self.transfer_time += time.perf_counter() - t0
+        body = bytes(self._view[self._start:self._start + length])
+        self._start += length
+        self.messages += 1
+        if length > self.largest:
+            self.largest = length
+        if self._start == self._end:
+            self._start = self._end = 0
+            if len(self._buf) > 4 * self._chunk:
+                # Drop the room a huge reply needed rather than pin it forever.
+                self._view.release()
+                self._buf = bytearray(self._chunk)
+                self._view = memoryview(self._buf)
+        return body
+
+    def stats(self):
+        """Snapshot of the transport counters (safe to call from any thread)."""
+        rate = (self.transfer_bytes / self.transfer_time
+                if self.transfer_time > 0 else 0.0)
+        return {"messages": self.messages, "bytes": self.bytes,
+                "reads": self.reads, "largest": self.largest,
+                "buffer": len(self._buf), "transfer_rate": rate}
+
+
+class TrafficRecorder:
+    """Writes every JSON-RPC message of a connection to a JSONL file, one
+    {"t": seconds since start, "dir": "out" | "in", "msg": ...} per line, for
+    LSPReplay.py. Called from the reader and writer threads, hence the lock.
+    The message is the JSON already on the wire, so recording adds no
+    encoding - only a copy with any (whitespace-only) newlines blanked."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "wb")
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+
+    def record(self, direction, body):
+        if b"\n" in body or b"\r" in body:
+            body = body.replace(b"\r", b" ").replace(b"\n", b" ")
+        head = b'{"t":%.6f,"dir":"%s","msg":' % (
+            time.perf_counter() - self._t0, direction.encode("ascii"))
+        with self._lock:
+            if self._file is not None:
+                self._file.write(head + body + b"}\n")
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
 class LSPConnection:
     """Spawns the language server and pumps JSON-RPC messages over stdio.
 
-    Reading happens on a background thread (parsed messages are pushed onto
-    self.incoming). Writing happens from the main thread. All handling of the
-    parsed messages is done by the owner on the main thread.
+    Reading and decoding happen on a background thread (parsed messages are
+    pushed onto self.incoming). The main thread only hands outgoing Python
+    objects to self.outgoing; encoding, framing and the pipe write happen on the
+    writer thread. All handling of the parsed messages is done by the owner on
+    the main thread. `codec` is a JsonCodec (default: make_codec("auto")).
+    An optional TrafficRecorder is handed every message in both directions.
     """
 
-    def __init__(self, argv, cwd, log=None, verbose=None):
+    def __init__(self, argv, cwd, log=None, verbose=None, codec=None,
+                 recorder=None):
         self._log = log or (lambda m: None)
         self._verbose = verbose or (lambda: False)
+        self.codec = codec or make_codec()[0]
+        self.recorder = recorder
+        # request id -> perf_counter() when the writer thread finished writing
+        # it to the pipe; popped by the owner when the reply (or a cancel) is
+        # handled, and pruned of requests cancelled before they were written.
+        # Replies are stamped similarly on the reader thread (see _read_loop),
+        # which is how LanguageServerClient splits a round trip.
+        self.written = {}
         self.incoming = queue.Queue()
         self.outgoing = queue.Queue()
         self._next_id = 1
@@ -312,6 +956,9 @@ class LSPConnection:
             stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
             bufsize=0, creationflags=_NO_WINDOW)
         self.alive = True
+        # Unbuffered stdout (bufsize=0) is a raw FileIO, so FrameReader's
+        # readinto pulls whatever the pipe has straight into its own buffer.
+        self.reader = FrameReader(self.proc.stdout)
 
         self._reader = threading.Thread(target=self._read_loop, daemon=True)
         self._reader.start()
@@ -325,30 +972,41 @@ class LSPConnection:
     def _write(self, payload):
         if not self.alive or self.proc.stdin is None:
             return
+        # Hand the payload object to the writer thread, which serialises and
+        # writes it. Encoding a full-text didChange of a large file is the most
+        # expensive thing we send, and a server that is busy (e.g. reparsing)
+        # and not draining its stdin would block the write - either would
+        # stall the editor if done here on the main thread. Callers build a
+        # fresh payload per message and never touch it again, so sharing it
+        # with the writer thread needs no copy.
+        self.outgoing.put(payload)
+
+    def _encode(self, payload):
+        """Serialise and frame one payload (writer thread). None on failure."""
         try:
-            body = json.dumps(payload)
-        except (TypeError, ValueError) as e:
+            data = self.codec.dumps(payload)
+        except self.codec.errors as e:
             self._log(f"encode failed: {e}")
-            return
-        data = body.encode("utf-8")
-        header = ("Content-Length: %d\r\n\r\n" % len(data)).encode("ascii")
-        # Hand the framed bytes to the writer thread instead of writing to the
-        # pipe here. A server that is busy (e.g. reparsing a large file) and not
-        # draining its stdin would otherwise block this call - and since _write
-        # runs on the editor's main thread, that freezes the editor.
-        self.outgoing.put(header + data)
+            return None
+        if self.recorder is not None:
+            self.recorder.record("out", data)
         if self._verbose():
-            self._log("--> " + body[:300])
+            self._log("--> " + data[:300].decode("utf-8", "replace"))
+        return ("Content-Length: %d\r\n\r\n" % len(data)).encode("ascii") + data
 
     def _write_loop(self):
-        # Runs on a background thread: the blocking write/flush happens here, off
-        # the main thread. No N10X.Editor calls (main-thread only) - logging uses
-        # plain print via self._log, which is thread-safe enough.
+        # Runs on a background thread: serialisation and the blocking
+        # write/flush happen here, off the main thread. No N10X.Editor calls
+        # (main-thread only) - logging uses plain print via self._log, which is
+        # thread-safe enough.
         stream = self.proc.stdin
         while True:
-            chunk = self.outgoing.get()
-            if chunk is None:  # shutdown sentinel
+            payload = self.outgoing.get()
+            if payload is None:  # shutdown sentinel
                 break
+            chunk = self._encode(payload)
+            if chunk is None:
+                continue
             try:
                 stream.write(chunk)
                 stream.flush()
@@ -356,6 +1014,8 @@ class LSPConnection:
                 self.alive = False
                 self._log(f"write failed: {e}")
                 break
+            if "method" in payload and "id" in payload:
+                self.written[payload["id"]] = time.perf_counter()
 
     def request(self, method, params):
         """Send a request, returning its id so the caller can match a reply."""
@@ -379,33 +1039,24 @@ class LSPConnection:
     # -- incoming ----------------------------------------------------------
 
     def _read_loop(self):
-        stream = self.proc.stdout
+        reader = self.reader
+        loads = self.codec.loads
+        errors = self.codec.errors
+        recorder = self.recorder
         try:
             while True:
-                headers = {}
-                while True:
-                    line = stream.readline()
-                    if not line:
-                        raise EOFError()
-                    line = line.strip()
-                    if not line:
-                        break  # blank line ends the header block
-                    if b":" in line:
-                        k, _, v = line.partition(b":")
-                        headers[k.strip().lower()] = v.strip()
-                length = int(headers.get(b"content-length", b"0"))
-                if length <= 0:
-                    continue
-                body = b""
-                while len(body) < length:
-                    chunk = stream.read(length - len(body))
-                    if not chunk:
-                        raise EOFError()
-                    body += chunk
+                body = reader.next_message()
+                received = time.perf_counter()
+                if recorder is not None:
+                    recorder.record("in", body)
                 try:
-                    self.incoming.put(json.loads(body.decode("utf-8")))
-                except json.JSONDecodeError:
-                    pass
+                    msg = loads(body)
+                except errors:
+                    continue
+                if isinstance(msg, dict) and "id" in msg and "method" not in msg:
+                    # A reply: when it arrived and when it was decoded.
+                    msg["__lsp_timing__"] = (received, time.perf_counter())
+                self.incoming.put(msg)
         except (EOFError, OSError, ValueError):
             pass
         finally:
@@ -439,6 +1090,220 @@ class LSPConnection:
                 self.proc.terminate()
         except Exception:
             pass
+        if self.recorder is not None:
+            self.recorder.close()
+
+
+def process_rss_mb(pid):
+    """Resident memory of process `pid` in MB, or None if it can't be read."""
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss / 2**20
+        except Exception:
+            return None
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class _Counters(ctypes.Structure):
+                _fields_ = [("cb", wintypes.DWORD),
+                            ("PageFaultCount", wintypes.DWORD)] + \
+                           [(f, ctypes.c_size_t) for f in (
+                               "PeakWorkingSetSize", "WorkingSetSize",
+                               "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                               "QuotaPeakNonPagedPoolUsage",
+                               "QuotaNonPagedPoolUsage", "PagefileUsage",
+                               "PeakPagefileUsage")]
+
+            k32 = ctypes.WinDLL("kernel32")
+            k32.OpenProcess.restype = wintypes.HANDLE
+            handle = k32.OpenProcess(0x1000 | 0x0010, False, pid)
+            if not handle:
+                return None
+            try:
+                counters = _Counters()
+                counters.cb = ctypes.sizeof(counters)
+                if not k32.K32GetProcessMemoryInfo(
+                        wintypes.HANDLE(handle), ctypes.byref(counters),
+                        counters.cb):
+                    return None
+                return counters.WorkingSetSize / 2**20
+            finally:
+                k32.CloseHandle(wintypes.HANDLE(handle))
+        except Exception:
+            return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class ServerPool:
+    """Language servers kept running after their client stopped needing them.
+
+    Closing the last file of a language used to kill its server, so flipping
+    back to that language meant a cold start - 10-60 s of reindexing for Roslyn
+    or rust-analyzer. Instead the client parks its initialized connection here,
+    keyed by (server command, workspace root), and takes it back on the next
+    ensure_started for the same command and any of its workspace folders.
+
+    While parked, a server's messages are drained by tick(): requests get a
+    neutral answer (capability registrations are recorded for the client to
+    re-apply) and notifications are dropped. Its workspace watchers keep
+    running, queueing the files changed meanwhile (a checkout, a build) for
+    the client to report on resume. A server is shut down once it has
+    idled past its keep-alive time, its memory passes the ceiling, or it
+    exits. Main thread only - ticked from every client's update."""
+
+    def __init__(self):
+        self._idle = {}                  # key -> parked entry (dict)
+        self._last_tick = 0.0
+        self._last_memory_check = 0.0
+
+    def __len__(self):
+        return len(self._idle)
+
+    def park(self, key, conn, state, keep_alive, max_mb, log):
+        """Hold `conn` (plus the client `state` needed to resume it) for up to
+        `keep_alive` seconds. An older server parked under the same key is
+        shut down."""
+        old = self._idle.pop(key, None)
+        if old is not None:
+            self._shutdown(old)
+        self._idle[key] = {"conn": conn, "state": state, "since": time.time(),
+                           "keep_alive": keep_alive, "max_mb": max_mb,
+                           "log": log}
+
+    def take(self, key):
+        """The (key, conn, state) parked under `key` - or under the same
+        command with `key`'s root among its workspace folders - or None."""
+        self._drain()
+        if key not in self._idle:
+            key = next((k for k, e in self._idle.items() if k[0] == key[0]
+                        and key[1] in e["state"]["folders"]), key)
+        entry = self._idle.pop(key, None)
+        if entry is None:
+            return None
+        if not entry["conn"].alive:
+            self._shutdown(entry)
+            return None
+        return key, entry["conn"], entry["state"]
+
+    def tick(self, now):
+        if now - self._last_tick < 1.0 or not self._idle:
+            return
+        self._last_tick = now
+        self._drain()
+        check_memory = now - self._last_memory_check >= 10.0
+        if check_memory:
+            self._last_memory_check = now
+        for key, entry in list(self._idle.items()):
+            conn = entry["conn"]
+            reason = None
+            if not conn.alive:
+                reason = "exited"
+            elif now - entry["since"] > entry["keep_alive"]:
+                reason = f"idle for {entry['keep_alive']:.0f}s"
+            elif check_memory and entry["max_mb"] > 0:
+                rss = process_rss_mb(conn.proc.pid)
+                if rss is not None and rss > entry["max_mb"]:
+                    reason = f"using {rss:.0f} MB (limit {entry['max_mb']:.0f})"
+            if reason:
+                del self._idle[key]
+                entry["log"](f"stopping parked server '{key[0][0]}' ({reason})")
+                self._shutdown(entry)
+
+    def discard(self, argv):
+        """Shut down every parked server launched with `argv`."""
+        for key in [k for k in self._idle if k[0] == tuple(argv)]:
+            self._shutdown(self._idle.pop(key))
+
+    def close_all(self):
+        for entry in self._idle.values():
+            self._shutdown(entry)
+        self._idle.clear()
+
+    @staticmethod
+    def _shutdown(entry):
+        for watcher, _ in entry["state"]["watchers"]:
+            watcher.stop()
+        entry["conn"].shutdown()
+
+    def _drain(self):
+        for entry in self._idle.values():
+            conn, state = entry["conn"], entry["state"]
+            while True:
+                try:
+                    msg = conn.incoming.get_nowait()
+                except queue.Empty:
+                    break
+                method = msg.get("method")
+                if "id" not in msg or method is None:
+                    continue  # replies to abandoned requests, notifications
+                params = msg.get("params") or {}
+                result = None
+                if method == "workspace/configuration":
+                    result = [{} for _ in params.get("items", [])]
+                elif method == "client/registerCapability":
+                    state["registrations"].extend(params.get("registrations", []))
+                elif method == "client/unregisterCapability":
+                    state["unregistrations"].extend(
+                        params.get("unregisterations", []))
+                elif method == "workspace/workspaceFolders":
+                    result = state["workspace_folders"]
+                conn.respond(msg["id"], result)
+
+
+# Shared by every LanguageServerClient in this 10x process.
+_SERVER_POOL = ServerPool()
+
+
+class LatencyStats:
+    """Rolling request timings per method, for tuning servers.
+
+    Each sample splits one round trip (request sent on the main thread ->
+    reply handler finished) into the _LATENCY_SEGMENTS:
+        write   queued until the writer thread finished writing it
+        server  written -> reply fully read (server work plus transfer)
+        decode  JSON decoding on the reader thread
+        queue   decoded -> main-thread dispatch (update ticks, pump budget)
+        handle  the reply handler itself
+    Only the last `window` samples per method are kept, so percentiles
+    follow the current session rather than its whole history."""
+
+    def __init__(self, window=_LATENCY_WINDOW):
+        self.window = window
+        self.count = 0                   # samples ever added
+        self._samples = {}               # method -> deque of segment tuples
+
+    def add(self, method, sample):
+        samples = self._samples.get(method)
+        if samples is None:
+            samples = self._samples[method] = deque(maxlen=self.window)
+        samples.append(sample)
+        self.count += 1
+
+    def clear(self):
+        self._samples.clear()
+
+    def methods(self):
+        """Sampled methods, most samples first."""
+        return sorted(self._samples, key=lambda m: -len(self._samples[m]))
+
+    def percentiles(self, method, qs=(0.5, 0.95, 0.99)):
+        """(sample count, {segment: (p50, p95, p99)}) in seconds."""
+        samples = self._samples.get(method) or ()
+        out = {}
+        for name, column in zip(_LATENCY_SEGMENTS, zip(*samples)):
+            ordered = sorted(column)
+            out[name] = tuple(ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+                              for q in qs)
+        return len(samples), out
 
 
 # ===========================================================================
@@ -527,6 +1392,7 @@ class LanguageServerClient:
         self.pull_diagnostics = bool(pull_diagnostics)
         self._pull_active = False        # became live after initialize
         self._diag_result_ids = {}       # uri -> last resultId (unchanged reports)
+        self._diag_restored_ids = set()  # ...those restored from the store
         self._diag_pending = set()       # uris queued for a debounced pull
         self._diag_pull_due = 0.0        # time.time() at which to flush the queue
         self._diag_pull_delay = 0.35     # debounce so we don't pull every keystroke
@@ -537,17 +1403,100 @@ class LanguageServerClient:
         self.initialized = False
         self.root_uri = None
         self.root_path = None
+        # Project roots the server works on: root_path first, then any other
+        # roots files were opened from (see _add_workspace_folder).
+        self.workspace_folders = []
+        self._folders_notify = False     # server takes didChangeWorkspaceFolders
+        self._folder_reg_ids = set()     # ...or registered dynamically
         self._sync_kind = 1  # server textDocumentSync.change: 0 none/1 full/2 incremental
         self.pending = {}        # request id -> handler(result, error)
-        self.docs = {}           # uri -> {"version", "text", "filename"}
+        # Main-thread message lanes, filled from conn.incoming by pump (see
+        # _drain_incoming) and handled within a per-tick time budget.
+        self._lane_high = deque()        # replies to user-initiated requests
+        self._lane_normal = deque()      # other replies, requests, notifications
+        self._lane_diags = {}            # uri -> newest publishDiagnostics
+        self._lane_low = deque()         # server log messages / stderr
+        self._priority_ids = set()       # ids of in-flight user-initiated requests
+        # request id -> (method, sent time, dedup key, perf_counter() at send)
+        self._pending_info = {}
+        self._inflight_keys = {}         # dedup key -> request id
+        self._inflight_latest = {}       # superseded method -> newest request id
+        # Partial results ($/progress with a partialResultToken we sent):
+        # token -> callback(batch), and request id -> its token.
+        self._partial = {}
+        self._partial_ids = {}
+        self._partial_seq = 0
+        self._request_timeout = 30.0     # seconds before an unanswered request expires
+        self._req_stats = {"cancelled": 0, "deduplicated": 0, "timed_out": 0}
+        self._latency = LatencyStats()
+        self._latency_log_interval = None  # cached LatencyLogSeconds
+        self._latency_logged = (0.0, 0)    # (time, sample count) of the last log
+        self._responses = OrderedDict()  # dedup key -> cached reply (LRU order)
+        self._responses_gen = 0          # bumped by every invalidation
+        self._response_hits = 0
+        self._response_misses = 0
+        self._pump_base = None           # cached base budget (seconds)
+        self._pump_budget = 0.008        # current, adaptive budget (seconds)
+        self._pump_coalesced = 0         # superseded publishDiagnostics dropped
+        self._pump_stats = {"ticks": 0, "handled": 0, "last_ms": 0.0,
+                            "max_ms": 0.0, "avg_ms": 0.0, "depth": 0,
+                            "max_depth": 0}
+        self.docs = {}           # uri -> {"version", "text", "filename", "lines"}
         self.diagnostics = {}    # uri -> [Diagnostic]
+        self._diag_lines = {}    # uri -> (line -> [Diagnostic], long spans)
+        self._diag_render = {}   # uri -> rendered build-output lines (cache)
+        self._severity_thr = None        # cached _min_severity (None = re-read)
+        self._diag_enabled = None        # cached _diagnostics_enabled
+        self._diag_render_thr = None     # severity threshold the cache was built at
+        self._build_output_due = 0.0     # time.time() at which to re-render
+        self._build_output_first = 0.0   # first publish still waiting on a render
+        self._build_output_delay = 0.15
+        self._build_output_max_wait = 0.75
         self._last_sync = 0.0
         self._sync_interval = 0.35
+        self._last_edit = 0.0            # time.time() of the latest buffer edit
+        self._edit_burst = 0.0           # start of the edits not yet synced
+        self._sync_max_defer = 1.0       # longest a burst may delay a sync
+        self._full_fetch_interval = 5.0  # max age of an unverified fingerprint
+        self._fetches_full = 0           # GetFileText calls made by syncs
+        self._fetches_skipped = 0        # ...and avoided via the fingerprint
+        # Handled files open in the editor but not yet didOpen'd, drained a
+        # budgeted few per update (see _drain_open_queue), and the handled
+        # files most recently focused (most recent last), which go first.
+        self._open_queue = []
+        self._focus_order = OrderedDict()
+        self._lazy_open_setting = None
+        # Workspace symbols: the local index (see LSPSymbols) kept with the
+        # server; open documents waiting for a documentSymbol refresh, sent
+        # _symbols_delay after their last open/save; and what the server
+        # provides.
+        self._symbols = SymbolIndex()
+        self._symbols_pending = set()    # uris
+        self._symbols_due = 0.0
+        self._symbols_delay = 1.0
+        self._doc_symbols = False        # server: documentSymbolProvider
+        self._ws_symbols = False         # server: workspaceSymbolProvider
+        # Persistent cache (see LSPCache): the store for the running server's
+        # root, results not yet handed to it (uri -> fields), written every
+        # _cache_interval; and the documents showing diagnostics restored
+        # from it, dropped _CACHED_DIAG_SETTLE after the last fresh ones.
+        self._cache = None
+        self._cache_pending = {}
+        self._cache_due = 0.0
+        self._cache_interval = 30.0
+        self._diag_cached = set()
+        self._diag_fresh_at = 0.0
+        # The latest find-references results as they stream in: "items"
+        # (deduplicated via "seen"), the "page" of "cap" items listed, how
+        # many of them are "shown" and when, and whether the reply is "done".
+        self._references = None
         self._completion_due = 0.0   # time.time() at which to auto-fire completion
         self._auto_delay = 0.12      # debounce window for as-you-type completion
         self._last_completion_id = None  # newest in-flight completion request id
         self._completion_inflight = False  # a completion request is awaiting reply
         self._completion_req_pos = None  # cursor (x, y) when that request was sent
+        self._completion_cache = None    # last complete item list (see _refilter_completion)
+        self._fuzzy_setting = None       # cached FuzzyCompletion
         self._autocomplete_visible = False  # our completion popup is on screen
         self._last_cursor_pos = None     # (x, y) at the previous cursor-move event
         self._last_line_text = None      # current line text at that event (edit vs move)
@@ -561,10 +1510,14 @@ class LanguageServerClient:
         # (via workspace/didChangeWatchedFiles). rust-analyzer watches the FS
         # itself and pylsp re-reads on demand, so they don't register a watcher
         # with us; ols does, which is what enables our polling scan below.
-        self._watch_enabled = False      # server asked us to watch files
-        self._watch_mtimes = {}          # path -> mtime, baseline for diffing
-        self._last_watch_scan = 0.0
-        self._watch_interval = 2.0       # seconds between workspace mtime scans
+        self._pool_key = None            # (argv, root) of the running server
+        self._cold_starts = 0            # servers launched (and initialized)...
+        self._warm_starts = 0            # ...vs reattached from the keep-alive pool
+        # (WorkspaceWatcher, WatchFilter or None) per top-level workspace
+        # folder, once a server registers watchers.
+        self._watchers = []
+        self._watch_registrations = {}   # registration id -> [(base, glob, kind)]
+        self._watch_interval = 2.0       # seconds between scans (poll backend)
 
     # -- logging / settings ------------------------------------------------
 
@@ -648,43 +1601,158 @@ class LanguageServerClient:
         if not argv:
             self.log("no server command configured; set " + self.name + ".Command")
             return False
+        key = (tuple(argv), self.root_path)
+        parked = _SERVER_POOL.take(key)
+        if parked is not None:
+            self._resume(*parked)
+            self._open_cache()
+            return True
+        self.workspace_folders = self._initial_folders()
         cwd = self._resolve_server_cwd()
+        codec, note = make_codec(self.setting("JsonCodec", "auto"))
+        if note:
+            self.log(note)
+        recorder = self._open_recorder()
         try:
-            self.conn = LSPConnection(argv, cwd,
-                                      log=self.log, verbose=self._verbose)
+            self.conn = LSPConnection(argv, cwd, log=self.log,
+                                      verbose=self._verbose, codec=codec,
+                                      recorder=recorder)
         except FileNotFoundError:
             self.log(f"could not launch server: '{argv[0]}' not found. "
                      f"Install it or set {self.name}.Command.")
             self.conn = None
+            if recorder is not None:
+                recorder.close()
             self.disable()
             return False
         except Exception as e:
             self.log(f"failed to start server: {e}")
             self.conn = None
+            if recorder is not None:
+                recorder.close()
             return False
 
         self.log(f"started '{' '.join(argv)}' (root: {self.root_path})")
+        self._pool_key = key
+        self._cold_starts += 1
+        self._open_cache()
         self._send_initialize()
         return True
 
+    def _open_recorder(self):
+        """A TrafficRecorder for "<name>.RecordTraffic", or None when unset."""
+        path = self.setting("RecordTraffic").strip()
+        if not path:
+            return None
+        try:
+            recorder = TrafficRecorder(os.path.expanduser(path))
+        except OSError as e:
+            self.log(f"can't record server traffic to '{path}' ({e})")
+            return None
+        self.log(f"recording server traffic to {recorder.path}")
+        return recorder
+
+    def _keep_alive(self):
+        """(seconds, memory ceiling in MB) a server is kept parked after its
+        last file closes - "<name>.KeepAliveSeconds" (default 300, 0 = shut
+        down at once) and "<name>.KeepAliveMaxMemoryMB" (default 4096,
+        0 = no ceiling)."""
+        try:
+            seconds = float(self.setting("KeepAliveSeconds", "300"))
+        except (TypeError, ValueError):
+            seconds = 300.0
+        try:
+            max_mb = float(self.setting("KeepAliveMaxMemoryMB", "4096"))
+        except (TypeError, ValueError):
+            max_mb = 4096.0
+        return seconds, max_mb
+
+    def _park(self):
+        """Hand the running server to the pool instead of shutting it down:
+        close our documents and save what resuming needs (negotiated sync
+        kind, pull-diagnostics state, watcher registrations and the running
+        watchers), then detach it so the _teardown that follows leaves it
+        running. Returns False if it
+        isn't parkable (not initialized, or keep-alive is off)."""
+        seconds, max_mb = self._keep_alive()
+        if seconds <= 0 or not self._ready() or self._pool_key is None:
+            return False
+        conn = self.conn
+        for rid in list(self.pending):
+            conn.notify("$/cancelRequest", {"id": rid})
+        for uri in list(self.docs):
+            conn.notify("textDocument/didClose", {"textDocument": {"uri": uri}})
+        state = {"sync_kind": self._sync_kind,
+                 "pull_active": self._pull_active,
+                 "symbols": self._symbols,
+                 "doc_symbols": self._doc_symbols,
+                 "ws_symbols": self._ws_symbols,
+                 "watch_registrations": dict(self._watch_registrations),
+                 "registrations": [], "unregistrations": [],
+                 "folders": list(self.workspace_folders),
+                 "workspace_folders": self._folder_entries(),
+                 "folders_notify": self._folders_notify,
+                 "folder_reg_ids": set(self._folder_reg_ids),
+                 "watchers": self._watchers}
+        self._watchers = []
+        _SERVER_POOL.park(self._pool_key, conn, state, seconds, max_mb, self.log)
+        self.conn = None
+        self.log(f"no handled files open; parking server "
+                 f"(kept alive for {seconds:.0f}s)")
+        return True
+
+    def _resume(self, key, conn, state):
+        """Reattach to a server from the pool: restore the state _park saved,
+        apply capability registrations it received while parked, and open
+        the editor's files. No initialize round trip - it's already warm."""
+        conn._log = self.log
+        conn._verbose = self._verbose
+        self.conn = conn
+        self._pool_key = key
+        self.root_path = key[1]
+        self.root_uri = path_to_uri(self.root_path)
+        self.workspace_folders = state["folders"]
+        self._folders_notify = state["folders_notify"]
+        self._folder_reg_ids = state["folder_reg_ids"]
+        self._sync_kind = state["sync_kind"]
+        self._pull_active = state["pull_active"]
+        # Files may have changed unwatched while parked.
+        self._symbols = state["symbols"]
+        self._symbols.forget_answers()
+        self._doc_symbols = state["doc_symbols"]
+        self._ws_symbols = state["ws_symbols"]
+        self._watch_registrations = state["watch_registrations"]
+        self.initialized = True
+        self._warm_starts += 1
+        self.log(f"reattached to running server (root: {self.root_path})")
+        # Report what the watchers saw while parked before any registration
+        # change restarts them.
+        self._watchers = state["watchers"]
+        self._scan_watched_files(time.time())
+        self._apply_unregistrations(state["unregistrations"])
+        self._apply_registrations(state["registrations"])
+        if not self._watchers:
+            self._restart_watcher()
+        N10X.Editor.SetStatusBarText(f"{self.name}: ready")
+        self._open_editor_files()
+
     def _send_initialize(self):
         params = {
             "processId": os.getpid(),
             "rootUri": self.root_uri,
             "rootPath": self.root_path,
-            "workspaceFolders": [{"uri": self.root_uri,
-                                  "name": os.path.basename(self.root_path) or "root"}],
+            "workspaceFolders": self._folder_entries(),
             "capabilities": {
                 "workspace": {
                     "configuration": True,
                     "workspaceFolders": True,
                     "didChangeConfiguration": {"dynamicRegistration": True},
-                    # Let servers register file watchers with us. We don't watch
-                    # the FS via the OS; instead, when a server registers we run
-                    # a throttled mtime scan of the workspace (see _scan_watched
-                    # _files) and report changes. This keeps ols's index fresh
-                    # for files edited while not open in the editor.
+                    # Let servers register file watchers with us. When one does
+                    # we watch the workspace (OS notifications, else polling -
+                    # see LSPWatcher) and report changes. This keeps ols's index
+                    # fresh for files edited while not open in the editor.
                     "didChangeWatchedFiles": {"dynamicRegistration": True},
+                    "symbol": {"dynamicRegistration": False},
                 },
                 "textDocument": {
                     "synchronization": {"didSave": True, "willSave": False,
@@ -698,6 +1766,7 @@ class LanguageServerClient:
                     "signatureHelp": {},
                     "definition": {"linkSupport": True},
                     "references": {},
+                    "documentSymbol": {"hierarchicalDocumentSymbolSupport": True},
                     "publishDiagnostics": {"relatedInformation": False},
                 },
             },
@@ -734,6 +1803,12 @@ class LanguageServerClient:
         if self._verbose():
             self.log(f"server sync kind: {self._sync_kind} "
                      f"(0=none,1=full,2=incremental)")
+        folders = (caps.get("workspace") or {}).get("workspaceFolders") or {}
+        # A string is a registration id the server will register under
+        # (tracked in _folder_reg_ids), not an acceptance now.
+        self._folders_notify = folders.get("changeNotifications") is True
+        self._doc_symbols = bool(caps.get("documentSymbolProvider"))
+        self._ws_symbols = bool(caps.get("workspaceSymbolProvider"))
         self.conn.notify("initialized", {})
         self.initialized = True
         # Turn on pull diagnostics now the server is up. We don't gate on the
@@ -751,38 +1826,185 @@ class LanguageServerClient:
                 self.on_initialized(self)
             except Exception as e:
                 self.log(f"on_initialized hook failed: {e}")
+        self._open_editor_files()
+
+    def _open_editor_files(self):
         try:
             for fn in N10X.Editor.GetOpenFiles() or []:
                 if self.handles(fn):
-                    self.did_open(fn)
+                    self._queue_open(fn)
         except Exception:
             pass
+        self._drain_open_queue()
+
+    def _queue_open(self, filename):
+        if filename not in self._open_queue \
+                and path_to_uri(filename) not in self.docs:
+            self._open_queue.append(filename)
+
+    def _note_focus(self, filename):
+        if filename and self.handles(filename):
+            self._focus_order[filename] = None
+            self._focus_order.move_to_end(filename)
+            if len(self._focus_order) > 32:
+                self._focus_order.popitem(last=False)
+
+    def _lazy_open(self):
+        """"<name>.LazyOpen" - cached; reset by _on_settings_changed."""
+        if self._lazy_open_setting is None:
+            self._lazy_open_setting = \
+                self.setting("LazyOpen", "false").strip().lower() == "true"
+        return self._lazy_open_setting
+
+    def _drain_open_queue(self):
+        """didOpen queued files within the per-update budget (PumpBudgetMs):
+        the focused file first, then recently focused ones - 10x doesn't
+        report which panels are visible, so recent focus stands in for it -
+        then the rest in tab order. Each didOpen fetches and sends the whole
+        buffer, so a workspace restoring 80 tabs would otherwise freeze the
+        editor right after initialize. At least one file opens per call.
+        With LazyOpen only the focused file is opened; the rest wait until
+        they're focused."""
+        if not self._open_queue or not self._ready():
+            return
+        try:
+            current = N10X.Editor.GetCurrentFilename()
+        except Exception:
+            current = None
+        self._note_focus(current)
+        lazy = self._lazy_open()
+        if lazy and current not in self._open_queue:
+            return
+        recent = {f: i for i, f in enumerate(reversed(self._focus_order))}
+        queued = sorted(self._open_queue,
+                        key=lambda f: (f != current, recent.get(f, len(recent))))
+        deadline = time.perf_counter() + self._pump_base_budget()
+        opened = 0
+        while queued and (not lazy or queued[0] == current):
+            if opened and time.perf_counter() >= deadline:
+                break
+            self.did_open(queued.pop(0))
+            opened += 1
+        self._open_queue = queued
 
     def restart(self):
+        # An explicit restart wants a fresh server, not a parked one, and a
+        # fresh look for project roots.
         self._teardown()
+        _SERVER_POOL.discard(self._server_argv() or ())
+        _ROOT_CACHE.clear()
         fn = N10X.Editor.GetCurrentFilename()
         if self.handles(fn) and self.ensure_started(fn):
             self.log("restarted")
 
     def _teardown(self):
+        # Before the documents go: pending results are checked against them.
+        self._close_cache()
         if self.conn:
             self.conn.shutdown()
         self.conn = None
+        self._pool_key = None
         self.initialized = False
         self.pending.clear()
+        self._lane_high.clear()
+        self._lane_normal.clear()
+        self._lane_diags.clear()
+        self._lane_low.clear()
+        self._priority_ids.clear()
+        self._pending_info.clear()
+        self._inflight_keys.clear()
+        self._inflight_latest.clear()
+        self._partial.clear()
+        self._partial_ids.clear()
+        self._references = None
+        self._invalidate_responses()
         self.docs.clear()
+        self._open_queue = []
         self.diagnostics.clear()
+        self._diag_lines = {}
+        self._diag_render = {}
+        self._build_output_due = 0.0
+        self._build_output_first = 0.0
         self.disabled = False
         # Drop pull-diagnostics state with the connection; it re-arms on the
         # next initialize.
         self._pull_active = False
         self._diag_result_ids = {}
+        self._diag_restored_ids = set()
         self._diag_pending = set()
         self._diag_pull_due = 0.0
+        self._diag_fresh_at = 0.0
+        self._symbols = SymbolIndex()
+        self._symbols_pending = set()
+        self._doc_symbols = False
+        self._ws_symbols = False
         # Watchers are per-connection (re-registered by the server on the next
         # initialize), so drop them with the server.
-        self._watch_enabled = False
-        self._watch_mtimes = {}
+        self._watch_registrations = {}
+        self._stop_watcher()
+        self.workspace_folders = []
+        self._folders_notify = False
+        self._folder_reg_ids = set()
+
+    # -- workspace folders -------------------------------------------------
+
+    def _initial_folders(self):
+        """root_path plus the roots of the other handled files already open,
+        so the server indexes every project from its first initialize - and
+        servers that can't add folders later still see them all."""
+        folders = [self.root_path]
+        try:
+            open_files = [fn for fn in N10X.Editor.GetOpenFiles() or []
+                          if self.handles(fn)]
+        except Exception:
+            open_files = []
+        for fn in open_files:
+            root = find_project_root(fn, self.root_markers, fallback=False)
+            if root and not self._folder_of(root, folders):
+                folders.append(root)
+        return folders
+
+    def _folder_entries(self):
+        return [{"uri": path_to_uri(f), "name": os.path.basename(f) or "root"}
+                for f in self.workspace_folders]
+
+    @staticmethod
+    def _folder_of(path, folders):
+        """The folder in `folders` containing `path` (or equal to it), else None."""
+        key = os.path.normcase(path)
+        for f in folders:
+            fk = os.path.normcase(f)
+            if key == fk or key.startswith(fk.rstrip(os.sep) + os.sep):
+                return f
+        return None
+
+    def _add_workspace_folder(self, filename):
+        """Make sure the project `filename` belongs to is a workspace folder.
+        A file under a project root outside every current folder (a sibling
+        crate, a second solution) adds that root through
+        workspace/didChangeWorkspaceFolders, so one server serves them all
+        instead of treating the file as loose. Files outside any project
+        stay loose, and servers that can't take new folders keep the ones
+        they have."""
+        if self._folder_of(filename, self.workspace_folders):
+            return
+        root = find_project_root(filename, self.root_markers, fallback=False)
+        if not root or self._folder_of(root, self.workspace_folders):
+            return
+        if not (self._folders_notify or self._folder_reg_ids):
+            if self._verbose():
+                self.log(f"{filename} is outside the workspace folders and the "
+                         f"server doesn't accept new ones")
+            return
+        self.workspace_folders.append(root)
+        self.conn.notify("workspace/didChangeWorkspaceFolders", {
+            "event": {"added": [{"uri": path_to_uri(root),
+                                 "name": os.path.basename(root) or "root"}],
+                      "removed": []}})
+        self._invalidate_responses()
+        self.log(f"added workspace folder {root}")
+        if self._watch_registrations:
+            self._restart_watcher()
 
     # -- document sync -----------------------------------------------------
 
@@ -795,29 +2017,70 @@ class LanguageServerClient:
         uri = path_to_uri(filename)
         if uri in self.docs:
             return
+        self._add_workspace_folder(filename)
         try:
             text = N10X.Editor.GetFileText(filename)
         except Exception:
             text = N10X.Editor.GetFileText()
         if text is None:
             text = ""
-        self.docs[uri] = {"version": 1, "text": text, "filename": filename}
+        self.docs[uri] = {"version": 1, "text": text, "filename": filename,
+                          "lines": None}
+        self._invalidate_responses(uri)  # versions restart at 1
         self.conn.notify("textDocument/didOpen", {
             "textDocument": {"uri": uri, "languageId": self.language_id,
                              "version": 1, "text": text}})
         self._schedule_diag_pull(uri)
+        self._schedule_doc_symbols(uri)
+
+    @staticmethod
+    def _buffer_fingerprint():
+        """Cheap summary of the focused buffer - line count, cursor, and the
+        text of the cursor line and its neighbours - that changes with any
+        edit at the cursor. None if the editor can't provide it."""
+        try:
+            x, y = N10X.Editor.GetCursorPos()
+            count = N10X.Editor.GetLineCount()
+            near = tuple(N10X.Editor.GetLine(i)
+                         for i in range(max(0, y - 1), min(count, y + 2)))
+            return (count, x, y, hash(near))
+        except Exception:
+            return None
+
+    @staticmethod
+    def _line_index(doc):
+        """The doc's LineIndex, built on first use. Only incremental-sync
+        servers need one; sync_current keeps it current as edits go out."""
+        if doc.get("lines") is None:
+            doc["lines"] = LineIndex(doc["text"])
+        return doc["lines"]
 
     def did_close(self, uri):
         doc = self.docs.pop(uri, None)
+        self._symbols_pending.discard(uri)
         self.diagnostics.pop(uri, None)
+        self._diag_lines.pop(uri, None)
+        self._diag_render.pop(uri, None)
+        self._invalidate_responses(uri)
         if doc and self._ready():
             self.conn.notify("textDocument/didClose",
                              {"textDocument": {"uri": uri}})
 
     def sync_current(self, force=False):
-        """Push the current buffer to the server as a full didChange if changed."""
+        """Push the current buffer to the server as a didChange if changed.
+
+        Unforced (periodic) syncs are held back while the user is mid-burst -
+        an edit within the last _sync_interval - for up to _sync_max_defer
+        seconds, so a burst of typing reaches the server as one didChange.
+        `force` (used before any feature request) always syncs immediately."""
         if not self._ready():
             return
+        if not force and self._edit_burst:
+            now = time.time()
+            if (now - self._last_edit < self._sync_interval
+                    and now - self._edit_burst < self._sync_max_defer):
+                return
+        self._edit_burst = 0.0
         filename = N10X.Editor.GetCurrentFilename()
         if not self.handles(filename):
             return
@@ -825,31 +2088,63 @@ class LanguageServerClient:
         if uri not in self.docs:
             self.did_open(filename)
             return
+        doc = self.docs[uri]
+        # Skip the full-buffer fetch + compare when the buffer is probably
+        # unchanged (a cheap heuristic): no edit event since the last fetch and
+        # the same fingerprint (see _buffer_fingerprint). Forced syncs always
+        # fetch, and a fetch is forced every _full_fetch_interval regardless,
+        # to catch edits that raise no event away from the cursor (e.g.
+        # replace-all).
+        now = time.time()
+        fingerprint = self._buffer_fingerprint()
+        if (not force and fingerprint is not None
+                and fingerprint == doc.get("fingerprint")
+                and self._last_edit < doc.get("fetched", 0.0)
+                and now - doc.get("fetched", 0.0) < self._full_fetch_interval):
+            self._fetches_skipped += 1
+            return
         text = N10X.Editor.GetFileText(filename)
         if text is None:
             return
-        doc = self.docs[uri]
+        self._fetches_full += 1
+        doc["fingerprint"] = fingerprint
+        doc["fetched"] = now
         if text == doc["text"]:
             return  # nothing changed; `force` only governs whether callers
             # request features, not whether we resend identical content.
         if self._sync_kind == 0:
             doc["text"] = text  # server doesn't want changes; just track locally
+            doc["lines"] = None
             return
         if self._sync_kind == 2:
             # Incremental: send only the edited range. Crucial for large files -
             # full-text resync on every keystroke is what makes typing lag.
-            change = incremental_change(doc["text"], text)
-            changes = [change] if change is not None else [{"text": text}]
+            # The doc's LineIndex makes finding and positioning the edited
+            # ranges cost O(changed region) in Python rather than O(file), and
+            # separate edits (multi-cursor, edits at both ends of the file
+            # within one sync window) go out as separate ranges, last first.
+            index = self._line_index(doc)
+            changes = []
+            for start, end, new_text in _diff_regions(doc["text"], text, index):
+                changes.append({"range": {"start": index.position(start),
+                                          "end": index.position(end)},
+                                "text": new_text})
+                index.apply(start, end, new_text)
         else:
             changes = [{"text": text}]
+            doc["lines"] = None
         doc["text"] = text
         doc["version"] += 1
+        self._invalidate_responses(uri)
         self.conn.notify("textDocument/didChange", {
             "textDocument": {"uri": uri, "version": doc["version"]},
             "contentChanges": changes})
         # Push-diagnostics servers re-publish on their own after this didChange;
         # pull servers won't, so re-request for the edited doc (debounced).
         self._schedule_diag_pull(uri)
+        # Symbols added or renamed by the edit: refresh the document's once
+        # typing pauses. Answers given before it still cover the other files.
+        self._schedule_doc_symbols(uri)
 
     def did_save(self, filename):
         if not self.handles(filename) or not self._ready():
@@ -859,6 +2154,8 @@ class LanguageServerClient:
         if uri in self.docs:
             self.conn.notify("textDocument/didSave",
                              {"textDocument": {"uri": uri}})
+            self._schedule_doc_symbols(uri)
+            self._symbols.forget_answers()
 
     # -- request helpers ---------------------------------------------------
 
@@ -874,14 +2171,221 @@ class LanguageServerClient:
         return {"textDocument": {"uri": path_to_uri(filename)},
                 "position": {"line": y, "character": x}}
 
-    def _send_request(self, method, params, handler):
+    def _send_request(self, method, params, handler, partial=None):
+        """Send a request and register `handler` for its reply. Returns the
+        request id (None if the server isn't ready).
+
+        With `partial`, the request carries a partialResultToken: servers
+        that support it stream the result in $/progress batches, each passed
+        to partial(batch) as it arrives, and the reply holds what's left.
+
+        A request identical to one still in flight - same method, document,
+        position and document version - isn't sent again: the in-flight one
+        is reused and its reply goes to the newest handler. A new completion /
+        hover / signature-help request supersedes the previous one of its kind,
+        which is cancelled ($/cancelRequest) so the server stops computing a
+        reply we'd discard. Requests unanswered after _request_timeout (or
+        their method's _REQUEST_TIMEOUTS entry) are expired by
+        _expire_requests."""
         if not self._ready():
             self.log("server not ready")
             return None
+        # Streamed batches belong to the request's own handler, so such a
+        # request is never shared with an earlier one.
+        key = None if partial else self._request_key(method, params)
+        if key is not None:
+            rid = self._inflight_keys.get(key)
+            if rid in self.pending:
+                self.pending[rid] = handler
+                self._req_stats["deduplicated"] += 1
+                return rid
+        if method in _SUPERSEDED_METHODS:
+            prev = self._inflight_latest.get(method)
+            if prev in self.pending:
+                self._cancel_request(prev)
+        if partial is not None:
+            self._partial_seq += 1
+            token = f"{self.name}-partial-{self._partial_seq}"
+            params["partialResultToken"] = token
+            self._partial[token] = partial
         rid = self.conn.request(method, params)
+        if partial is not None:
+            self._partial_ids[rid] = token
         self.pending[rid] = handler
+        self._pending_info[rid] = (method, time.time(), key, time.perf_counter())
+        if key is not None:
+            self._inflight_keys[key] = rid
+        if method in _SUPERSEDED_METHODS:
+            self._inflight_latest[method] = rid
+        if method in _PRIORITY_METHODS:
+            self._priority_ids.add(rid)
         return rid
 
+    def _request_key(self, method, params):
+        """Dedup key for a position request: (method, uri, line, character,
+        document version). None for requests that aren't deduplicated."""
+        if method not in _PRIORITY_METHODS or not isinstance(params, dict):
+            return None
+        uri = (params.get("textDocument") or {}).get("uri")
+        pos = params.get("position") or {}
+        doc = self.docs.get(uri)
+        return (method, uri, pos.get("line"), pos.get("character"),
+                doc["version"] if doc else None)
+
+    def _cached_request(self, method, params, handler):
+        """_send_request for hover / signatureHelp / definition, answered from
+        the response cache when the same request was made against the same
+        document version. Mouse hover re-asks constantly and servers such as
+        Roslyn can take most of a second per hover.
+
+        Only non-empty, error-free replies are cached: a null definition is
+        retried while the server is still indexing (see _on_definition)."""
+        key = self._request_key(method, params)
+        if key is not None and key in self._responses:
+            self._responses.move_to_end(key)
+            self._response_hits += 1
+            handler(self._responses[key], None)
+            return None
+        self._response_misses += 1
+        gen = self._responses_gen
+
+        def store(result, error):
+            # A reply computed before an invalidation may describe text that
+            # has since changed, so only keep it if nothing was invalidated.
+            if (key is not None and not error and result
+                    and gen == self._responses_gen):
+                self._responses[key] = result
+                if len(self._responses) > _RESPONSE_CACHE_SIZE:
+                    self._responses.popitem(last=False)
+            handler(result, error)
+
+        return self._send_request(method, params, store)
+
+    def _invalidate_responses(self, uri=None):
+        """Drop cached replies made stale by a change to `uri` (None: every
+        reply, e.g. after files changed on disk). A changed document takes its
+        own replies with it plus every cached definition, since a definition
+        elsewhere may point into the text that just moved."""
+        self._responses_gen += 1
+        if not self._responses:
+            return
+        if uri is None:
+            self._responses.clear()
+            return
+        for key in [k for k in self._responses
+                    if k[1] == uri or k[0] == "textDocument/definition"]:
+            del self._responses[key]
+
+    def _forget_request(self, rid):
+        """Drop the bookkeeping for a request that was answered/cancelled."""
+        info = self._pending_info.pop(rid, None)
+        self._priority_ids.discard(rid)
+        self._partial.pop(self._partial_ids.pop(rid, None), None)
+        if self.conn is not None:
+            self.conn.written.pop(rid, None)
+        if info is None:
+            return
+        method, _, key, _ = info
+        if key is not None and self._inflight_keys.get(key) == rid:
+            del self._inflight_keys[key]
+        if self._inflight_latest.get(method) == rid:
+            del self._inflight_latest[method]
+
+    def _cancel_request(self, rid):
+        """Stop waiting for `rid` and tell the server to stop working on it.
+        Any reply that still arrives finds no handler and is dropped."""
+        if self.pending.pop(rid, None) is None:
+            return
+        self._forget_request(rid)
+        self._req_stats["cancelled"] += 1
+        if self._ready():
+            self.conn.notify("$/cancelRequest", {"id": rid})
+
+    def _expire_requests(self, now):
+        """Cancel requests the server hasn't answered within
+        _request_timeout (or their method's _REQUEST_TIMEOUTS entry), handing
+        their handlers a RequestCancelled error so the feature resets (e.g.
+        "no definition found") rather than waiting forever and leaking the
+        pending entry. Also drops write stamps of requests forgotten while
+        still queued for the writer thread, which stamped them afterwards."""
+        if self.conn is not None:
+            written = self.conn.written
+            pending = self._pending_info
+            for rid in [r for r in list(written) if r not in pending]:
+                written.pop(rid, None)
+        default = self._request_timeout
+        expired = [(rid, method) for rid, (method, sent, _, _)
+                   in self._pending_info.items()
+                   if now - sent > _REQUEST_TIMEOUTS.get(method, default)]
+        for rid, method in expired:
+            handler = self.pending.get(rid)
+            self._cancel_request(rid)
+            self._req_stats["timed_out"] += 1
+            if self._verbose():
+                limit = _REQUEST_TIMEOUTS.get(method, default)
+                self.log(f"{method} (req {rid}) timed out after "
+                         f"{limit:.0f}s; cancelled")
+            if handler:
+                try:
+                    handler(None, {"code": -32800,
+                                   "message": "request timed out"})
+                except Exception as e:
+                    self.log(f"{method} timeout handler failed: {e}")
+
+    def _record_latency(self, info, written, timing, dispatched):
+        """Add one answered request to the latency stats (see LatencyStats)."""
+        method, sent = info[0], info[3]
+        received, decoded = timing
+        if written is None:
+            written = sent
+        done = time.perf_counter()
+        self._latency.add(method, (done - sent, written - sent,
+                                   max(0.0, received - written),
+                                   decoded - received,
+                                   dispatched - decoded, done - dispatched))
+
+    def latency(self):
+        """Log per-method request latency percentiles to the output panel."""
+        methods = self._latency.methods()
+        if not methods:
+            self.log("no request latencies recorded yet")
+            return
+        self.log(f"---- request latency (ms, p50 / p95 / p99 over the last "
+                 f"{self._latency.window} replies per method) ----")
+        for method in methods:
+            n, pct = self._latency.percentiles(method)
+            self.log(f"  {method} ({n})")
+            self.log("    " + "  ".join(
+                f"{name} {'/'.join(f'{v * 1000:.1f}' for v in pct[name])}"
+                for name in _LATENCY_SEGMENTS))
+
+    def latency_reset(self):
+        self._latency.clear()
+        self.log("request latency stats cleared")
+
+    def _log_latency(self, now):
+        """The optional periodic one-line-per-method latency log
+        ("<name>.LatencyLogSeconds"); quiet while no new replies arrive."""
+        if self._latency_log_interval is None:
+            try:
+                self._latency_log_interval = float(
+                    self.setting("LatencyLogSeconds", "0"))
+            except (TypeError, ValueError):
+                self._latency_log_interval = 0.0
+        interval = self._latency_log_interval
+        last_time, last_count = self._latency_logged
+        if interval <= 0 or now - last_time < interval \
+                or self._latency.count == last_count:
+            return
+        self._latency_logged = (now, self._latency.count)
+        for method in self._latency.methods():
+            n, pct = self._latency.percentiles(method)
+            total, server, waited = pct["total"], pct["server"], pct["queue"]
+            self.log(f"latency {method}: p50 {total[0] * 1000:.1f} / "
+                     f"p95 {total[1] * 1000:.1f} / p99 {total[2] * 1000:.1f} ms "
+                     f"(server p50 {server[0] * 1000:.1f}, "
+                     f"queue p50 {waited[0] * 1000:.1f}; n={n})")
+
     def _schedule_retry(self, action, delay=0.4):
         """Run `action` once on a later update tick. Used to re-issue a request
         that came back empty because the server hadn't finished analysing the
@@ -891,18 +2395,107 @@ class LanguageServerClient:
 
     # -- main-thread message pump -----------------------------------------
 
-    def pump(self):
-        if not self.conn:
-            return
-        for _ in range(200):  # bounded so we never stall the editor
+    def _drain_incoming(self):
+        """Move messages from the reader thread's queue into the priority
+        lanes. Replies to user-initiated requests (completion, hover, ...) and
+        partial results go to the high lane; publishDiagnostics is coalesced per URI - a newer
+        set replaces one still waiting, since only the latest matters; server
+        logs and stderr go last; everything else keeps arrival order."""
+        incoming = self.conn.incoming
+        for _ in range(_PUMP_MAX_DRAIN):
             try:
-                msg = self.conn.incoming.get_nowait()
+                msg = incoming.get_nowait()
             except queue.Empty:
-                break
+                return
+            if "id" in msg and "method" not in msg:
+                if msg["id"] in self._priority_ids:
+                    self._lane_high.append(msg)
+                else:
+                    self._lane_normal.append(msg)
+                continue
+            method = msg.get("method")
+            if method == "textDocument/publishDiagnostics":
+                uri = (msg.get("params") or {}).get("uri")
+                if uri in self._lane_diags:
+                    self._pump_coalesced += 1
+                self._lane_diags[uri] = msg
+            elif method in ("window/logMessage", "$/logTrace") \
+                    or "__lsp_stderr__" in msg:
+                self._lane_low.append(msg)
+            elif (method == "$/progress" and
+                  (msg.get("params") or {}).get("token") in self._partial):
+                # Partial results go with the reply they precede, which may
+                # be in the high lane.
+                self._lane_high.append(msg)
+            else:
+                self._lane_normal.append(msg)
+
+    def _pump_backlog(self):
+        return (len(self._lane_high) + len(self._lane_normal)
+                + len(self._lane_diags) + len(self._lane_low))
+
+    def _pump_base_budget(self):
+        """Per-tick handling budget in seconds ("<name>.PumpBudgetMs",
+        default 8). Cached; reset by _on_settings_changed."""
+        if self._pump_base is None:
             try:
-                self._handle(msg)
-            except Exception as e:
-                self.log(f"error handling message: {e}")
+                ms = float(self.setting("PumpBudgetMs", "8"))
+            except (TypeError, ValueError):
+                ms = 8.0
+            self._pump_base = max(1.0, ms) / 1000.0
+        return self._pump_base
+
+    def pump(self):
+        """Handle queued server messages within a per-tick time budget.
+
+        High-lane replies (what the user is waiting on) are always handled in
+        full; the other lanes run until the budget is spent, at least one
+        message per tick so a backlog always drains. The budget adapts: while
+        messages are left over it grows (up to 4x the base) so a flood drains
+        in fewer frames, and it falls back to the base once caught up."""
+        if not self.conn:
+            return
+        t0 = time.perf_counter()
+        self._drain_incoming()
+        base = self._pump_base_budget()
+        deadline = t0 + self._pump_budget
+        handled = 0
+        high = self._lane_high
+        while high:
+            self._dispatch(high.popleft())
+            handled += 1
+        for lane in (self._lane_normal, self._lane_diags, self._lane_low):
+            while lane and (not handled or time.perf_counter() < deadline):
+                if lane is self._lane_diags:
+                    msg = lane.pop(next(iter(lane)))
+                else:
+                    msg = lane.popleft()
+                self._dispatch(msg)
+                handled += 1
+        backlog = self._pump_backlog()
+        if backlog:
+            self._pump_budget = min(self._pump_budget * 1.5, base * 4)
+        else:
+            self._pump_budget = base
+        if handled:
+            elapsed = time.perf_counter() - t0
+            st = self._pump_stats
+            st["ticks"] += 1
+            st["handled"] += handled
+            st["last_ms"] = elapsed * 1000.0
+            st["max_ms"] = max(st["max_ms"], st["last_ms"])
+            st["avg_ms"] += (st["last_ms"] - st["avg_ms"]) * 0.1
+        self._pump_stats["depth"] = backlog
+        self._pump_stats["max_depth"] = max(self._pump_stats["max_depth"],
+                                            backlog + handled)
+
+    def _dispatch(self, msg):
+        if "id" in msg and "method" not in msg:
+            self._priority_ids.discard(msg["id"])
+        try:
+            self._handle(msg)
+        except Exception as e:
+            self.log(f"error handling message: {e}")
 
     def _handle(self, msg):
         if msg.get("__lsp_internal__") == "exited":
@@ -917,9 +2510,17 @@ class LanguageServerClient:
             return
 
         if "id" in msg and ("result" in msg or "error" in msg):
-            handler = self.pending.pop(msg["id"], None)
+            rid = msg["id"]
+            handler = self.pending.pop(rid, None)
+            info = self._pending_info.get(rid)
+            written = self.conn.written.get(rid) if self.conn else None
+            self._forget_request(rid)
             if handler:
+                dispatched = time.perf_counter()
                 handler(msg.get("result"), msg.get("error"))
+                if info is not None and "__lsp_timing__" in msg:
+                    self._record_latency(info, written, msg["__lsp_timing__"],
+                                         dispatched)
             return
 
         method = msg.get("method")
@@ -935,8 +2536,7 @@ class LanguageServerClient:
             items = (params or {}).get("items", [])
             self.conn.respond(rid, [{} for _ in items])
         elif method == "workspace/workspaceFolders":
-            self.conn.respond(rid, [{"uri": self.root_uri,
-                                     "name": os.path.basename(self.root_path) or "root"}])
+            self.conn.respond(rid, self._folder_entries())
         elif method == "client/registerCapability":
             self._apply_registrations((params or {}).get("registrations", []))
             self.conn.respond(rid, None)
@@ -958,80 +2558,131 @@ class LanguageServerClient:
             self.conn.respond(rid, None)
 
     def _apply_registrations(self, registrations):
+        changed = False
         for reg in registrations or []:
             if reg.get("method") == "workspace/didChangeWatchedFiles":
-                # The server wants us to tell it when workspace files change.
-                # Enable our polling scan and seed the baseline so the first
-                # scan only reports genuine changes, not the whole tree.
-                if not self._watch_enabled:
-                    self._watch_enabled = True
-                    self._watch_mtimes = self._snapshot_watched_files()
-                    self._last_watch_scan = time.time()
-                if self._verbose():
-                    self.log("file watching enabled (server registered "
-                             "workspace/didChangeWatchedFiles)")
+                # The server wants us to tell it when workspace files matching
+                # its glob patterns change.
+                watchers = (reg.get("registerOptions") or {}).get("watchers") or []
+                self._watch_registrations[reg.get("id")] = \
+                    [g for g in map(self._parse_watcher, watchers) if g]
+                changed = True
+            elif reg.get("method") == "workspace/didChangeWorkspaceFolders":
+                # rust-analyzer asks for folder changes this way rather than
+                # through its initialize capabilities.
+                self._folder_reg_ids.add(reg.get("id"))
+        if changed:
+            self._restart_watcher()
 
     def _apply_unregistrations(self, unregistrations):
+        changed = False
         for reg in unregistrations or []:
             if reg.get("method") == "workspace/didChangeWatchedFiles":
-                self._watch_enabled = False
-                self._watch_mtimes = {}
-
-    def _snapshot_watched_files(self):
-        """Map every workspace file we handle to its mtime. Cheap enough to run
-        on a few-second cadence; heavy/irrelevant directories are skipped. Used
-        as the baseline for detecting create/change/delete between scans."""
-        snap = {}
-        root = self.root_path
-        if not root or not os.path.isdir(root):
-            return snap
-        ignore = self.ignore_dirs
-        for dirpath, dirnames, filenames in os.walk(root):
-            # Prune noisy directories in place so os.walk never descends them.
-            dirnames[:] = [d for d in dirnames if d not in ignore]
-            for fn in filenames:
-                if not fn.endswith(self.extensions):
-                    continue
-                path = os.path.join(dirpath, fn)
-                try:
-                    snap[path] = os.path.getmtime(path)
-                except OSError:
-                    pass
-        return snap
+                self._watch_registrations.pop(reg.get("id"), None)
+                changed = True
+            elif reg.get("method") == "workspace/didChangeWorkspaceFolders":
+                self._folder_reg_ids.discard(reg.get("id"))
+        if changed:
+            self._restart_watcher()
 
-    def _scan_watched_files(self, now):
-        """Diff the workspace against the last snapshot and tell the server
-        about any created/changed/deleted files it cares about. This is what
-        keeps ols's index correct for files edited while not open (e.g. a
-        project-wide rename touching an unopened definition file)."""
-        if not (self._watch_enabled and self._ready()):
+    @staticmethod
+    def _parse_watcher(watcher):
+        """(base path or None, pattern, kind) for a FileSystemWatcher, or None
+        if its globPattern is malformed. Kind defaults to create|change|delete."""
+        gp = watcher.get("globPattern")
+        kind = watcher.get("kind") or 7
+        if isinstance(gp, str) and gp:
+            return (None, gp, kind)
+        if isinstance(gp, dict) and gp.get("pattern"):
+            base = gp.get("baseUri")
+            if isinstance(base, dict):      # a WorkspaceFolder
+                base = base.get("uri")
+            if isinstance(base, str):
+                return (uri_to_path(base), gp["pattern"], kind)
+        return None
+
+    def _stop_watcher(self):
+        for watcher, _ in self._watchers:
+            watcher.stop()
+        self._watchers = []
+
+    def _restart_watcher(self):
+        """(Re)start the workspace watchers for the current registrations, one
+        per workspace folder not nested in another. The registered globs
+        decide which directories are walked and which changes are reported
+        (relative patterns are relative to each folder); a registration
+        without usable watchers falls back to every file with one of our
+        extensions. Registration and folder changes are rare, so a restart
+        is simplest."""
+        self._stop_watcher()
+        if not self._watch_registrations:
             return
-        if now - self._last_watch_scan < self._watch_interval:
+        globs = [g for gs in self._watch_registrations.values() for g in gs]
+        backend = (self.setting("FileWatcher") or "auto").lower()
+        folders = self.workspace_folders
+        for folder in folders:
+            if not os.path.isdir(folder) or self._folder_of(
+                    folder, [f for f in folders if f != folder]):
+                continue
+            if globs:
+                watch_filter = WatchFilter(folder, globs)
+                include, descend = watch_filter.wants, watch_filter.descend
+            else:
+                watch_filter = None
+                include = lambda p: p.endswith(self.extensions)
+                descend = None
+            watcher = WorkspaceWatcher(
+                folder, include=include, ignore_dirs=self.ignore_dirs,
+                backend="poll" if backend == "poll" else "auto",
+                interval=self._watch_interval, descend=descend)
+            watcher.start()
+            self._watchers.append((watcher, watch_filter))
+        if self._verbose():
+            self.log(f"file watching enabled for {len(globs)} pattern(s) "
+                     "(server registered workspace/didChangeWatchedFiles)")
+
+    def _scan_watched_files(self, now):
+        """Forward the file changes the workspace watcher (see LSPWatcher)
+        queued since the last call to the server as one didChangeWatchedFiles.
+        This is what keeps ols's index correct for files edited while not open
+        (e.g. a project-wide rename touching an unopened definition file).
+        Watching happens on the watchers' threads; this only drains their
+        queues."""
+        if not self._watchers or not self._ready():
             return
-        self._last_watch_scan = now
-        new = self._snapshot_watched_files()
-        old = self._watch_mtimes
         changes = []
-        for path, mtime in new.items():
-            if path not in old:
-                changes.append((path, 1))           # Created
-            elif mtime != old[path]:
-                changes.append((path, 2))           # Changed
-        for path in old:
-            if path not in new:
-                changes.append((path, 3))           # Deleted
-        self._watch_mtimes = new
+        for watcher, watch_filter in self._watchers:
+            found, notes = watcher.drain()
+            for note in notes:
+                self.log(note)
+            # Any file appearing or vanishing may be a root marker. Only the
+            # files the watcher includes get here, but all of them do, before
+            # accepts() narrows them to the change kinds the server wants.
+            for p, t in found:
+                if t != CHANGED:
+                    invalidate_project_roots(p)
+            if watch_filter is not None:
+                # Only the change kinds each pattern was registered for.
+                found = [(p, t) for p, t in found if watch_filter.accepts(p, t)]
+            changes += found
         if not changes:
             return
+        self._symbols_changed_on_disk(changes)
         if self._verbose():
             self.log(f"watched files changed: {len(changes)} "
                      f"(notifying {self.name} server)")
         self.conn.notify("workspace/didChangeWatchedFiles", {
             "changes": [{"uri": path_to_uri(p), "type": t} for p, t in changes]})
+        self._invalidate_responses()
 
     def _handle_notification(self, method, params):
         if method == "textDocument/publishDiagnostics":
             self._on_diagnostics(params or {})
+        elif method == "$/progress":
+            params = params or {}
+            partial = self._partial.get(params.get("token"))
+            if partial is not None:
+                partial(params.get("value"))
         elif method in ("window/showMessage", "window/logMessage"):
             text = (params or {}).get("message", "")
             if text and self._verbose():
@@ -1042,9 +2693,37 @@ class LanguageServerClient:
     def _min_severity(self):
         """Highest LSP severity number to display (1=Error..4=Hint); anything
         less severe (higher number) is hidden. Set "<name>.DiagnosticsLevel" to
-        error|warning|info|hint. Default ("error") shows errors only."""
-        val = (self.setting("DiagnosticsLevel", "error") or "error").strip().lower()
-        return _SEVERITY_LEVELS.get(val, 1)
+        error|warning|info|hint. Default ("error") shows errors only.
+
+        Cached: this runs on every cursor move, and settings only change via
+        _on_settings_changed, which drops the cache."""
+        if self._severity_thr is None:
+            val = (self.setting("DiagnosticsLevel", "error") or "error").strip().lower()
+            self._severity_thr = _SEVERITY_LEVELS.get(val, 1)
+        return self._severity_thr
+
+    def _diagnostics_enabled(self):
+        """"<name>.Diagnostics" isn't "false". Cached like _min_severity."""
+        if self._diag_enabled is None:
+            self._diag_enabled = self.setting("Diagnostics") != "false"
+        return self._diag_enabled
+
+    def _on_settings_changed(self, *args):
+        """Settings were edited: drop cached setting values, and re-render
+        the build output in case the severity threshold changed."""
+        try:
+            self._severity_thr = None
+            self._diag_enabled = None
+            self._pump_base = None
+            self._latency_log_interval = None
+            self._lazy_open_setting = None
+            self._fuzzy_setting = None
+            self._last_status_line = -1
+            self._refresh_verbose()
+            if self.diagnostics:
+                self._schedule_build_output()
+        except Exception as e:
+            self.log(f"settings changed error: {e}")
 
     def _visible_diags(self, diags):
         """Filter diagnostics down to those at or above the configured severity
@@ -1084,9 +2763,9 @@ class LanguageServerClient:
         prev = self._diag_result_ids.get(uri)
         if prev:
             params["previousResultId"] = prev
-        rid = self.conn.request("textDocument/diagnostic", params)
-        self.pending[rid] = lambda result, error, u=uri: \
-            self._on_pull_diagnostics(u, result, error)
+        self._send_request("textDocument/diagnostic", params,
+                           lambda result, error, u=uri:
+                           self._on_pull_diagnostics(u, result, error))
 
     def _pull_all_open(self):
         """Re-request diagnostics for every open document. Used when the server
@@ -1116,10 +2795,27 @@ class LanguageServerClient:
     def _apply_diag_report(self, uri, report):
         """Fold one document diagnostic report into our diagnostic state.
         'full' replaces the file's diagnostics; 'unchanged' keeps them."""
+        restored_id = uri in self._diag_restored_ids
+        self._diag_restored_ids.discard(uri)
         rid = report.get("resultId")
         if rid:
             self._diag_result_ids[uri] = rid
         if report.get("kind") == "unchanged":
+            if restored_id:
+                # "Unchanged" against an id a previous server process issued
+                # proves nothing (a new process's ids can collide with it):
+                # ask again without one, for a full report.
+                self._diag_result_ids.pop(uri, None)
+                self._pull_diagnostics_for(uri)
+            elif uri in self._diag_cached:
+                # The server confirms the diagnostics restored from the
+                # persistent cache, so they're no longer provisional (and it
+                # won't send them again for _drop_cached_diagnostics to undo).
+                self._diag_cached.discard(uri)
+                self._diag_fresh_at = time.time()
+                self._last_status_line = -1
+                self._diag_render.pop(uri, None)
+                self._schedule_build_output()
             return
         self._on_diagnostics({"uri": uri,
                               "diagnostics": report.get("items", []) or []})
@@ -1130,6 +2826,11 @@ class LanguageServerClient:
             return
         diags = params.get("diagnostics", []) or []
         self.diagnostics[uri] = diags
+        self._diag_lines[uri] = self._index_diagnostics(diags)
+        self._diag_cached.discard(uri)
+        self._diag_fresh_at = time.time()
+        self._note_cache(uri, diagnostics=diags,
+                         result_id=self._diag_result_ids.get(uri))
         errs = sum(1 for d in diags if d.get("severity") == 1)
         warns = sum(1 for d in diags if d.get("severity") == 2)
         cur = N10X.Editor.GetCurrentFilename()
@@ -1140,43 +2841,101 @@ class LanguageServerClient:
                 parts.append(f"{warns} warning(s)")
             N10X.Editor.SetStatusBarText(f"{self.name}: " + ", ".join(parts))
         self._last_status_line = -1  # force refresh on next cursor move
+        # Re-render just this file's lines, and not right away: after a
+        # workspace-wide reanalysis servers publish hundreds of files within a
+        # second, and those collapse into one build-output render.
+        self._diag_render.pop(uri, None)
+        self._schedule_build_output()
+
+    @staticmethod
+    def _index_diagnostics(diags):
+        """(by_line, long): by_line maps each line to the diagnostics whose
+        range covers it, in server order, so the status-bar lookup on a
+        cursor move is one dict get. Diagnostics spanning more than
+        _DIAG_INDEX_SPAN lines (e.g. a whole-file warning) go in `long`
+        instead of being copied onto every line they cover."""
+        by_line, long = {}, []
+        for d in diags:
+            rng = d.get("range", {})
+            start = rng.get("start", {}).get("line", -1)
+            end = rng.get("end", {}).get("line", start)
+            if end - start > _DIAG_INDEX_SPAN:
+                long.append((start, end, d))
+                continue
+            for y in range(start, end + 1):
+                by_line.setdefault(y, []).append(d)
+        return by_line, long
+
+    def _schedule_build_output(self):
+        """Debounce a build-output render: _build_output_delay after the
+        latest publish, but never more than _build_output_max_wait after the
+        first one still waiting (so a steady stream still shows up)."""
+        now = time.time()
+        if not self._build_output_first:
+            self._build_output_first = now
+        self._build_output_due = min(now + self._build_output_delay,
+                                     self._build_output_first
+                                     + self._build_output_max_wait)
+
+    def _flush_build_output(self, now):
+        """Run the scheduled build-output render once it's due."""
+        if not self._build_output_due or now < self._build_output_due:
+            return
+        self._build_output_due = 0.0
+        self._build_output_first = 0.0
         self._publish_to_build_output()
 
+    def _render_diagnostics(self, uri, diags, thr):
+        """MSVC-style build-output lines for one file's visible diagnostics."""
+        diags = [d for d in diags if d.get("severity", 1) <= thr]
+        if not diags:
+            return []
+        path = uri_to_path(uri)
+        lines = []
+        for d in sorted(diags, key=lambda x: x.get("range", {})
+                        .get("start", {}).get("line", 0)):
+            start = d.get("range", {}).get("start", {})
+            line = start.get("line", 0) + 1
+            col = start.get("character", 0) + 1
+            sev = _MSVC_SEVERITY.get(d.get("severity", 1), "error")
+            code = d.get("code", "")
+            code = f" {code}" if code not in ("", None) else ""
+            src = d.get("source", "")
+            src = f"{src}: " if src else ""
+            # Collapse multi-line messages so each diagnostic is one line.
+            msg = " ".join(str(d.get("message", "")).splitlines())
+            # Visual Studio format: path(line,col): severity CODE: message
+            lines.append(f"{path}({line},{col}): {sev}{code}: {src}{msg}")
+        return lines
+
     def _publish_to_build_output(self):
         """Render every known diagnostic into 10x's build output as MSVC-style
         compiler lines so they appear as navigable errors/warnings.
 
         publishDiagnostics replaces the full diagnostic set for one file at a
-        time, so we clear and re-emit all files' diagnostics on each update.
-        That keeps the build output in sync with the server without dropping
-        entries for files other than the one that just changed.
+        time, and 10x's build output can only be cleared and rewritten as a
+        whole, so every file's lines are re-emitted on each render. Each
+        file's lines are cached in _diag_render, though, and only the files
+        whose diagnostics changed since the last render are re-formatted; the
+        cache is dropped when the severity threshold changes.
         """
-        if self.setting("Diagnostics") == "false":
+        if not self._diagnostics_enabled():
             return
         try:
             N10X.Editor.ClearBuildOutput()
         except AttributeError:
             return  # older 10x without the build-output API; nothing to do
+        thr = self._min_severity()
+        if thr != self._diag_render_thr:
+            self._diag_render = {}
+            self._diag_render_thr = thr
+        render = self._diag_render
         lines = []
         for uri, diags in self.diagnostics.items():
-            diags = self._visible_diags(diags)
-            if not diags:
-                continue
-            path = uri_to_path(uri)
-            for d in sorted(diags, key=lambda x: x.get("range", {})
-                            .get("start", {}).get("line", 0)):
-                start = d.get("range", {}).get("start", {})
-                line = start.get("line", 0) + 1
-                col = start.get("character", 0) + 1
-                sev = _MSVC_SEVERITY.get(d.get("severity", 1), "error")
-                code = d.get("code", "")
-                code = f" {code}" if code not in ("", None) else ""
-                src = d.get("source", "")
-                src = f"{src}: " if src else ""
-                # Collapse multi-line messages so each diagnostic is one line.
-                msg = " ".join(str(d.get("message", "")).splitlines())
-                # Visual Studio format: path(line,col): severity CODE: message
-                lines.append(f"{path}({line},{col}): {sev}{code}: {src}{msg}")
+            rendered = render.get(uri)
+            if rendered is None:
+                rendered = render[uri] = self._render_diagnostics(uri, diags, thr)
+            lines.extend(rendered)
         if lines:
             N10X.Editor.LogToBuildOutput("\n".join(lines) + "\n")
         try:
@@ -1185,23 +2944,27 @@ class LanguageServerClient:
             pass
 
     def show_line_diagnostic(self):
-        if self.setting("Diagnostics") == "false":
+        if not self._diagnostics_enabled():
             return
         filename = N10X.Editor.GetCurrentFilename()
         if not self.handles(filename):
             return
-        diags = self._visible_diags(self.diagnostics.get(path_to_uri(filename)) or [])
-        if not diags:
+        index = self._diag_lines.get(path_to_uri(filename))
+        if not index:
             return
         _, y = N10X.Editor.GetCursorPos()
         if y == self._last_status_line:
             return
-        for d in diags:
-            rng = d.get("range", {})
-            start = rng.get("start", {}).get("line", -1)
-            end = rng.get("end", {}).get("line", start)
-            if start <= y <= end:
+        by_line, long = index
+        thr = self._min_severity()
+        hits = by_line.get(y, [])
+        if long:
+            hits = hits + [d for start, end, d in long if start <= y <= end]
+        for d in hits:
+            if d.get("severity", 1) <= thr:
                 sev = _SEVERITY.get(d.get("severity", 1), "Info")
+                if path_to_uri(filename) in self._diag_cached:
+                    sev += " (cached)"
                 N10X.Editor.SetStatusBarText(
                     f"{self.name} {sev}: {d.get('message', '').splitlines()[0]}")
                 self._last_status_line = y
@@ -1231,6 +2994,219 @@ class LanguageServerClient:
             src = f"{src}: " if src else ""
             self.log(f"  L{line} [{sev}] {src}{d.get('message', '')}")
 
+    # -- workspace symbols (see workspace_symbol) --------------------------
+
+    def _schedule_doc_symbols(self, uri):
+        if self._doc_symbols:
+            self._symbols_pending.add(uri)
+            self._symbols_due = time.time() + self._symbols_delay
+
+    def _flush_doc_symbols(self, now, batch=8):
+        """Ask for the symbols of documents opened or saved since the last
+        flush, a few per update so restoring many tabs doesn't flood the
+        server."""
+        if not self._symbols_pending or now < self._symbols_due:
+            return
+        for _ in range(min(batch, len(self._symbols_pending))):
+            uri = self._symbols_pending.pop()
+            if uri in self.docs:
+                self._send_request(
+                    "textDocument/documentSymbol",
+                    {"textDocument": {"uri": uri}},
+                    lambda result, error, u=uri:
+                    self._on_document_symbols(u, result, error))
+
+    def _on_document_symbols(self, uri, result, error):
+        if error:
+            if error.get("code") == -32601:
+                self._doc_symbols = False
+            return
+        path = uri_to_path(uri)
+        symbols = self._symbol_tuples(result, path)
+        self._symbols.replace_path(path, symbols)
+        self._note_cache(uri, symbols=[sym[:3] + sym[4:] for sym in symbols])
+
+    @staticmethod
+    def _symbol_tuples(result, path=None):
+        """(name, kind, container, path, line, character) per symbol of a
+        documentSymbol or workspace/symbol reply. DocumentSymbols (of the
+        document at `path`) nest their children; SymbolInformation and
+        WorkspaceSymbol carry their own location (a WorkspaceSymbol's may be
+        just the file)."""
+        out = []
+        stack = [(sym, "") for sym in reversed(result or ())]
+        while stack:
+            sym, container = stack.pop()
+            name = sym.get("name")
+            loc = sym.get("location")
+            if loc is not None:
+                where = uri_to_path(loc.get("uri", ""))
+                start = (loc.get("range") or {}).get("start") or {}
+                container = sym.get("containerName") or ""
+            else:
+                where = path
+                rng = sym.get("selectionRange") or sym.get("range") or {}
+                start = rng.get("start") or {}
+                stack.extend((child, name) for child in
+                             reversed(sym.get("children") or ()))
+            if name and where:
+                out.append((name, sym.get("kind", 0), container, where,
+                            start.get("line", 0), start.get("character", 0)))
+        return out
+
+    def _symbols_changed_on_disk(self, changes):
+        """Drop the symbols of files changed on disk while not open (the
+        server reindexes them) and stop trusting the server's earlier
+        answers, which may miss symbols added to them; the next query asks
+        again. Open documents are kept current by documentSymbol."""
+        stale = False
+        for p, _ in changes:
+            if p.endswith(self.extensions) and path_to_uri(p) not in self.docs:
+                self._symbols.remove_path(p)
+                stale = True
+        if stale:
+            self._symbols.forget_answers()
+
+    # -- persistent cache (see LSPCache) -----------------------------------
+
+    def _open_cache(self):
+        """Open the store for the server's root and start loading it;
+        _update_cache shows what it restores."""
+        self._close_cache()
+        if self.setting("PersistentCache", "true").strip().lower() == "false":
+            return
+        self._cache = ResultCache(_cache_path(self.name, self.root_path))
+        self._cache.load()
+
+    def _close_cache(self, wait=0.0):
+        """Hand pending results to the store's worker and let it finish on
+        its own; `wait` (at exit) gives it that long to do so."""
+        if self._cache is None:
+            return
+        self._save_cache()
+        self._cache.close(wait)
+        self._cache = None
+        self._diag_cached = set()
+
+    def _update_cache(self, now):
+        cache = self._cache
+        entries = cache.loaded()
+        if entries:
+            self._restore_from_cache(entries)
+        if (self._diag_cached and self._diag_fresh_at
+                and now - self._diag_fresh_at > _CACHED_DIAG_SETTLE):
+            self._drop_cached_diagnostics()
+        if self._cache_pending and now >= self._cache_due:
+            self._save_cache()
+
+    def _restore_from_cache(self, entries):
+        """Show restored diagnostics and index restored symbols, for files
+        the server hasn't already sent fresh ones for."""
+        restored = 0
+        for entry in entries:
+            path = entry["path"]
+            uri = path_to_uri(path)
+            diags = entry.get("diagnostics")
+            if diags and uri not in self.diagnostics:
+                self.diagnostics[uri] = diags
+                self._diag_lines[uri] = self._index_diagnostics(diags)
+                self._diag_render.pop(uri, None)
+                self._diag_cached.add(uri)
+                restored += 1
+            rid = entry.get("result_id")
+            if rid and uri not in self._diag_result_ids:
+                self._diag_result_ids[uri] = rid
+                self._diag_restored_ids.add(uri)
+            symbols = entry.get("symbols")
+            if symbols and not self._symbols.has_path(path):
+                self._symbols.add([(name, kind, container, path, line, char)
+                                   for name, kind, container, line, char
+                                   in symbols])
+        if restored:
+            self._last_status_line = -1
+            self._schedule_build_output()
+        if self._verbose():
+            self.log(f"restored {len(entries)} file(s) from "
+                     f"{self._cache.path} ({restored} with diagnostics)")
+
+    def _drop_cached_diagnostics(self):
+        """Drop the restored diagnostics the server has neither re-published
+        nor confirmed (an "unchanged" pull report) by now."""
+        for uri in self._diag_cached:
+            self.diagnostics.pop(uri, None)
+            self._diag_lines.pop(uri, None)
+            self._diag_render.pop(uri, None)
+        self._diag_cached = set()
+        self._last_status_line = -1
+        self._schedule_build_output()
+
+    def _note_cache(self, uri, **fields):
+        """Queue fresh results for the store."""
+        if self._cache is None:
+            return
+        if not self._cache_pending:
+            self._cache_due = time.time() + self._cache_interval
+        self._cache_pending.setdefault(uri, {}).update(fields)
+
+    def _save_cache(self):
+        """Hand the pending results, with the text of the documents they
+        describe, to the store's worker thread."""
+        if not self._cache_pending:
+            return
+        results = []
+        for uri, fields in self._cache_pending.items():
+            doc = self.docs.get(uri)
+            results.append((uri_to_path(uri), doc["text"] if doc else None,
+                            fields))
+        self._cache_pending = {}
+        self._cache.store(results)
+
+    def _add_symbol_batch(self, batch):
+        """Index a $/progress batch of partial workspace/symbol results."""
+        found = self._symbol_tuples(batch)
+        self._symbols.add(found)
+        return found
+
+    def _on_workspace_symbols(self, query, result, error, streamed=0):
+        """The reply to workspace_symbol, after `streamed` symbols arrived as
+        partial results."""
+        if error:
+            if error.get("code") == -32601:
+                self._ws_symbols = False
+            elif self._verbose():
+                self.log(f"workspace/symbol failed: {error.get('message')}")
+        else:
+            found = self._add_symbol_batch(result)
+            self._symbols.mark_answered(
+                query, streamed + len(found) < _SYMBOL_REPLY_CAP)
+        self._show_symbols(query)
+
+    def _show_symbols(self, query, found=None):
+        """Jump straight to the match when there's only one (or only one
+        named exactly `query`), else list them."""
+        if found is None:
+            found = self._symbols.search(query, _SYMBOL_RESULTS)
+        exact = [sym for sym in found if sym[0] == query]
+        if len(exact) == 1:
+            found = exact
+        if not found:
+            N10X.Editor.SetStatusBarText(
+                f"{self.name}: no symbols matching '{query}'")
+            return
+        if len(found) == 1:
+            _, _, _, path, line, char = found[0]
+            N10X.Editor.OpenFile(path, N10X.Editor.GetCurrentPanelGridPos(),
+                                 (char, line))
+            N10X.Editor.ScrollCursorIntoView()
+            return
+        self._show_locations(
+            [(path, line, char, len(name))
+             for name, _, _, path, line, char in found],
+            "symbol(s)",
+            [f"{name} ({SYMBOL_KINDS.get(kind, 'symbol')}"
+             f"{', in ' + container if container else ''})"
+             for name, kind, container, _, _, _ in found])
+
     # -- feature response handlers ----------------------------------------
 
     def _on_completion(self, result, error, rid=None):
@@ -1265,40 +3241,105 @@ class LanguageServerClient:
                 self.log("completion: null result")
             return
         items = result.get("items", result) if isinstance(result, dict) else result
-        if not items:
-            if self._verbose():
-                self.log("completion: 0 items returned by server")
-            if self._autocomplete_visible:
-                self._hide_autocomplete()
-            return
-        # Order by the server's relevance ranking (sortText). Servers like
-        # rust-analyzer encode "most relevant first" there; falling back to the
-        # label keeps a stable order for items that omit it.
+        items = items or []
+        matcher = self._completion_matcher(items)
+        # A complete list (isIncomplete false, or a bare array) already holds
+        # every item for this word, so further typing can be filtered locally
+        # (see _refilter_completion) instead of asking the server again.
+        incomplete = isinstance(result, dict) and result.get("isIncomplete")
+        self._completion_cache = None if incomplete else \
+            self._completion_context(items, matcher)
+        if not items and self._verbose():
+            self.log("completion: 0 items returned by server")
+        self._show_completion_items(items, matcher)
+
+    @staticmethod
+    def _completion_matcher(items):
+        """A FuzzyMatcher over the items' filter text - filterText (the field
+        intended for client-side filtering) when present, else the label.
+        Ties rank by the server's relevance order (sortText), which
+        rust-analyzer and others use for "most relevant first", then by
+        label."""
+        return FuzzyMatcher(
+            [it.get("filterText") or it.get("label") or "" for it in items],
+            [(it.get("sortText") is None, it.get("sortText") or "",
+              it.get("label") or "") for it in items])
+
+    def _completion_context(self, items, matcher):
+        """Snapshot of where a complete item list applies: the file, the line,
+        the start of the word being completed and the text before it. None if
+        the cursor can't be read."""
+        try:
+            filename = N10X.Editor.GetCurrentFilename()
+            x, y = N10X.Editor.GetCursorPos()
+        except Exception:
+            return None
         prefix = self._line_prefix()
+        word = self._completion_word()
+        start = x - len(word)
+        return {"filename": filename, "line": y, "start": start,
+                "head": prefix[:start], "word": word.lower(),
+                "items": items, "matcher": matcher}
+
+    def _refilter_completion(self):
+        """Re-filter the cached complete item list for the word now under the
+        cursor, without a server round trip. Returns False (cache unusable)
+        when the list came back incomplete or the word being completed is no
+        longer the one it was fetched for: another file or line, a different
+        word start, changed text before it, or the word shortened below what
+        the server had already filtered for."""
+        cache = self._completion_cache
+        if cache is None:
+            return False
+        try:
+            filename = N10X.Editor.GetCurrentFilename()
+            x, y = N10X.Editor.GetCursorPos()
+        except Exception:
+            return False
         word = self._completion_word().lower()
-        # Narrow to items that match what's been typed after the trigger. Many
-        # servers (ols, rust-analyzer) return the whole member/scope set after a
-        # "." and expect the client to filter as the user types. Match against
-        # filterText (the field intended for this) when present, else the label.
-        if word:
-            def _match(it):
-                return (it.get("filterText") or it.get("label") or "").lower()
-            items = [it for it in items if _match(it).startswith(word)]
-        # Order by the server's relevance ranking (sortText) so the closest
-        # match - e.g. "found" - sits at the top; label breaks ties stably.
-        items = sorted(items, key=lambda it: (it.get("sortText") is None,
-                                              it.get("sortText") or "",
-                                              it.get("label") or ""))
+        if (filename != cache["filename"] or y != cache["line"]
+                or x - len(word) != cache["start"]
+                or not word.startswith(cache["word"])
+                or self._line_prefix()[:cache["start"]] != cache["head"]):
+            self._completion_cache = None
+            return False
+        if self._verbose():
+            self.log(f"completion: re-filtering {len(cache['items'])} cached "
+                     f"items locally for {word!r}")
+        self._show_completion_items(cache["items"], cache["matcher"])
+        return True
+
+    def _fuzzy_completion(self):
+        """Whether completion matches fuzzily ("gfn" -> getFileName) or by
+        prefix only. "<name>.FuzzyCompletion", default true - cached; reset
+        by _on_settings_changed."""
+        if self._fuzzy_setting is None:
+            self._fuzzy_setting = self.setting("FuzzyCompletion") != "false"
+        return self._fuzzy_setting
+
+    def _show_completion_items(self, items, matcher):
+        """Match the completion items (via their _completion_matcher) against
+        the word being typed and show the best MaxResults items, or dismiss the
+        list when nothing matches."""
+        prefix = self._line_prefix()
+        word = self._completion_word()
+        cache = self._completion_cache
+        # Many servers (ols, rust-analyzer) return the whole member/scope set
+        # after a "." and expect the client to filter as the user types. Ask
+        # for some spare items: ones inserting identical text are shown once.
         limit = self._max_results()
+        best = matcher.top(word, limit * 2,
+                           prefix=not self._fuzzy_completion())
         if self._verbose():
             try:
                 x, y = N10X.Editor.GetCursorPos()
             except Exception:
                 x, y = ("?", "?")
-            self.log(f"completion: {len(items)} items after filter (cap {limit}); "
-                     f"cursor=({x},{y}) word={word!r} line_prefix={prefix!r}")
+            self.log(f"completion: {len(best)} of {len(items)} items "
+                     f"matched (cap {limit}); cursor=({x},{y}) word={word!r} "
+                     f"line_prefix={prefix!r}")
         labels, seen = [], set()
-        for it in items:
+        for it in map(items.__getitem__, best):
             text = self._completion_full_text(it)
             if self._verbose() and len(labels) < 5:
                 self.log(f"   item label={it.get('label')!r} -> insert={text!r}")
@@ -1309,9 +3350,11 @@ class LanguageServerClient:
                     break
         if not labels:
             # Nothing matches what's typed now (e.g. the word was edited down to
-            # a prefix no item shares). Don't leave a stale list on screen.
+            # a prefix no item shares). Don't leave a stale list on screen, but
+            # keep the cached list: backspacing to a matching prefix reuses it.
             if self._autocomplete_visible:
                 self._hide_autocomplete()
+                self._completion_cache = cache
             return
         self._show_autocomplete(labels)
 
@@ -1323,6 +3366,14 @@ class LanguageServerClient:
         except (TypeError, ValueError):
             return 50
 
+    def _max_references(self):
+        """Maximum find-references results listed at once
+        ("<name>.MaxReferences"); the rest are paged (more_references)."""
+        try:
+            return max(1, int(self.setting("MaxReferences", "1000")))
+        except (TypeError, ValueError):
+            return 1000
+
     def _line_prefix(self):
         """Text on the current line to the left of the cursor."""
         try:
@@ -1382,12 +3433,16 @@ class LanguageServerClient:
         identifier and the in-progress list is no longer relevant. 10x doesn't
         close our popup on its own in that case, so we do it explicitly.
 
-        Also cancels any pending as-you-type request and drops the newest
-        in-flight request id, so a completion response that arrives after the
+        Also cancels any pending as-you-type request and the newest in-flight
+        one ($/cancelRequest), so a completion response that arrives after the
         word ended can't re-open the list a moment later."""
         self._completion_due = 0.0
+        if self._last_completion_id is not None:
+            # The list is being abandoned; the server needn't finish it.
+            self._cancel_request(self._last_completion_id)
         self._last_completion_id = None
         self._completion_inflight = False
+        self._completion_cache = None
         if not self._autocomplete_visible:
             return  # nothing on screen to dismiss
         self._autocomplete_visible = False
@@ -1464,16 +3519,40 @@ class LanguageServerClient:
         N10X.Editor.OpenFile(path, N10X.Editor.GetCurrentPanelGridPos(), pos)
         N10X.Editor.ScrollCursorIntoView()
 
-    def _on_references(self, result, error):
-        if error or not result:
+    def _on_references(self, refs, result, error):
+        """The reply to find_references: every location, or the rest of them
+        if the server streamed partial results (see _on_reference_batch)."""
+        if refs is not self._references:
+            return
+        refs["done"] = True
+        if not error and result:
+            self._add_references(refs, result)
+        if not refs["items"]:
+            self._references = None
             N10X.Editor.SetStatusBarText(f"{self.name}: no references found")
             return
+        self._show_references(refs)
+
+    def _on_reference_batch(self, refs, batch):
+        """A $/progress batch of partial find-references results: list the
+        first page as it fills, without waiting for the rest."""
+        if refs is not self._references or refs["done"]:
+            return
+        if self._add_references(refs, batch or ()):
+            refs["dirty"] = True
+            self._update_references(time.time())
+
+    @staticmethod
+    def _add_references(refs, locations):
+        """Append the locations not seen yet to refs["items"]; returns how
+        many were new."""
         # Build (filename, line, index, length) tuples for ShowSymbolReferences.
         # Coordinates are 0-based to match the rest of 10x's API (GetCursorPos /
         # OpenFile). `length` is the symbol's width when its range stays on one
         # line; 0 lets 10x work it out (e.g. multi-line or zero-width ranges).
-        seen, items = set(), []
-        for loc in result:
+        seen, items = refs["seen"], refs["items"]
+        count = len(items)
+        for loc in locations:
             path = uri_to_path(loc.get("uri", ""))
             rng = loc.get("range", {})
             start = rng.get("start", {})
@@ -1489,20 +3568,64 @@ class LanguageServerClient:
             if length < 0:
                 length = 0
             items.append((path, line, index, length))
-        if not items:
-            N10X.Editor.SetStatusBarText(f"{self.name}: no references found")
-            return
+        return len(items) - count
+
+    def _update_references(self, now):
+        """Re-list streamed references not shown yet, at most every
+        _REFERENCE_REFRESH seconds."""
+        refs = self._references
+        if (refs is not None and refs["dirty"]
+                and now - refs["shown_at"] >= _REFERENCE_REFRESH):
+            self._show_references(refs, now)
+
+    def _show_references(self, refs, now=None):
+        """List refs' current page - refs["cap"] items, so a widely used
+        symbol never means one huge list - if it changed, and say where in
+        the results it is."""
+        cap, items = refs["cap"], refs["items"]
+        first = refs["page"] * cap
+        page = items[first:first + cap]
+        refs["dirty"] = False
+        refs["shown_at"] = now if now is not None else time.time()
+        if len(page) != refs["shown"] or (refs["done"] and not refs["listed"]):
+            refs["listed"] = self._show_locations(page, "reference(s)",
+                                                  partial=not refs["done"])
+            refs["shown"] = len(page)
+        total = f"{len(items)}{'' if refs['done'] else '+'}"
+        if len(items) > cap:
+            last = first + len(page)
+            more = (f"the next {cap}" if last < len(items) or not refs["done"]
+                    else "the first page")
+            N10X.Editor.SetStatusBarText(
+                f"{self.name}: references {first + 1}-{last} of {total} "
+                f"(\"{self.name} more references\" for {more})")
+        elif not refs["done"]:
+            N10X.Editor.SetStatusBarText(
+                f"{self.name}: {total} reference(s) so far")
+        elif refs["listed"]:
+            N10X.Editor.SetStatusBarText(f"{self.name}: {total} reference(s)")
+
+    def _show_locations(self, items, noun, labels=None, partial=False):
+        """List (filename, line, index, length) items in 10x's symbol
+        references panel; `labels` optionally describe each item in the
+        output-panel fallback, which is skipped for a `partial` list (more
+        items are on the way). True if the panel listed them."""
         try:
             N10X.Editor.ShowSymbolReferences(items)
+            return True
         except AttributeError:
+            if partial:
+                return False
             # Older 10x without ShowSymbolReferences: log to the output panel.
-            self.log(f"{len(items)} reference(s):")
-            for path, line, index, _ in items:
-                self.log(f"  {path}:{line + 1}:{index + 1}")
+            self.log(f"{len(items)} {noun}:")
+            for n, (path, line, index, _) in enumerate(items):
+                label = f"  {labels[n]}" if labels else ""
+                self.log(f"  {path}:{line + 1}:{index + 1}{label}")
             N10X.Editor.SetStatusBarText(
-                f"{self.name}: {len(items)} reference(s) - see output panel")
+                f"{self.name}: {len(items)} {noun} - see output panel")
         except Exception as e:
             self.log(f"ShowSymbolReferences failed: {e}")
+        return False
 
     # -- public commands (wire these to keybindings) ----------------------
 
@@ -1517,10 +3640,10 @@ class LanguageServerClient:
             p = params["position"]
             self.log(f"requesting completion at line {p['line']}, char {p['character']}")
         rid = self._send_request("textDocument/completion", params, self._on_completion)
-        # Only the newest completion request's response should be shown; rapid
-        # typing can leave older requests in flight whose (slower, less-specific)
-        # replies would otherwise land later and clobber the right list. Tag the
-        # handler with its id so _on_completion can drop stale responses.
+        # Only the newest completion request's response should be shown. Older
+        # ones are cancelled by _send_request, but a reply can already be on
+        # its way when the cancel goes out and would clobber the right list.
+        # Tag the handler with its id so _on_completion can drop stale ones.
         self._last_completion_id = rid
         self._completion_inflight = rid is not None
         # Remember where we asked. If the cursor has moved by the time the reply
@@ -1552,9 +3675,59 @@ class LanguageServerClient:
         self.log(f"  connection      : {'alive' if (self.conn and self.conn.alive) else 'none/dead'}")
         self.log(f"  initialized     : {self.initialized}")
         self.log(f"  root            : {self.root_path}")
+        if len(self.workspace_folders) > 1:
+            self.log(f"  folders         : "
+                     f"{', '.join(self.workspace_folders[1:])}")
         self.log(f"  current file    : {fn}")
         self.log(f"  handled         : {self.handles(fn)}")
-        self.log(f"  open documents  : {len(self.docs)}")
+        self.log(f"  open documents  : {len(self.docs)} "
+                 f"({len(self._open_queue)} waiting"
+                 f"{' for focus' if self._lazy_open() else ''})")
+        self.log(f"  server starts   : {self._cold_starts} cold, "
+                 f"{self._warm_starts} warm ({len(_SERVER_POOL)} parked)")
+        rs = self._req_stats
+        self.log(f"  requests        : {len(self.pending)} in flight, "
+                 f"{rs['cancelled']} cancelled, {rs['deduplicated']} deduplicated, "
+                 f"{rs['timed_out']} timed out")
+        self.log(f"  latency         : {self._latency.count} replies timed "
+                 f"(\"{self.name} latency\" for percentiles)")
+        st = self._pump_stats
+        self.log(f"  message pump    : depth {st['depth']} (max {st['max_depth']}), "
+                 f"tick {st['last_ms']:.1f} ms (avg {st['avg_ms']:.1f}, "
+                 f"max {st['max_ms']:.1f}, budget {self._pump_budget * 1000:.0f}), "
+                 f"{st['handled']} handled, {self._pump_coalesced} "
+                 f"diagnostics coalesced")
+        hits = _path_to_uri.cache_info().hits + uri_to_path.cache_info().hits
+        misses = _path_to_uri.cache_info().misses + uri_to_path.cache_info().misses
+        if self._watchers:
+            watcher, watch_filter = self._watchers[0]
+            watching = (f"{len(watch_filter.globs)} registered pattern(s)"
+                        if watch_filter else "client extensions")
+            self.log(f"  file watcher    : {watcher.backend or 'starting'}, "
+                     f"{watching}, {len(self._watchers)} folder(s)")
+        if self._symbols or self._ws_symbols or self._doc_symbols:
+            self.log(f"  symbol index    : {len(self._symbols)} symbols in "
+                     f"{self._symbols.files()} file(s)")
+        if self._cache is not None:
+            cs = self._cache.stats
+            self.log(f"  persistent cache: {cs['restored']} file(s) restored "
+                     f"({len(self._diag_cached)} showing cached diagnostics), "
+                     f"{cs['stale']} stale, {cs['stored']} stored, "
+                     f"{cs['unsaved']} skipped (unsaved) - {self._cache.path}"
+                     + (f" [{self._cache.error}]" if self._cache.error else ""))
+        self.log(f"  response cache  : {self._response_hits} hits, "
+                 f"{self._response_misses} misses, {len(self._responses)} kept")
+        self.log(f"  path/uri cache  : {hits} hits, {misses} misses")
+        self.log(f"  buffer fetches  : {self._fetches_full} full, "
+                 f"{self._fetches_skipped} skipped (buffer unchanged)")
+        if self.conn:
+            st = self.conn.reader.stats()
+            self.log(f"  json codec      : {self.conn.codec.name}")
+            self.log(f"  transport       : {st['messages']} msgs, "
+                     f"{st['bytes'] / 1e6:.1f} MB in {st['reads']} reads, "
+                     f"largest {st['largest'] / 1e3:.0f} KB, "
+                     f"buffer {st['buffer'] / 1e3:.0f} KB, "
+                     f"{st['transfer_rate'] / 1e6:.1f} MB/s on multi-read bodies")
 
     def hover(self, pos=None):
         params = self._doc_pos_params(pos)
@@ -1565,8 +3738,8 @@ class LanguageServerClient:
         # hover box there (the cursor may move before the server answers).
         if pos is None:
             pos = N10X.Editor.GetCursorPos()
-        self._send_request("textDocument/hover", params,
-                           lambda r, e: self._on_hover(r, e, pos))
+        self._cached_request("textDocument/hover", params,
+                             lambda r, e: self._on_hover(r, e, pos))
 
     def signature_help(self):
         params = self._doc_pos_params()
@@ -1574,16 +3747,16 @@ class LanguageServerClient:
             return
         self.sync_current(force=True)
         pos = N10X.Editor.GetCursorPos()
-        self._send_request("textDocument/signatureHelp", params,
-                           lambda r, e: self._on_signature(r, e, pos))
+        self._cached_request("textDocument/signatureHelp", params,
+                             lambda r, e: self._on_signature(r, e, pos))
 
     def goto_definition(self, _retry=0):
         params = self._doc_pos_params()
         if params is None:
             return
         self.sync_current(force=True)
-        self._send_request("textDocument/definition", params,
-                           lambda r, e: self._on_definition(r, e, _retry))
+        self._cached_request("textDocument/definition", params,
+                             lambda r, e: self._on_definition(r, e, _retry))
 
     def find_references(self):
         params = self._doc_pos_params()
@@ -1591,7 +3764,72 @@ class LanguageServerClient:
             return
         params["context"] = {"includeDeclaration": True}
         self.sync_current(force=True)
-        self._send_request("textDocument/references", params, self._on_references)
+        refs = self._references = {
+            "items": [], "seen": set(), "cap": self._max_references(),
+            "page": 0, "shown": 0, "listed": False, "shown_at": 0.0,
+            "dirty": False, "done": False}
+        self._send_request(
+            "textDocument/references", params,
+            lambda r, e: self._on_references(refs, r, e),
+            partial=lambda batch: self._on_reference_batch(refs, batch))
+
+    def more_references(self):
+        """List the next page of the last find-references results (see
+        "<name>.MaxReferences"), back to the first after the last."""
+        refs = self._references
+        if refs is None or len(refs["items"]) <= refs["cap"]:
+            N10X.Editor.SetStatusBarText(f"{self.name}: no more references")
+            return
+        refs["page"] += 1
+        if refs["page"] * refs["cap"] >= len(refs["items"]):
+            refs["page"] = 0
+        refs["shown"] = -1
+        self._show_references(refs)
+
+    def workspace_symbol(self, query=None):
+        """Go to a workspace symbol matching `query` (default: the word at
+        the cursor) - straight to it when there's one match, else listing
+        them. Answered from the local symbol index when the server's earlier
+        answers cover the query (see LSPSymbols) and the index has matches
+        for it; otherwise the server is asked and its reply added to the
+        index."""
+        if query is None:
+            query = self._word_at_cursor()
+        query = (query or "").strip()
+        if not query:
+            N10X.Editor.SetStatusBarText(f"{self.name}: no symbol to look up")
+            return
+        if not self._ws_symbols or not self._ready():
+            self._show_symbols(query)
+            return
+        max_age = None if self._watchers else _SYMBOL_ANSWER_TTL
+        if self._symbols.answered(query, max_age):
+            # Nothing found locally may be a symbol added since the answer
+            # (in a file changed unwatched): worth asking about.
+            found = self._symbols.search(query, _SYMBOL_RESULTS)
+            if found:
+                self._show_symbols(query, found)
+                return
+        streamed = []
+        self._send_request("workspace/symbol", {"query": query},
+                           lambda r, e, q=query:
+                           self._on_workspace_symbols(q, r, e, len(streamed)),
+                           partial=lambda batch:
+                           streamed.extend(self._add_symbol_batch(batch)))
+
+    def _word_at_cursor(self):
+        """The identifier the cursor is in or just after."""
+        try:
+            line = N10X.Editor.GetCurrentLine() or ""
+            x, _ = N10X.Editor.GetCursorPos()
+        except Exception:
+            return ""
+        start = end = min(x, len(line))
+        while start > 0 and (line[start - 1].isalnum() or line[start - 1] == "_"):
+            start -= 1
+        while end < len(line) and (line[end].isalnum() or line[end] == "_"):
+            end += 1
+        return line[start:end]
 
     # -- comment toggling --------------------------------------------------
     # Commenting is a purely editor-side text edit (LSP has no comment API), so
@@ -1702,7 +3940,10 @@ class LanguageServerClient:
             if not filename:
                 filename = N10X.Editor.GetCurrentFilename()
             if self.handles(filename) and self.ensure_started(filename):
-                self.did_open(filename)
+                # Queued rather than opened outright: a workspace load fires
+                # this for every restored tab.
+                self._queue_open(filename)
+                self._drain_open_queue()
         except Exception as e:
             self.log(f"on_file_opened error: {e}")
 
@@ -1719,6 +3960,8 @@ class LanguageServerClient:
         # an identifier char or a trigger char is typed. Each keystroke pushes
         # the due time forward, so a burst of typing fires a single request once
         # the user pauses for _auto_delay seconds.
+        if ch:
+            self._note_edit()
         if not ch or self.setting("AutoComplete") == "false":
             return
         # Only schedule completion when the focused file is one we handle;
@@ -1737,6 +3980,13 @@ class LanguageServerClient:
             # dismiss it (completion is word-scoped).
             self._hide_autocomplete()
 
+    def _note_edit(self):
+        """Record a buffer edit so periodic syncs coalesce the burst (see
+        sync_current)."""
+        self._last_edit = time.time()
+        if not self._edit_burst:
+            self._edit_burst = self._last_edit
+
     def _on_cursor_moved(self, *args):
         try:
             try:
@@ -1751,6 +4001,9 @@ class LanguageServerClient:
             prev_line = self._last_line_text
             self._last_cursor_pos = cur
             self._last_line_text = line
+            if (prev_line is not None and line is not None and line != prev_line
+                    and prev is not None and cur is not None and cur[1] == prev[1]):
+                self._note_edit()  # backspace/delete/paste (no char-key event)
             # Keep the popup tied to the word being edited; react to how the
             # cursor moved (only while something completion-related is live). The
             # key distinction is an *edit* (the line's text changed) versus a pure
@@ -1794,6 +4047,9 @@ class LanguageServerClient:
         try:
             self.pump()
             now = time.time()
+            if self._cache is not None:
+                self._update_cache(now)
+            self._flush_build_output(now)
             # Deferred re-request (e.g. a goto-definition that came back empty
             # while the server was still indexing) fires as soon as it's due.
             if self._retry_action and now >= self._retry_due:
@@ -1805,14 +4061,20 @@ class LanguageServerClient:
             # Fire any debounced diagnostic pulls (pull-diagnostics clients only).
             if self._ready():
                 self._flush_diag_pulls(now)
+                # Restored tabs still waiting for their didOpen.
+                self._drain_open_queue()
+                self._flush_doc_symbols(now)
+                self._update_references(now)
             # Completion fires as soon as it's due (not throttled).
+            # A complete list fetched for the current word is just re-filtered.
             if (self._ready() and self._completion_due
                     and now >= self._completion_due):
                 self._completion_due = 0.0
-                self.sync_current(force=True)
-                self._request_completion()
-                self._last_sync = now
-                return
+                if not self._refilter_completion():
+                    self.sync_current(force=True)
+                    self._request_completion()
+                    self._last_sync = now
+                    return
             # Throttled housekeeping. Runs even before the server is ready so a
             # workspace whose Python files are already open gets picked up
             # without a file-open event (e.g. switching to a restored tab).
@@ -1820,11 +4082,14 @@ class LanguageServerClient:
                 self._last_sync = now
                 self._refresh_verbose()
                 self._reconcile_open_files(now)
+                _SERVER_POOL.tick(now)
                 if self._ready():
+                    self._expire_requests(now)
+                    self._log_latency(now)
                     self.sync_current()
-                    # Self-throttled (no-op unless this server registered a
-                    # watcher and the scan interval has elapsed). Of our current
-                    # servers only ols registers one; rust-analyzer/pylsp don't.
+                    # No-op unless this server registered a watcher. Of our
+                    # current servers only ols registers one; rust-analyzer and
+                    # pylsp don't.
                     self._scan_watched_files(now)
         except Exception as e:
             self.log(f"update error: {e}")
@@ -1841,12 +4106,13 @@ class LanguageServerClient:
             return
         if not open_handled:
             # Nothing we handle is open anymore (e.g. the user switched to a
-            # different workspace/language). Shut the server down rather than
-            # leave it running in the background against a workspace we've left.
-            # It will be relaunched - with the correct root - when one of our
-            # files is opened again.
+            # different workspace/language). Park the server in the keep-alive
+            # pool, which shuts it down if it isn't wanted again within
+            # KeepAliveSeconds; reopening one of our files under the same root
+            # reattaches to it instead of paying a cold start and reindex.
             if self.conn:
-                self.log("no handled files open; shutting server down")
+                if not self._park():
+                    self.log("no handled files open; shutting server down")
                 self._teardown()
             return
         if not self._ready():
@@ -1862,14 +4128,20 @@ class LanguageServerClient:
             uri = path_to_uri(fn)
             open_uris.add(uri)
             if uri not in self.docs:
-                self.did_open(fn)
+                self._queue_open(fn)
+        self._open_queue = [f for f in self._open_queue
+                            if path_to_uri(f) in open_uris]
         for uri in list(self.docs.keys()):
             if uri not in open_uris:
                 self.did_close(uri)
+        self._drain_open_queue()
 
     def _on_exit(self):
         try:
+            # The only place the store's last write is waited for.
+            self._close_cache(wait=2.0)
             self._teardown()
+            _SERVER_POOL.close_all()
         except Exception:
             pass
 
@@ -1879,6 +4151,8 @@ class LanguageServerClient:
     def _command_table(self):
         return {
             "status": self.status,
+            "latency": self.latency,
+            "latencyreset": self.latency_reset,
             "complete": self.complete,
             "completion": self.complete,
             "hover": self.hover,
@@ -1888,6 +4162,9 @@ class LanguageServerClient:
             "gotodefinition": self.goto_definition,
             "references": self.find_references,
             "findreferences": self.find_references,
+            "morereferences": self.more_references,
+            "symbol": self.workspace_symbol,
+            "workspacesymbol": self.workspace_symbol,
             "diagnostics": self.show_all_diagnostics,
             "showdiagnostics": self.show_all_diagnostics,
             "restart": self.restart,
@@ -1914,11 +4191,20 @@ class LanguageServerClient:
             if rest and rest[0] not in " :-":
                 return False
             cmd = rest.lstrip(" :_-").replace(" ", "").replace("_", "")
-            fn = self._command_table().get(cmd)
+            table = self._command_table()
+            fn = table.get(cmd)
             if fn is None:
+                # "<name> symbol <query>": a command word then an argument,
+                # passed on with its case intact.
+                word, _, arg = (text.strip()[len(prefix):].lstrip(" :_-")
+                                .partition(" "))
+                fn = table.get(word.lower().replace("_", ""))
+                if fn == self.workspace_symbol and arg.strip():
+                    fn(arg.strip())
+                    return True
                 self.log(f"unknown command '{text}'. Try: {self.name} status | "
-                         f"complete | hover | signature | definition | references | "
-                         f"diagnostics | restart")
+                         f"latency | complete | hover | signature | definition | references | "
+                         f"more references | symbol <name> | diagnostics | restart")
                 return True
             fn()
             return True
@@ -2032,6 +4318,10 @@ class LanguageServerClient:
         N10X.Editor.AddCursorMovedFunction(self._on_cursor_moved)
         N10X.Editor.AddUpdateFunction(self._on_update)
         N10X.Editor.AddExitingFunction(self._on_exit)
+        try:
+            N10X.Editor.AddOnSettingsChangedFunction(self._on_settings_changed)
+        except Exception as e:
+            self.log(f"settings-changed hook unavailable: {e}")
         try:
             N10X.Editor.AddCommandPanelHandlerFunction(self._on_command_panel)
         except Exception as e:
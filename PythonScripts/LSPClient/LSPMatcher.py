@@ -0,0 +1,197 @@
+# LSPMatcher.py - Fuzzy completion matching for LSPClient
+#
+# Ranks a completion list against the word being typed, the way editors like
+# VS Code do: the typed characters must appear in order in the item's filter
+# text, and matches at word starts (camelCase humps, after "_" / "." / "::"),
+# runs of consecutive characters and matching case score higher. "gfn" finds
+# getFileName, "strlen" finds str_len.
+#
+# Servers like rust-analyzer return tens of thousands of items after "std::",
+# and only MaxResults of them are shown, so the matcher is built around that:
+#   - keys are lowercased once per list, not per keystroke;
+#   - candidates are found with one regex pass over all keys joined into a
+#     single string, so Python only looks at the items that actually match;
+#   - items starting with the typed word rank first (as in VS Code) and are
+#     ordered with plain string checks; the per-character fuzzy score is only
+#     computed when there aren't enough of them to fill the list;
+#   - the best `limit` are picked with a heap instead of sorting everything;
+#   - a query that extends the previous one only rescans its matches.
+#
+# No N10X dependency - LSPClient imports it, and LSPBench benchmarks it from a
+# plain Python.
+# ---------------------------------------------------------------------------
+
+import re
+import heapq
+from bisect import bisect_right
+from itertools import accumulate
+
+# Score bonuses, per matched character.
+_BONUS_BOUNDARY = 8      # starts a word (index 0, camelCase hump, after _ . : etc.)
+_BONUS_FIRST = 4         # ...and it's the very first character of the key
+_BONUS_CONSECUTIVE = 5   # directly follows the previous matched character
+_BONUS_CASE = 1          # same case as typed
+_MAX_LEADING_PENALTY = 10  # cap on the penalty for unmatched leading chars
+# Below this many previous matches a narrowing query rechecks them one by one
+# rather than rescanning the whole joined key string.
+_NARROW_SCAN = 2000
+
+
+def _lower_same_length(text):
+    """`text` lowercased character by character, so it keeps its length and
+    an index into it is one into `text` ("İ".lower() is two characters)."""
+    low = text.lower()
+    if len(low) != len(text):
+        low = "".join(c.lower()[:1] or c for c in text)
+    return low
+
+
+def _boundaries(key):
+    """Indices in `key` where a word starts: 0, an upper-case letter after a
+    lower-case one or a digit, and any alphanumeric after a separator."""
+    out = []
+    prev = ""
+    for i, ch in enumerate(key):
+        if ch.isalnum():
+            if (i == 0 or not prev.isalnum()
+                    or (ch.isupper() and (prev.islower() or prev.isdigit()))):
+                out.append(i)
+        prev = ch
+    return out
+
+
+class FuzzyMatcher:
+    """Matches queries against a fixed list of filter keys.
+
+    `keys`  the text to match per item (LSP filterText, else the label).
+    `order` optional per-item sort keys breaking score ties - the server's
+            relevance order (sortText) - defaulting to list position.
+
+    top() returns item indices, best first. A matcher is built once per
+    completion reply and reused for every keystroke against that list."""
+
+    def __init__(self, keys, order=None):
+        self.keys = list(keys)
+        self.order = order if order is not None else range(len(self.keys))
+        self._lower = [_lower_same_length(k) for k in self.keys]
+        # Each key is preceded by "\n", so "\n" + query finds prefix matches
+        # with a plain literal search; _starts[i] is where key i begins.
+        self._joined = "\n" + "\n".join(self._lower)
+        if self._joined.count("\n") != len(self.keys):
+            # "\n" separates keys in the joined string, so it can't occur in one.
+            self._lower = [k.replace("\n", " ") for k in self._lower]
+            self._joined = "\n" + "\n".join(self._lower)
+        self._starts = list(accumulate((len(k) + 1 for k in self._lower),
+                                       initial=1))
+        self._starts.pop()
+        self._bounds = {}            # index -> boundary list, computed on demand
+        # (query, indices) of the previous scans, for narrowing.
+        self._last_heads = (None, None)
+        self._last_matches = (None, None)
+
+    def top(self, query, limit, prefix=False):
+        """Indices of the best `limit` items for `query`, best first. With
+        `prefix`, items must start with the query (case-insensitive) rather
+        than merely contain its characters in order. An empty query ranks
+        purely by `order`."""
+        order = self.order
+        if not query:
+            return heapq.nsmallest(limit, range(len(self.keys)),
+                                   key=order.__getitem__)
+        qlow = _lower_same_length(query)
+        keys, lower = self.keys, self._lower
+        # Prefix matches first, those matching the typed case ahead of the
+        # rest, then in the server's order. Only when they don't fill the list
+        # are the other subsequence matches found and scored.
+        best = heapq.nsmallest(
+            limit, self._heads(qlow),
+            key=lambda i: (not keys[i].startswith(query), order[i]))
+        if prefix or len(best) >= limit:
+            return best
+        score = self._score
+        rest = [i for i in self._matches(qlow) if not lower[i].startswith(qlow)]
+        best += heapq.nsmallest(limit - len(best), rest,
+                                key=lambda i: (-score(i, query), order[i]))
+        return best
+
+    def _heads(self, qlow):
+        """Indices whose key starts with qlow."""
+        last_query, last = self._last_heads
+        if (last is not None and qlow.startswith(last_query)
+                and len(last) < _NARROW_SCAN):
+            # Every match for the longer query also matched the shorter one.
+            lower = self._lower
+            found = [i for i in last if lower[i].startswith(qlow)]
+        else:
+            # A literal search; the match starts at the "\n" before the key.
+            starts = self._starts
+            found = [bisect_right(starts, m.start()) for m in
+                     re.finditer(re.escape("\n" + qlow), self._joined)]
+        self._last_heads = (qlow, found)
+        return found
+
+    def _matches(self, qlow):
+        """Indices whose key contains qlow's characters in order."""
+        # "a[^\nb]*b[^\nc]*c": each gap skips straight to the next character,
+        # so the regex never backtracks.
+        body = re.escape(qlow[0]) + "".join(
+            "[^\n%s]*%s" % (re.escape(ch), re.escape(ch)) for ch in qlow[1:])
+        last_query, last = self._last_matches
+        if (last is not None and qlow.startswith(last_query)
+                and len(last) < _NARROW_SCAN):
+            pattern = re.compile(body)
+            lower = self._lower
+            found = [i for i in last if pattern.search(lower[i])]
+        else:
+            # Consuming the rest of the key lists each key once.
+            starts = self._starts
+            found = [bisect_right(starts, m.start()) - 1 for m in
+                     re.finditer(body + "[^\n]*", self._joined)]
+        self._last_matches = (qlow, found)
+        return found
+
+    def _boundaries_of(self, i):
+        bounds = self._bounds.get(i)
+        if bounds is None:
+            bounds = self._bounds[i] = _boundaries(self.keys[i])
+        return bounds
+
+    def _score(self, i, query):
+        """Higher is better. Greedy left-to-right match that moves a
+        character onto a later word start when the nearest occurrence isn't
+        one (so "fn" scores getFileName's N, not the n in "File"); falls back
+        to the plain greedy match if that jump strands a later character."""
+        score = self._match(i, query, True)
+        if score is None:
+            score = self._match(i, query, False)
+        return score if score is not None else float("-inf")
+
+    def _match(self, i, query, prefer_bounds):
+        key, low = self.keys[i], self._lower[i]
+        bounds = self._boundaries_of(i)
+        qlow = _lower_same_length(query)
+        score = 0
+        pos = 0
+        prev = -2
+        for n, ch in enumerate(qlow):
+            j = low.find(ch, pos)
+            if j < 0:
+                return None
+            if prefer_bounds and j != prev + 1:
+                k = bisect_right(bounds, j - 1)
+                while k < len(bounds) and low[bounds[k]] != ch:
+                    k += 1
+                if k < len(bounds):
+                    j = bounds[k]
+            if n == 0:
+                score -= min(j, _MAX_LEADING_PENALTY)
+            if j == prev + 1:
+                score += _BONUS_CONSECUTIVE
+            k = bisect_right(bounds, j) - 1
+            if k >= 0 and bounds[k] == j:
+                score += _BONUS_BOUNDARY + (_BONUS_FIRST if j == 0 else 0)
+            if key[j] == query[n]:
+                score += _BONUS_CASE
+            prev = j
+            pos = j + 1
+        return score
@@ -0,0 +1,433 @@
+# LSPReplay.py - Replay recorded language-server traffic through LSPClient
+#
+# Benchmarks the client's message handling offline: no language server and no
+# 10x needed, so it runs on a plain Linux CI box. Record a session in 10x by
+# setting "<name>.RecordTraffic: C:\path\session.jsonl", then run from a normal
+# Python in this folder:
+#
+#     python LSPReplay.py session.jsonl            # as fast as possible
+#     python LSPReplay.py session.jsonl --speed 1  # at the recorded pace
+#
+# The harness launches itself as a fake server ("--serve") that answers each
+# request with the recorded reply and sends the server's notifications and
+# requests (diagnostics, progress, registrations) after the client message
+# they followed in the recording. A stub N10X.Editor replays the editor side:
+# the recorded didOpen/didChange/didClose edits become buffer changes the
+# client syncs itself, and completion/hover/definition/... requests become the
+# matching client calls. It then reports, per message kind, how long messages
+# waited from arrival to being handled and how long handling took (p50, p95,
+# p99, max), plus the per-tick pump cost.
+#
+# Paths in the recording are mapped into a temporary folder (the recording may
+# come from another machine); the files are never read from disk.
+#
+# Nothing here runs when 10x loads the folder: 10x executes every script as
+# __main__, so the entry point also checks that the real N10X module is absent.
+# ---------------------------------------------------------------------------
+
+import os
+import sys
+import json
+import time
+import types
+import argparse
+import tempfile
+
+try:
+    import N10X
+    _IN_EDITOR = True
+except ImportError:
+    _IN_EDITOR = False
+
+
+def load_recording(path):
+    """The recorded entries, oldest first: dicts with "t", "dir", "msg"."""
+    entries = []
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entries.append(json.loads(line))
+    return entries
+
+
+def _root_uri(entries):
+    """The workspace root URI of the recorded session (from initialize)."""
+    for e in entries:
+        msg = e["msg"]
+        if e["dir"] == "out" and msg.get("method") == "initialize":
+            params = msg.get("params") or {}
+            folders = params.get("workspaceFolders") or [{}]
+            return params.get("rootUri") or folders[0].get("uri")
+    return None
+
+
+# ===========================================================================
+# Fake server
+# ===========================================================================
+
+class _Script:
+    """The server side of a recording, keyed by client message.
+
+    A client message is identified by (method, n) - the n-th time the client
+    sent that method - so the replay doesn't depend on request ids, which
+    differ from run to run. Each key gets the recorded reply (for requests) and
+    the server-initiated messages that arrived after it and before the
+    client's next message."""
+
+    def __init__(self, entries):
+        self.replies = {}            # (method, n) -> reply message
+        self.follow = {}             # (method, n) -> [server messages]
+        request_keys = {}            # recorded request id -> (method, n)
+        counts = {}
+        last = ("initialize", 0)
+        for e in entries:
+            msg = e["msg"]
+            method = msg.get("method")
+            if e["dir"] == "out":
+                if method is None:
+                    continue         # the client answering a server request
+                n = counts.get(method, 0)
+                counts[method] = n + 1
+                last = (method, n)
+                if "id" in msg:
+                    request_keys[msg["id"]] = last
+            elif method is None:
+                key = request_keys.get(msg.get("id"))
+                if key is not None:
+                    self.replies[key] = msg
+            else:
+                self.follow.setdefault(last, []).append(msg)
+
+
+def _write_message(stream, msg):
+    data = json.dumps(msg).encode("utf-8")
+    stream.write(b"Content-Length: %d\r\n\r\n" % len(data) + data)
+    stream.flush()
+
+
+def _read_message(stream):
+    """The next framed message from `stream`, or None at EOF."""
+    length = None
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+        line = line.strip()
+        if not line:
+            if length is not None:
+                break
+            continue
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    return json.loads(stream.read(length))
+
+
+def serve(recording, old_root, new_root):
+    """Run as the fake server on stdio: answer the client from `recording`,
+    with `old_root` rewritten to `new_root` in every message."""
+    entries = load_recording(recording)
+    if old_root and new_root:
+        text = json.dumps(entries).replace(old_root, new_root)
+        entries = json.loads(text)
+    script = _Script(entries)
+    counts = {}
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+    while True:
+        msg = _read_message(stdin)
+        if msg is None:
+            return 0
+        method = msg.get("method")
+        if method is None:
+            continue                 # replies to our (recorded) requests
+        if method == "exit":
+            return 0
+        n = counts.get(method, 0)
+        counts[method] = n + 1
+        if "id" in msg:
+            reply = dict(script.replies.get((method, n)) or {"result": None})
+            reply["jsonrpc"] = "2.0"
+            reply["id"] = msg["id"]
+            _write_message(stdout, reply)
+        for out in script.follow.get((method, n), ()):
+            _write_message(stdout, out)
+
+
+# ===========================================================================
+# Editor side
+# ===========================================================================
+
+class _ReplayEditor:
+    """Just enough of N10X.Editor for LanguageServerClient: open buffers,
+    the current file and cursor, and settings. Everything else (status bar,
+    popups, build output) is accepted and ignored."""
+
+    def __init__(self):
+        self.settings = {}
+        self.files = {}              # filename -> text
+        self.current = None
+        self.cursor = (0, 0)         # (x, y), as 10x reports it
+
+    def GetSetting(self, key):
+        return self.settings.get(key, "")
+
+    def GetOpenFiles(self):
+        return list(self.files)
+
+    def GetCurrentFilename(self):
+        return self.current or ""
+
+    def GetFileText(self, filename=None):
+        return self.files.get(filename or self.current)
+
+    def GetCursorPos(self):
+        return self.cursor
+
+    def _lines(self):
+        return (self.files.get(self.current) or "").split("\n")
+
+    def GetLineCount(self):
+        return len(self._lines())
+
+    def GetLine(self, y):
+        lines = self._lines()
+        return lines[y] + "\n" if y < len(lines) else ""
+
+    def GetCurrentLine(self):
+        return self.GetLine(self.cursor[1])
+
+    def CallOnMainThread(self, fn):
+        fn()
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+def _apply_change(text, change, LSPClient):
+    """`text` with one didChange contentChanges entry applied."""
+    rng = change.get("range")
+    if rng is None:
+        return change["text"]
+    index = LSPClient.LineIndex(text)
+
+    def offset(pos):
+        line = min(pos["line"], len(index) - 1)
+        return min(index.start(line) + pos["character"], len(text))
+
+    return text[:offset(rng["start"])] + change["text"] + text[offset(rng["end"]):]
+
+
+_ACTIONS = {
+    "textDocument/completion": "complete",
+    "textDocument/hover": "hover",
+    "textDocument/signatureHelp": "signature_help",
+    "textDocument/definition": "goto_definition",
+    "textDocument/references": "find_references",
+}
+
+
+def _percentiles(samples):
+    s = sorted(samples)
+    pick = lambda q: s[min(len(s) - 1, int(q * len(s)))]
+    return pick(0.5), pick(0.95), pick(0.99), s[-1]
+
+
+class Replay:
+    """Drives a LanguageServerClient through a recording against the fake
+    server and collects per-message timings."""
+
+    def __init__(self, recording, speed=0.0, quiet=True):
+        self.recording = os.path.abspath(recording)
+        self.entries = load_recording(recording)
+        self.speed = speed
+        self.quiet = quiet
+        self.root = tempfile.mkdtemp(prefix="lspreplay")
+        self.old_root = _root_uri(self.entries)
+        self.waits = {}              # kind -> [seconds from arrival to handled]
+        self.handling = {}           # kind -> [seconds spent handling]
+        self.ticks = []              # seconds per pump() that handled something
+        self._arrived = {}           # id(msg) -> perf_counter() on arrival
+
+    def _path(self, uri):
+        """The local stand-in path for a recorded document URI. Its directory
+        is created: the client starts the server in the file's project root,
+        which falls back to that directory."""
+        if self.old_root and uri.startswith(self.old_root):
+            rel = uri[len(self.old_root):].lstrip("/")
+        else:
+            rel = uri.rsplit("/", 1)[-1]
+        path = os.path.join(self.root, *rel.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def _client(self, LSPClient, editor):
+        opened = [e["msg"]["params"]["textDocument"] for e in self.entries
+                  if e["dir"] == "out"
+                  and e["msg"].get("method") == "textDocument/didOpen"]
+        if not opened:
+            raise SystemExit("recording has no didOpen - nothing to replay")
+        language = opened[0].get("languageId") or "plaintext"
+        extensions = sorted({os.path.splitext(self._path(d["uri"]))[1]
+                             for d in opened} - {""})
+        argv = [sys.executable, os.path.abspath(__file__), "--serve",
+                self.recording, "--old-root", self.old_root or "",
+                "--new-root", LSPClient.path_to_uri(self.root)]
+        editor.settings.update({"Replay.Enabled": "true",
+                                "Replay.KeepAliveSeconds": "0"})
+        client = LSPClient.LanguageServerClient(
+            "Replay", language, extensions or [".txt"], fallback_argv=argv)
+        if self.quiet:
+            client.log = lambda msg: None
+        return client
+
+    def _instrument(self, client):
+        """Time messages from arrival on the reader thread to being handled,
+        and the handling itself, per kind."""
+        arrived = self._arrived
+        incoming = client.conn.incoming
+        put = incoming.put
+
+        def stamped_put(msg, *args, **kwargs):
+            arrived[id(msg)] = time.perf_counter()
+            put(msg, *args, **kwargs)
+
+        incoming.put = stamped_put
+        dispatch = client._dispatch
+
+        def timed_dispatch(msg):
+            if "id" in msg and "method" not in msg:
+                info = client._pending_info.get(msg["id"])
+                kind = "reply " + (info[0] if info else "(untracked request)")
+            elif "__lsp_stderr__" in msg:
+                kind = "stderr"
+            else:
+                kind = msg.get("method") or "internal"
+            t0 = time.perf_counter()
+            dispatch(msg)
+            t1 = time.perf_counter()
+            self.handling.setdefault(kind, []).append(t1 - t0)
+            t_in = arrived.pop(id(msg), None)
+            if t_in is not None:
+                self.waits.setdefault(kind, []).append(t1 - t_in)
+
+        client._dispatch = timed_dispatch
+        pump = client.pump
+
+        def timed_pump():
+            before = client._pump_stats["handled"]
+            t0 = time.perf_counter()
+            pump()
+            if client._pump_stats["handled"] != before:
+                self.ticks.append(time.perf_counter() - t0)
+
+        client.pump = timed_pump
+
+    def _run_until(self, client, done, timeout):
+        t_end = time.time() + timeout
+        while time.time() < t_end:
+            client._on_update()
+            if done():
+                return True
+            time.sleep(0.001)
+        return False
+
+    def run(self):
+        import LSPClient
+        editor = LSPClient.N10X.Editor
+        client = self._client(LSPClient, editor)
+        first = True
+        t_start = time.perf_counter()
+        t_rec0 = self.entries[0]["t"] if self.entries else 0.0
+        for e in self.entries:
+            msg = e["msg"]
+            method = msg.get("method")
+            if e["dir"] != "out" or method is None:
+                continue
+            if self.speed > 0:
+                wait = (e["t"] - t_rec0) / self.speed - (time.perf_counter() - t_start)
+                if wait > 0:
+                    self._run_until(client, lambda: False, wait)
+            params = msg.get("params") or {}
+            doc = params.get("textDocument") or {}
+            path = self._path(doc["uri"]) if "uri" in doc else None
+            if method == "textDocument/didOpen":
+                editor.files[path] = doc.get("text", "")
+                editor.current = path
+                if first:
+                    first = False
+                    if not client.ensure_started(path):
+                        raise SystemExit("could not start the replay server "
+                                         "(run with --verbose for details)")
+                    self._instrument(client)
+                    self._run_until(client, client._ready, 30.0)
+            elif method == "textDocument/didChange" and path in editor.files:
+                text = editor.files[path]
+                for change in params.get("contentChanges") or []:
+                    text = _apply_change(text, change, LSPClient)
+                editor.files[path] = text
+                editor.current = path
+            elif method == "textDocument/didClose":
+                editor.files.pop(path, None)
+            elif method in _ACTIONS and path in editor.files:
+                pos = params.get("position") or {}
+                editor.current = path
+                editor.cursor = (pos.get("character", 0), pos.get("line", 0))
+                getattr(client, _ACTIONS[method])()
+            else:
+                continue
+            client._on_update()
+            if self.speed <= 0:
+                # Let the replies and follow-up traffic land before moving on.
+                self._run_until(client, lambda: not client.pending, 5.0)
+        # Drain whatever the server still has queued.
+        self._run_until(client, lambda: False, 0.5)
+        client._teardown()
+        LSPClient._SERVER_POOL.close_all()
+
+    def report(self):
+        print(f"replay: {sum(len(v) for v in self.handling.values())} server "
+              f"messages from {os.path.basename(self.recording)}")
+        print(f"  {'message':<40} {'count':>6}   {'wait p50/p95/p99/max ms':>26}"
+              f"   {'handle p50/p95/p99/max ms':>28}")
+        for kind in sorted(self.handling, key=lambda k: -len(self.handling[k])):
+            handle = _percentiles(self.handling[kind])
+            waits = self.waits.get(kind)
+            wait = _percentiles(waits) if waits else (0.0,) * 4
+            fmt = lambda ps: "/".join(f"{p * 1e3:.2f}" for p in ps)
+            print(f"  {kind[:40]:<40} {len(self.handling[kind]):>6}   "
+                  f"{fmt(wait):>26}   {fmt(handle):>28}")
+        if self.ticks:
+            fmt = "/".join(f"{p * 1e3:.2f}" for p in _percentiles(self.ticks))
+            print(f"  pump ticks: {len(self.ticks)}, p50/p95/p99/max {fmt} ms")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description="Replay a recorded LSP session through LSPClient.")
+    parser.add_argument("recording", help="JSONL file written by RecordTraffic")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="replay pace relative to the recording "
+                             "(default 0: as fast as possible)")
+    parser.add_argument("--verbose", action="store_true",
+                        help="show the client's log output")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--old-root", help=argparse.SUPPRESS)
+    parser.add_argument("--new-root", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.serve:
+        return serve(args.recording, args.old_root, args.new_root)
+
+    # LSPClient imports N10X at module level; outside 10x it gets the stub.
+    n10x = types.ModuleType("N10X")
+    n10x.Editor = _ReplayEditor()
+    sys.modules["N10X"] = n10x
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    replay = Replay(args.recording, speed=args.speed, quiet=not args.verbose)
+    replay.run()
+    replay.report()
+    return 0
+
+
+if __name__ == "__main__" and not _IN_EDITOR:
+    sys.exit(main(sys.argv[1:]))
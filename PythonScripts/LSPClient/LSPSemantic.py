@@ -0,0 +1,131 @@
+# LSPSemantic.py - Semantic token storage for LSPClient
+#
+# Servers describe semantic highlighting (textDocument/semanticTokens) as one
+# flat integer array, five integers per token:
+#     deltaLine, deltaStart, length, tokenType, tokenModifiers
+# where deltaLine is relative to the previous token's line and deltaStart to
+# the previous token's start when both are on the same line. Later requests
+# (semanticTokens/full/delta) return edits against that array - splices of
+# (start, deleteCount, data) - rather than the whole thing again.
+#
+# A 50k-line file has a few hundred thousand tokens, so nothing here creates
+# an object per token:
+#   - the array is kept as it arrived, in an array('I') (4 bytes per integer);
+#   - deltas are applied as slice assignments on that array;
+#   - absolute line numbers are computed only when a range is asked for, with
+#     one prefix sum over the deltaLine column (NumPy when installed), and
+#     only the tokens in the requested (visible) line range are decoded.
+#
+# 10x's scripting API has no call for colouring arbitrary ranges, so LSPClient
+# doesn't request semantic tokens yet; this is the storage it will use once it
+# can hand them to the editor. No N10X dependency - LSPBench benchmarks it from
+# a plain Python.
+# ---------------------------------------------------------------------------
+
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# The token types and modifiers predefined by the LSP spec (3.17), which we
+# advertise to servers; each server's legend maps its numbers onto its own list.
+TOKEN_TYPES = (
+    "namespace", "type", "class", "enum", "interface", "struct",
+    "typeParameter", "parameter", "variable", "property", "enumMember",
+    "event", "function", "method", "macro", "keyword", "modifier", "comment",
+    "string", "number", "regexp", "operator", "decorator")
+TOKEN_MODIFIERS = (
+    "declaration", "definition", "readonly", "static", "deprecated",
+    "abstract", "async", "modification", "documentation", "defaultLibrary")
+
+
+class SemanticTokens:
+    """The semantic tokens of one document version.
+
+    `legend` is the server's SemanticTokensLegend ({"tokenTypes": [...],
+    "tokenModifiers": [...]}), used to name token types and modifiers."""
+
+    def __init__(self, legend):
+        self.types = list((legend or {}).get("tokenTypes") or ())
+        self.modifiers = list((legend or {}).get("tokenModifiers") or ())
+        self.data = array("I")
+        self.result_id = None
+        self.version = None          # document version described (owner's)
+        self._lines = None           # absolute line per token, built on demand
+
+    def __len__(self):
+        return len(self.data) // 5
+
+    def set_full(self, data, result_id=None):
+        """Replace everything with a full SemanticTokens result's data."""
+        self.data = array("I", data or ())
+        self.result_id = result_id
+        self._lines = None
+
+    def apply_delta(self, edits, result_id=None):
+        """Apply a SemanticTokensDelta's edits. Edit offsets all refer to the
+        old array, so they're applied from the last to the first."""
+        data = self.data
+        for edit in sorted(edits or (), key=lambda e: e.get("start", 0),
+                           reverse=True):
+            start = edit.get("start", 0)
+            data[start:start + edit.get("deleteCount", 0)] = \
+                array("I", edit.get("data") or ())
+        self.result_id = result_id
+        self._lines = None
+
+    def _absolute_lines(self):
+        if self._lines is None:
+            if numpy is not None:
+                self._lines = numpy.frombuffer(
+                    self.data, dtype=numpy.uint32)[0::5].cumsum()
+            else:
+                self._lines = array("I", accumulate(self.data[0::5]))
+        return self._lines
+
+    def _first_token_at(self, line):
+        """Index of the first token on `line` or later."""
+        lines = self._absolute_lines()
+        if numpy is not None:
+            return int(numpy.searchsorted(lines, line, "left"))
+        return bisect_left(lines, line)
+
+    def in_range(self, first_line, last_line):
+        """Tokens on lines first_line..last_line (inclusive), decoded as
+        (line, character, length, type name, modifier names) tuples."""
+        data = self.data
+        types, mods = self.types, self.modifiers
+        out = []
+        i = self._first_token_at(first_line) * 5
+        line = int(self._absolute_lines()[i // 5]) if i < len(data) else 0
+        char = 0
+        first = True
+        while i < len(data):
+            dline, dchar, length, ttype, tmods = data[i:i + 5]
+            if not first:
+                line += dline
+            # The first token decoded starts a line, so its start is absolute.
+            char = dchar if (dline or first) else char + dchar
+            first = False
+            if line > last_line:
+                break
+            names = ()
+            if tmods:
+                names = tuple(m for b, m in enumerate(mods) if tmods >> b & 1)
+            out.append((line, char, length,
+                        types[ttype] if ttype < len(types) else str(ttype),
+                        names))
+            i += 5
+        return out
+
+    def at(self, line, character):
+        """(type name, modifier names) of the token covering the position,
+        or None."""
+        for tline, start, length, ttype, names in self.in_range(line, line):
+            if start <= character < start + length:
+                return ttype, names
+        return None
@@ -0,0 +1,210 @@
+# LSPSymbols.py - Local workspace-symbol index for LSPClient
+#
+# workspace/symbol asks the server to search its whole index, which on a large
+# codebase takes from a few hundred milliseconds to seconds per query - and
+# jumping to symbols means asking the same few queries over and over. The
+# index here keeps every symbol the client has been told about (workspace/
+# symbol replies, plus textDocument/documentSymbol for opened files) and
+# answers queries locally:
+#   - symbols are stored column-wise in parallel lists, one slot each, and
+#     indexed by the trigrams (3-character substrings) of their lowercased
+#     names, so a query's candidates are the names sharing its rarest
+#     trigram rather than every symbol;
+#   - names containing the query are ranked with a heap (prefix matches
+#     first, then shorter names); queries too short for trigrams, or that no
+#     name contains (typos, "gfn" for getFileName), fall back to the
+#     completion matcher (LSPMatcher) over every name;
+#   - a file's symbols are replaced or dropped as a unit (documentSymbol
+#     replies, watched-file events); removed slots are only marked dead and
+#     reclaimed once they're half the index;
+#   - which queries the server has already answered is remembered, so a
+#     query is sent to the server only when no earlier answered query is a
+#     substring of it (any symbol matching it then matched that one too).
+#     Servers cap their replies (rust-analyzer at 128 symbols), so a reply
+#     that may have been cut short only answers its own query again. Answers
+#     can be aged out, for when nothing reports files changing on disk.
+#
+# No N10X dependency - LSPClient imports it, and LSPBench benchmarks it from a
+# plain Python.
+# ---------------------------------------------------------------------------
+
+import os
+import time
+import heapq
+
+from LSPMatcher import FuzzyMatcher
+
+# LSP SymbolKind -> name, for listing results.
+SYMBOL_KINDS = {
+    1: "file", 2: "module", 3: "namespace", 4: "package", 5: "class",
+    6: "method", 7: "property", 8: "field", 9: "constructor", 10: "enum",
+    11: "interface", 12: "function", 13: "variable", 14: "constant",
+    15: "string", 16: "number", 17: "boolean", 18: "array", 19: "object",
+    20: "key", 21: "null", 22: "enumMember", 23: "struct", 24: "event",
+    25: "operator", 26: "typeParameter"}
+
+
+def _trigrams(low):
+    return {low[i:i + 3] for i in range(len(low) - 2)}
+
+
+def _shortest(slots, lower, limit):
+    """The `limit` slots with the shortest names, earliest added first on
+    ties."""
+    pairs = zip(map(len, map(lower.__getitem__, slots)), slots)
+    return [s for _, s in heapq.nsmallest(limit, pairs)]
+
+
+class SymbolIndex:
+    """Symbols by file, searchable by name.
+
+    A symbol is a (name, kind, container, path, line, character) tuple:
+    `kind` is the LSP SymbolKind number, `container` the enclosing symbol's
+    name ("" if none) and line/character the 0-based position of its name."""
+
+    def __init__(self):
+        self._names = []        # per slot; None once removed
+        self._lower = []        # per slot; "" once removed
+        self._rest = []         # (kind, container, path, line, character)
+        self._grams = {}        # trigram -> [slot]; may list removed slots
+        self._by_path = {}      # normcased path -> [slot]
+        self._keys = set()      # (normcased path, name, line, character)
+        self._dead = 0
+        self._matcher = None    # (FuzzyMatcher, slots) over live names
+        self._answered = {}     # query fully answered (lowercased) -> when
+        self._exact = {}        # ...answered with a possibly capped reply
+
+    def __len__(self):
+        return len(self._names) - self._dead
+
+    def files(self):
+        return len(self._by_path)
+
+    def has_path(self, path):
+        return os.path.normcase(path) in self._by_path
+
+    # -- updates -----------------------------------------------------------
+
+    def add(self, symbols):
+        """Add symbols, skipping any already indexed at the same position."""
+        by_path, keys = self._by_path, self._keys
+        for name, kind, container, path, line, char in symbols:
+            if not name:
+                continue
+            key = os.path.normcase(path)
+            if (key, name, line, char) in keys:
+                continue
+            keys.add((key, name, line, char))
+            slot = len(self._names)
+            low = name.lower()
+            self._names.append(name)
+            self._lower.append(low)
+            self._rest.append((kind, container, path, line, char))
+            by_path.setdefault(key, []).append(slot)
+            grams = self._grams
+            for g in _trigrams(low):
+                posting = grams.get(g)
+                if posting is None:
+                    grams[g] = [slot]
+                else:
+                    posting.append(slot)
+        self._matcher = None
+
+    def replace_path(self, path, symbols):
+        """Make `symbols` the whole of `path`'s symbols (a documentSymbol
+        reply)."""
+        self.remove_path(path)
+        self.add(symbols)
+
+    def remove_path(self, path):
+        """Drop `path`'s symbols (deleted, or changed on disk). Returns how
+        many were dropped."""
+        key = os.path.normcase(path)
+        slots = self._by_path.pop(key, None)
+        if not slots:
+            return 0
+        for s in slots:
+            self._keys.discard((key, self._names[s]) + self._rest[s][3:])
+            self._names[s] = None
+            self._lower[s] = ""
+        self._dead += len(slots)
+        self._matcher = None
+        if self._dead > 1024 and self._dead * 2 > len(self._names):
+            self._compact()
+        return len(slots)
+
+    def clear(self):
+        self.__init__()
+
+    def _compact(self):
+        """Rebuild without the removed slots."""
+        live = [(n, *r) for n, r in zip(self._names, self._rest)
+                if n is not None]
+        answered, exact = self._answered, self._exact
+        self.__init__()
+        self._answered, self._exact = answered, exact
+        self.add([(n, k, c, p, l, ch) for n, k, c, p, l, ch in live])
+
+    # -- server coverage ---------------------------------------------------
+
+    def answered(self, query, max_age=None):
+        """True if the server answered a query that every match for `query`
+        also matches - one contained in it - so the index already holds
+        them all. With `max_age`, only answers at most that many seconds old
+        count."""
+        low = query.lower()
+        since = time.time() - max_age if max_age is not None else 0.0
+        if self._exact.get(low, -1.0) >= since:
+            return True
+        return any(a in low and t >= since for a, t in self._answered.items())
+
+    def mark_answered(self, query, complete=True):
+        """Note the server answered `query`; `complete` if its reply wasn't
+        cut short, so it also answers every query containing this one."""
+        (self._answered if complete else self._exact)[query.lower()] = \
+            time.time()
+
+    def forget_answers(self):
+        """Files changed behind the server's answers: ask it again."""
+        self._answered.clear()
+        self._exact.clear()
+
+    # -- queries -----------------------------------------------------------
+
+    def search(self, query, limit):
+        """The best `limit` symbols for `query`, best first. Of the names
+        containing it, those starting with it rank first, then shorter
+        names; only when no name contains it (or it's too short for
+        trigrams) are the fuzzy (subsequence) matches of every name ranked
+        instead."""
+        low = query.lower()
+        if len(low) >= 3:
+            postings = [self._grams.get(g) for g in _trigrams(low)]
+            if not all(postings):
+                slots = []
+            else:
+                # Every name containing the query is in each of its trigrams'
+                # postings; check the shortest one's names directly.
+                lower = self._lower
+                slots = [s for s in min(postings, key=len)
+                         if low in lower[s]]
+            if slots:
+                heads = [s for s in slots if lower[s].startswith(low)]
+                best = _shortest(heads, lower, limit)
+                if len(best) < limit:
+                    rest = [s for s in slots if not lower[s].startswith(low)]
+                    best += _shortest(rest, lower, limit - len(best))
+                return [self.symbol(s) for s in best]
+        matcher, slots = self._full_matcher()
+        return [self.symbol(slots[i]) for i in matcher.top(query, limit)]
+
+    def _full_matcher(self):
+        if self._matcher is None:
+            slots = [s for s, n in enumerate(self._names) if n is not None]
+            names = [self._names[s] for s in slots]
+            self._matcher = (FuzzyMatcher(
+                names, order=[(len(n), n.lower()) for n in names]), slots)
+        return self._matcher
+
+    def symbol(self, slot):
+        return (self._names[slot],) + self._rest[slot]
@@ -0,0 +1,765 @@
+# LSPWatcher.py - Workspace file watching for LSPClient
+#
+# Servers such as ols register workspace/didChangeWatchedFiles and rely on the
+# client to report files created, changed or deleted outside the editor. A
+# WorkspaceWatcher watches a workspace root on a background thread and queues
+# (path, kind) changes, which LanguageServerClient drains on the main thread
+# and forwards to the server. `kind` is the LSP FileChangeType (1 created,
+# 2 changed, 3 deleted).
+#
+# Backends, picked in this order:
+#   inotify   Linux, via ctypes. One watch per directory; a queue overflow
+#             falls back to reporting every file as changed.
+#   windows   ReadDirectoryChangesW on the root (whole subtree), via ctypes.
+#   poll      Any platform (and network drives, where notifications are
+#             unreliable). Re-lists only directories whose mtime changed and
+#             re-stats a rolling slice of the files, so one cycle over a huge
+#             tree stays cheap; in-place edits of unchanged directories are
+#             found within a few cycles.
+# If a notification backend can't start (no libc, out of inotify watches, ...)
+# the watcher falls back to polling and says so in its notes. A WatchFilter
+# built from the server's registered glob patterns limits both the directories
+# walked and the files reported.
+#
+# No N10X dependency - everything here runs off the main thread.
+# ---------------------------------------------------------------------------
+
+import os
+import re
+import sys
+import queue
+import struct
+import threading
+
+CREATED, CHANGED, DELETED = 1, 2, 3
+
+# Files the poll backend re-stats per cycle regardless of directory mtimes.
+_POLL_SLICE = 5000
+
+
+def _coalesce(pending, path, kind):
+    """Fold a new event for `path` into `pending` (path -> kind): created then
+    changed is still created, created then deleted never happened, deleted
+    then created is a change."""
+    old = pending.get(path)
+    if old == CREATED and kind == CHANGED:
+        return
+    if old == CREATED and kind == DELETED:
+        del pending[path]
+    elif old == DELETED and kind == CREATED:
+        pending[path] = CHANGED
+    else:
+        pending[path] = kind
+
+
+# -- registered glob patterns ------------------------------------------------
+# Servers register watchers as LSP glob patterns: "*" and "?" within a path
+# segment, "**" across segments, "{a,b}" alternatives and "[...]" / "[!...]"
+# character ranges, either as a plain string or relative to a base folder
+# (RelativePattern). WatchFilter compiles them once so the watcher can skip
+# directories no pattern can reach and reject files by name before a stat.
+
+_GLOB_META = "*?[{"
+_CASE_FLAGS = re.IGNORECASE if os.name == "nt" else 0
+
+
+def _fold(path):
+    """`path` with "/" separators, case-folded where the file system ignores
+    case - a baseUri of file:///c%3A/proj must still contain C:\\proj\\a.cs."""
+    return os.path.normcase(path).replace("\\", "/")
+
+
+def _glob_body(pat):
+    """Regex source (unanchored) for glob `pat`."""
+    out = []
+    i, n = 0, len(pat)
+    while i < n:
+        c = pat[i]
+        if c == "*":
+            if pat.startswith("**", i):
+                i += 2
+                if i < n and pat[i] == "/":
+                    out.append("(?:.*/)?")   # "**/": any number of segments
+                    i += 1
+                else:
+                    out.append(".*")
+                continue
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = pat.find("]", i + 2)
+            if j < 0:
+                out.append(re.escape(c))
+            else:
+                body = pat[i + 1:j].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append("[" + body + "]")
+                i = j
+        elif c == "{":
+            depth, j, parts, start = 0, i, [], i + 1
+            while j < n:
+                if pat[j] == "{":
+                    depth += 1
+                elif pat[j] == "}":
+                    depth -= 1
+                    if depth == 0:
+                        break
+                elif pat[j] == "," and depth == 1:
+                    parts.append(pat[start:j])
+                    start = j + 1
+                j += 1
+            if j >= n:
+                out.append(re.escape(c))
+            else:
+                parts.append(pat[start:j])
+                out.append("(?:" + "|".join(_glob_body(p) for p in parts) + ")")
+                i = j
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+def glob_to_regex(pattern):
+    """Compile an LSP glob pattern (forward slashes) into an anchored regex."""
+    return re.compile(_glob_body(pattern) + r"\Z", _CASE_FLAGS)
+
+
+class _Glob:
+    """One registered watcher: the compiled pattern, what it's matched against
+    and how deep below which directory it can match."""
+
+    __slots__ = ("rx", "name_rx", "base", "prefix", "depth", "kind")
+
+    def __init__(self, root, base, pattern, kind):
+        pattern = pattern.replace("\\", "/")
+        self.kind = kind
+        self.rx = glob_to_regex(pattern)
+        # Matching subject: the path relative to `base` for relative patterns,
+        # else the whole path ("**/..." matches any prefix of it).
+        if base is None and (pattern.startswith(("/", "**"))
+                             or re.match(r"[A-Za-z]:/", pattern)):
+            self.base = None
+            anchor = _fold(pattern)
+        else:
+            self.base = _fold(base or root).rstrip("/")
+            anchor = self.base + "/" + _fold(pattern)
+        # Directories a match can lie in: below the pattern's literal leading
+        # segments, and - without "**" - only as many levels deep as it has
+        # segments.
+        parts = anchor.split("/")
+        lit = 0
+        while lit < len(parts) - 1 and not any(m in parts[lit]
+                                               for m in _GLOB_META):
+            lit += 1
+        self.prefix = "/".join(parts[:lit]) if lit else None
+        rest = parts[lit:]
+        self.depth = None if any("**" in p for p in rest) else len(rest)
+        # File-name prefilter from the last segment, when it stands alone.
+        last = parts[-1]
+        self.name_rx = None if ("**" in last or "/" in last) else \
+            glob_to_regex(last)
+
+    def matches(self, path, name):
+        if self.name_rx is not None and not self.name_rx.match(name):
+            return False
+        if self.base is None:
+            return self.rx.match(path) is not None
+        if not path.startswith(self.base + "/"):
+            return False
+        return self.rx.match(path, len(self.base) + 1) is not None
+
+    def descend(self, d):
+        pre = self.prefix
+        if pre is None or d == pre or pre.startswith(d + "/"):
+            return True
+        if not d.startswith(pre + "/"):
+            return False
+        return self.depth is None or \
+            d.count("/", len(pre) + 1) + 1 < self.depth
+
+
+class WatchFilter:
+    """The union of a server's registered watchers.
+
+    `root`  workspace folder that relative string patterns are relative to.
+    `globs` (base path or None, pattern, kind) per watcher; `kind` is the LSP
+            WatchKind bitmask (1 create, 2 change, 4 delete).
+
+    wants() and descend() suit WorkspaceWatcher's include / descend hooks;
+    accepts() also checks the event kind."""
+
+    _KIND_BITS = {CREATED: 1, CHANGED: 2, DELETED: 4}
+
+    def __init__(self, root, globs):
+        root = os.path.abspath(root)
+        self.globs = [_Glob(root, base, pattern, kind)
+                      for base, pattern, kind in globs]
+
+    def __bool__(self):
+        return bool(self.globs)
+
+    @staticmethod
+    def _split(path):
+        path = _fold(path)
+        return path, path[path.rfind("/") + 1:]
+
+    def wants(self, path):
+        path, name = self._split(path)
+        return any(g.matches(path, name) for g in self.globs)
+
+    def accepts(self, path, kind):
+        bit = self._KIND_BITS.get(kind, 0)
+        path, name = self._split(path)
+        return any(g.kind & bit and g.matches(path, name) for g in self.globs)
+
+    def descend(self, dirpath):
+        d = _fold(dirpath).rstrip("/")
+        return any(g.descend(d) for g in self.globs)
+
+
+class WorkspaceWatcher:
+    """Watches `root` for files accepted by `include(path)`, never descending
+    into directories named in `ignore_dirs` or rejected by `descend(path)`
+    (see WatchFilter). `include` is called before a file is stat'ed.
+
+    `backend`  "auto" (OS notifications when available, else polling) or
+               "poll".
+    `interval` seconds between poll cycles (poll backend only).
+
+    start() returns at once; the initial directory walk happens on the
+    watcher thread. drain() is called from the main thread."""
+
+    def __init__(self, root, include, ignore_dirs=(), backend="auto",
+                 interval=2.0, descend=None):
+        self.root = os.path.abspath(root)
+        self.include = include
+        self.ignore_dirs = frozenset(ignore_dirs)
+        self.descend = descend
+        self.interval = interval
+        self.backend = None              # name of the running backend
+        self._wanted = backend
+        self._events = queue.Queue()     # (path, kind) from the watcher thread
+        self._notes = queue.Queue()      # log lines for the main thread
+        self._files = set()              # included files known to exist
+        self._stop = threading.Event()
+        self._thread = None
+        self._impl = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name="LSPWatcher")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        impl = self._impl
+        if impl is not None:
+            impl.interrupt()
+
+    def drain(self):
+        """Changes since the last call, coalesced per path, plus any notes the
+        watcher wants logged: ([(path, kind), ...], [str, ...])."""
+        pending = {}
+        while True:
+            try:
+                path, kind = self._events.get_nowait()
+            except queue.Empty:
+                break
+            _coalesce(pending, path, kind)
+        notes = []
+        while True:
+            try:
+                notes.append(self._notes.get_nowait())
+            except queue.Empty:
+                break
+        return list(pending.items()), notes
+
+    # -- watcher thread ----------------------------------------------------
+
+    def _emit(self, path, kind):
+        """Report an included file's change. The notification backends only
+        hear of a directory, not its files, when it's deleted or moved, so
+        the files reported are remembered for _emit_tree."""
+        if self.include(path):
+            if kind == DELETED:
+                self._files.discard(path)
+            else:
+                self._files.add(path)
+            self._events.put((path, kind))
+
+    def _emit_tree(self, top, kind):
+        """Report the files under directory `top` as CREATED (walked: it was
+        created or moved in) or DELETED (remembered: it was deleted or moved
+        out). Returns how many were reported."""
+        if kind == DELETED:
+            prefix = top.rstrip("\\/") + os.sep
+            gone = [p for p in self._files if p.startswith(prefix)]
+            self._files.difference_update(gone)
+        else:
+            gone = list(self._walk_files(top))
+            self._files.update(gone)
+        for p in gone:
+            self._events.put((p, kind))
+        return len(gone)
+
+    def _rescan(self):
+        """After lost events: every file is reported changed, and those no
+        longer found deleted."""
+        found = set(self._walk_files(self.root))
+        for p in self._files - found:
+            self._events.put((p, DELETED))
+        for p in found:
+            self._events.put((p, CHANGED))
+        self._files = found
+
+    def _note(self, text):
+        self._notes.put(text)
+
+    def _enter(self, entry):
+        """Whether the walk descends into directory `entry` (a DirEntry)."""
+        return entry.name not in self.ignore_dirs and (
+            self.descend is None or self.descend(entry.path))
+
+    def _ignored(self, path):
+        """Whether `path` lies in an ignored directory below the root."""
+        rel = os.path.relpath(path, self.root)
+        parts = rel.replace("\\", "/").split("/")[:-1]
+        return any(p in self.ignore_dirs for p in parts)
+
+    def _walk_files(self, top):
+        """Every included file under `top` (iterative scandir, pruned)."""
+        stack = [top]
+        while stack:
+            d = stack.pop()
+            try:
+                with os.scandir(d) as it:
+                    for e in it:
+                        try:
+                            if e.is_dir(follow_symlinks=False):
+                                if self._enter(e):
+                                    stack.append(e.path)
+                            elif self.include(e.path):
+                                yield e.path
+                        except OSError:
+                            pass
+            except OSError:
+                pass
+
+    def _run(self):
+        candidates = []
+        if self._wanted != "poll":
+            if sys.platform.startswith("linux"):
+                candidates.append(_InotifyBackend)
+            elif sys.platform == "win32":
+                candidates.append(_WindowsBackend)
+        candidates.append(_PollBackend)
+        for cls in candidates:
+            if self._stop.is_set():
+                return
+            impl = cls(self)
+            try:
+                impl.setup()
+            except Exception as e:
+                impl.close()
+                self._note(f"file watcher: {cls.name} unavailable ({e}); "
+                           "falling back")
+                continue
+            self._impl = impl
+            self.backend = cls.name
+            if self._stop.is_set():
+                impl.close()
+                return
+            try:
+                impl.run()
+            except Exception as e:
+                self._note(f"file watcher ({cls.name}) stopped: {e}")
+            finally:
+                impl.close()
+            return
+
+
+class _PollBackend:
+    """Incremental scandir polling. Keeps each directory's mtime and listing;
+    a cycle stats every known directory, re-lists only those that changed
+    (new/removed entries, plus a stat of their files), then stats the next
+    _POLL_SLICE files round-robin to catch in-place writes."""
+
+    name = "poll"
+
+    def __init__(self, watcher):
+        self.w = watcher
+        self._dirs = {}      # dir path -> (mtime_ns, {file names}, {subdir names})
+        self._files = {}     # file path -> (mtime_ns, size)
+        self._cursor = []    # file paths still to re-stat this round
+
+    def setup(self):
+        self._scan_dir(self.w.root, report=False)
+
+    def interrupt(self):
+        pass  # run() waits on the stop event
+
+    def close(self):
+        pass
+
+    def run(self):
+        while not self.w._stop.wait(self.w.interval):
+            self.cycle()
+
+    def _scan_dir(self, path, report):
+        """Record `path` and everything below it; report files as created."""
+        stack = [path]
+        while stack:
+            d = stack.pop()
+            try:
+                mtime = os.stat(d).st_mtime_ns
+                files, subdirs = set(), set()
+                with os.scandir(d) as it:
+                    for e in it:
+                        try:
+                            if e.is_dir(follow_symlinks=False):
+                                if self.w._enter(e):
+                                    subdirs.add(e.name)
+                                    stack.append(e.path)
+                            elif self.w.include(e.path):
+                                st = e.stat()
+                                files.add(e.name)
+                                self._files[e.path] = (st.st_mtime_ns, st.st_size)
+                                if report:
+                                    self.w._events.put((e.path, CREATED))
+                        except OSError:
+                            pass
+            except OSError:
+                continue
+            self._dirs[d] = (mtime, files, subdirs)
+
+    def _drop_dir(self, path):
+        """Forget `path` and everything below it; report its files deleted."""
+        stack = [path]
+        while stack:
+            d = stack.pop()
+            entry = self._dirs.pop(d, None)
+            if entry is None:
+                continue
+            _, files, subdirs = entry
+            for name in files:
+                p = os.path.join(d, name)
+                self._files.pop(p, None)
+                self.w._events.put((p, DELETED))
+            stack.extend(os.path.join(d, name) for name in subdirs)
+
+    def _stat_file(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        sig = (st.st_mtime_ns, st.st_size)
+        if self._files.get(path) != sig:
+            self._files[path] = sig
+            self.w._events.put((path, CHANGED))
+
+    def _relist(self, d, mtime):
+        _, old_files, old_dirs = self._dirs[d]
+        files, subdirs = set(), set()
+        try:
+            with os.scandir(d) as it:
+                for e in it:
+                    try:
+                        if e.is_dir(follow_symlinks=False):
+                            if self.w._enter(e):
+                                subdirs.add(e.name)
+                        elif self.w.include(e.path):
+                            files.add(e.name)
+                    except OSError:
+                        pass
+        except OSError:
+            return
+        self._dirs[d] = (mtime, files, subdirs)
+        for name in files - old_files:
+            p = os.path.join(d, name)
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            self._files[p] = (st.st_mtime_ns, st.st_size)
+            self.w._events.put((p, CREATED))
+        for name in old_files - files:
+            p = os.path.join(d, name)
+            self._files.pop(p, None)
+            self.w._events.put((p, DELETED))
+        for name in files & old_files:
+            self._stat_file(os.path.join(d, name))
+        for name in subdirs - old_dirs:
+            self._scan_dir(os.path.join(d, name), report=True)
+        for name in old_dirs - subdirs:
+            self._drop_dir(os.path.join(d, name))
+
+    def cycle(self):
+        for d in list(self._dirs):
+            if self.w._stop.is_set():
+                return
+            entry = self._dirs.get(d)
+            if entry is None:
+                continue  # dropped with a removed parent this cycle
+            try:
+                mtime = os.stat(d).st_mtime_ns
+            except OSError:
+                continue  # the parent's re-list reports the removal
+            if mtime != entry[0]:
+                self._relist(d, mtime)
+        if not self._cursor:
+            self._cursor = list(self._files)
+        batch = self._cursor[-_POLL_SLICE:]
+        del self._cursor[-_POLL_SLICE:]
+        for p in batch:
+            if p in self._files:
+                self._stat_file(p)
+
+
+class _InotifyBackend:
+    """Linux inotify through ctypes: a watch on every directory of the tree,
+    read on this thread with a select() timeout so stop() is noticed."""
+
+    name = "inotify"
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+    IN_CLOEXEC = 0o2000000
+    MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+            | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR)
+
+    def __init__(self, watcher):
+        self.w = watcher
+        self.fd = -1
+        self._wds = {}       # watch descriptor -> directory path
+
+    def setup(self):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6",
+                           use_errno=True)
+        self._add = libc.inotify_add_watch
+        self._add.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self._add.restype = ctypes.c_int
+        self._rm = libc.inotify_rm_watch
+        self._rm.argtypes = (ctypes.c_int, ctypes.c_int)
+        self._get_errno = ctypes.get_errno
+        self.fd = libc.inotify_init1(self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watch_tree(self.w.root, report=False)
+
+    def _watch_tree(self, top, report):
+        """Watch `top` and every directory below it; with `report`, the files
+        found are new (a directory created or moved in) and reported."""
+        stack = [top]
+        while stack:
+            d = stack.pop()
+            wd = self._add(self.fd, os.fsencode(d), self.MASK)
+            if wd < 0:
+                err = self._get_errno()
+                if err == 28:  # ENOSPC: fs.inotify.max_user_watches reached
+                    raise OSError(err, "out of inotify watches "
+                                       "(raise fs.inotify.max_user_watches)")
+                continue  # vanished or unreadable; skip it
+            self._wds[wd] = d
+            try:
+                with os.scandir(d) as it:
+                    for e in it:
+                        try:
+                            if e.is_dir(follow_symlinks=False):
+                                if self.w._enter(e):
+                                    stack.append(e.path)
+                            elif report:
+                                self.w._emit(e.path, CREATED)
+                            elif self.w.include(e.path):
+                                self.w._files.add(e.path)
+                        except OSError:
+                            pass
+            except OSError:
+                pass
+
+    def interrupt(self):
+        pass  # the select() timeout notices the stop event
+
+    def close(self):
+        if self.fd >= 0:
+            try:
+                os.close(self.fd)
+            except OSError:
+                pass
+            self.fd = -1
+
+    def run(self):
+        import select
+        header = struct.calcsize("iIII")
+        while not self.w._stop.is_set():
+            ready, _, _ = select.select([self.fd], [], [], 0.5)
+            if not ready:
+                continue
+            buf = os.read(self.fd, 256 * 1024)
+            off = 0
+            while off + header <= len(buf):
+                wd, mask, _, length = struct.unpack_from("iIII", buf, off)
+                name = buf[off + header:off + header + length].rstrip(b"\0")
+                off += header + length
+                self._event(wd, mask, os.fsdecode(name))
+
+    def _event(self, wd, mask, name):
+        if mask & self.IN_Q_OVERFLOW:
+            # Events were lost; all we can say is "anything may have changed".
+            self.w._note("file watcher: inotify queue overflowed; "
+                         "reporting every file as changed")
+            self.w._rescan()
+            return
+        if mask & self.IN_IGNORED:
+            self._wds.pop(wd, None)
+            return
+        d = self._wds.get(wd)
+        if d is None or not name:
+            return
+        path = os.path.join(d, name)
+        if mask & self.IN_ISDIR:
+            if name in self.w.ignore_dirs or not (
+                    self.w.descend is None or self.w.descend(path)):
+                return
+            if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                self._watch_tree(path, report=True)
+            elif mask & self.IN_MOVED_FROM:
+                # Renamed or moved out: its watches would keep reporting under
+                # the old path. A rename within the tree re-adds them from the
+                # IN_MOVED_TO that follows, reporting its files created again.
+                prefix = path + os.sep
+                for stale in [w for w, p in self._wds.items()
+                              if p == path or p.startswith(prefix)]:
+                    self._rm(self.fd, stale)
+                    del self._wds[stale]
+                self.w._emit_tree(path, DELETED)
+            elif mask & self.IN_DELETE:
+                # Its files' own deletions came first; this catches any whose
+                # events were lost.
+                self.w._emit_tree(path, DELETED)
+            return
+        if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+            self.w._emit(path, CREATED)
+        elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+            self.w._emit(path, DELETED)
+        elif mask & self.IN_CLOSE_WRITE:
+            self.w._emit(path, CHANGED)
+
+
+class _WindowsBackend:
+    """ReadDirectoryChangesW on the workspace root with bWatchSubtree, through
+    ctypes. stop() cancels the blocked read with CancelIoEx."""
+
+    name = "windows"
+
+    FILE_LIST_DIRECTORY = 0x0001
+    FILE_SHARE_ALL = 0x0007          # read | write | delete
+    OPEN_EXISTING = 3
+    FILE_FLAG_BACKUP_SEMANTICS = 0x02000000
+    FILTER = (0x0001                 # FILE_NOTIFY_CHANGE_FILE_NAME
+              | 0x0002               # FILE_NOTIFY_CHANGE_DIR_NAME
+              | 0x0008               # FILE_NOTIFY_CHANGE_SIZE
+              | 0x0010)              # FILE_NOTIFY_CHANGE_LAST_WRITE
+    ACTIONS = {1: CREATED, 2: DELETED, 3: CHANGED, 4: DELETED, 5: CREATED}
+
+    def __init__(self, watcher):
+        self.w = watcher
+        self.handle = None
+
+    def setup(self):
+        import ctypes
+        from ctypes import wintypes
+        k32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        k32.CreateFileW.argtypes = (
+            wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, ctypes.c_void_p,
+            wintypes.DWORD, wintypes.DWORD, wintypes.HANDLE)
+        k32.CreateFileW.restype = wintypes.HANDLE
+        k32.ReadDirectoryChangesW.argtypes = (
+            wintypes.HANDLE, ctypes.c_void_p, wintypes.DWORD, wintypes.BOOL,
+            wintypes.DWORD, ctypes.POINTER(wintypes.DWORD), ctypes.c_void_p,
+            ctypes.c_void_p)
+        k32.ReadDirectoryChangesW.restype = wintypes.BOOL
+        k32.CancelIoEx.argtypes = (wintypes.HANDLE, ctypes.c_void_p)
+        k32.CloseHandle.argtypes = (wintypes.HANDLE,)
+        self._ctypes, self._wintypes, self._k32 = ctypes, wintypes, k32
+        handle = k32.CreateFileW(self.w.root, self.FILE_LIST_DIRECTORY,
+                                 self.FILE_SHARE_ALL, None, self.OPEN_EXISTING,
+                                 self.FILE_FLAG_BACKUP_SEMANTICS, None)
+        if handle in (None, ctypes.c_void_p(-1).value):
+            raise ctypes.WinError(ctypes.get_last_error())
+        self.handle = handle
+        # Directory events name only the directory: remember the files that
+        # a later delete or move-out takes with it.
+        self.w._files = set(self.w._walk_files(self.w.root))
+
+    def interrupt(self):
+        if self.handle is not None:
+            self._k32.CancelIoEx(self.handle, None)
+
+    def close(self):
+        if self.handle is not None:
+            self._k32.CloseHandle(self.handle)
+            self.handle = None
+
+    def run(self):
+        ctypes, wintypes = self._ctypes, self._wintypes
+        buf = ctypes.create_string_buffer(64 * 1024)
+        got = wintypes.DWORD()
+        while not self.w._stop.is_set():
+            ok = self._k32.ReadDirectoryChangesW(
+                self.handle, buf, len(buf), True, self.FILTER,
+                ctypes.byref(got), None, None)
+            if self.w._stop.is_set():
+                return
+            if not ok:
+                raise ctypes.WinError(ctypes.get_last_error())
+            if got.value == 0:
+                # The change buffer overflowed; events were lost.
+                self.w._note("file watcher: change buffer overflowed; "
+                             "reporting every file as changed")
+                self.w._rescan()
+                continue
+            self._parse(buf.raw[:got.value])
+
+    def _parse(self, data):
+        off = 0
+        while True:
+            nxt, action, length = struct.unpack_from("III", data, off)
+            name = data[off + 12:off + 12 + length].decode("utf-16-le")
+            kind = self.ACTIONS.get(action)
+            if kind is not None:
+                path = os.path.join(self.w.root, name)
+                if not self.w._ignored(path):
+                    self._action(path, kind)
+            if not nxt:
+                break
+            off += nxt
+
+    def _action(self, path, kind):
+        """Events don't say whether `path` is a directory: one removed is
+        recognised by the files remembered under it, one created or moved
+        in by being a directory now - its files are walked, as nothing else
+        reports them."""
+        if kind == DELETED:
+            if path not in self.w._files and self.w._emit_tree(path, DELETED):
+                return
+            self.w._emit(path, kind)
+        elif os.path.isdir(path):
+            name = os.path.basename(path)
+            if kind == CREATED and name not in self.w.ignore_dirs and (
+                    self.w.descend is None or self.w.descend(path)):
+                self.w._emit_tree(path, CREATED)
+        else:
+            self.w._emit(path, kind)
@@ -128,6 +128,10 @@ def OdinLSP_FindReferences():
     _client.find_references()
 
 
+def OdinLSP_WorkspaceSymbol():
+    _client.workspace_symbol()
+
+
 def OdinLSP_ShowDiagnostics():
     _client.show_all_diagnostics()
 
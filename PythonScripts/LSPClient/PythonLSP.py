@@ -127,6 +127,10 @@ def PythonLSP_FindReferences():
     _client.find_references()
 
 
+def PythonLSP_WorkspaceSymbol():
+    _client.workspace_symbol()
+
+
 def PythonLSP_ShowDiagnostics():
     _client.show_all_diagnostics()
 
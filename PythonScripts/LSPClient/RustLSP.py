@@ -127,6 +127,10 @@ def RustLSP_FindReferences():
     _client.find_references()
 
 
+def RustLSP_WorkspaceSymbol():
+    _client.workspace_symbol()
+
+
 def RustLSP_ShowDiagnostics():
     _client.show_all_diagnostics()
 
@@ -117,6 +117,10 @@ def ZigLSP_FindReferences():
     _client.find_references()
 
 
+def ZigLSP_WorkspaceSymbol():
+    _client.workspace_symbol()
+
+
 def ZigLSP_ShowDiagnostics():
     _client.show_all_diagnostics()
 